@@ -0,0 +1,9 @@
+#Settings for the test run (pytest.ini): the project settings plus a 'replica' database
+#that mirrors 'default' - a second connection to the same test database - so the
+#read-replica routing (racing.routers) can be tested end to end.
+from .settings import *
+
+DATABASES = {
+    **DATABASES,
+    'replica': {**DATABASES['default'], 'TEST': {'MIRROR': 'default'}},
+}
@@ -4,3 +4,6 @@ from django.apps import AppConfig
 class RacingConfig(AppConfig):
     default_auto_field = 'django.db.models.BigAutoField'
     name = 'racing'
+
+    def ready(self):
+        from . import signals  # noqa: F401  (connects the cache invalidation receivers)
@@ -0,0 +1,136 @@
+from collections import Counter
+from datetime import date
+
+from django.db import IntegrityError, router, transaction
+from django.db.models import CharField, Count
+from django.db.models.functions import Cast
+
+from . import counters
+from .caching import bump_generation, invalidate_rows
+from .models import Driver, Race, Team
+
+RaceEntry = Race.registered_drivers.through
+
+MAX_BULK_ROWS = 5000
+BULK_BATCH_SIZE = 500
+#A driver giving up an identity another row of the batch takes parks on one of these
+#first (its last name becomes its id; validate_dob rules the date out for real drivers),
+#as the unique constraint is checked row by row, even within one UPDATE.
+PARKED_DOB = date(9999, 12, 31)
+
+
+def save_drivers(rows):
+    """Create or update a batch of validated driver rows.
+
+    Rows with an ``id`` update that driver, the others are created. Team names,
+    drivers to update and identity clashes are each resolved with one query for
+    the whole batch, then everything is written with bulk_create/bulk_update in
+    one transaction. Identities are checked against the state the batch leaves, so
+    drivers may swap identities or take one another row gives up. Returns
+    ``(results, errors)``; nothing is written when any row has errors. The
+    unique_driver_identity constraint still guards against concurrent writers.
+    """
+    errors = {}
+
+    def add_error(index, field, message):
+        errors.setdefault(index, {}).setdefault(field, []).append(message)
+
+    team_names = {row['team'] for row in rows if row.get('team')}
+    teams = dict(Team.objects.filter(name__in=team_names).values_list('name', 'id'))
+    to_update = Driver.objects.in_bulk({row['id'] for row in rows if row.get('id')})
+
+    #identities taken in the database once the batch is written: (first_name, last_name, dob) -> id;
+    #the drivers it updates give theirs up
+    taken = {
+        (first_name, last_name, dob): pk
+        for pk, first_name, last_name, dob in Driver.objects.filter(
+            first_name__in={row['first_name'] for row in rows},
+            last_name__in={row['last_name'] for row in rows},
+            dob__in={row['dob'] for row in rows},
+        ).values_list('id', 'first_name', 'last_name', 'dob')
+        if pk not in to_update
+    }
+
+    seen = {}
+    for index, row in enumerate(rows):
+        if row.get('team') and row['team'] not in teams:
+            add_error(index, 'team', "Team with this name does not exist.")
+        if row.get('id') and row['id'] not in to_update:
+            add_error(index, 'id', "Driver with this id does not exist.")
+        identity = (row['first_name'], row['last_name'], row['dob'])
+        if identity in seen:
+            add_error(index, 'non_field_errors', f"Duplicate of row {seen[identity]}.")
+        elif taken.get(identity, row.get('id')) != row.get('id'):
+            add_error(index, 'non_field_errors', "Driver already exists")
+        seen.setdefault(identity, index)
+
+    if errors:
+        return [], [{'row': index, 'errors': row_errors} for index, row_errors in sorted(errors.items())]
+
+    created, updated, parked, touched_teams, moves = [], [], [], set(), {}
+    claimed = set(seen)
+    for row in rows:
+        team_id = teams.get(row['team']) if row.get('team') else None
+        if row.get('id'):
+            driver = to_update[row['id']]
+            stored = (driver.first_name, driver.last_name, driver.dob)
+            if stored in claimed and stored != (row['first_name'], row['last_name'], row['dob']):
+                parked.append(driver.pk)
+            touched_teams.add(driver.team_id)
+            if driver.team_id != team_id:
+                moves[driver.pk] = (driver.team_id, team_id)
+            driver.first_name, driver.last_name, driver.dob, driver.team_id = (
+                row['first_name'], row['last_name'], row['dob'], team_id)
+            updated.append(driver)
+        else:
+            created.append(Driver(first_name=row['first_name'], last_name=row['last_name'],
+                                  dob=row['dob'], team_id=team_id))
+        touched_teams.add(team_id)
+
+    using = router.db_for_write(Driver)
+    try:
+        with transaction.atomic(using=using):
+            if parked:
+                Driver.objects.using(using).filter(pk__in=parked).update(
+                    last_name=Cast('id', output_field=CharField()), dob=PARKED_DOB)
+            Driver.objects.using(using).bulk_create(created, batch_size=BULK_BATCH_SIZE)
+            Driver.objects.using(using).bulk_update(updated, ['first_name', 'last_name', 'dob', 'team'],
+                                                    batch_size=BULK_BATCH_SIZE)
+            count_bulk_writes(created, moves)
+    except IntegrityError:
+        #a concurrent writer took one of the identities after the checks above
+        return [], [{'row': None, 'errors': {'non_field_errors': ["Driver already exists"]}}]
+
+    drivers_written_in_bulk([driver.pk for driver in updated], touched_teams)
+
+    results = []
+    created_iter, updated_iter = iter(created), iter(updated)
+    for row in rows:
+        if row.get('id'):
+            results.append({'id': next(updated_iter).pk, 'status': 'updated'})
+        else:
+            results.append({'id': next(created_iter).pk, 'status': 'created'})
+    return results, []
+
+
+def count_bulk_writes(created, moves):
+    #the team counters driver_saved() would have moved; moves: {driver id: (old team, new team)}
+    drivers = Counter(driver.team_id for driver in created)
+    entries = Counter()
+    moved_entries = dict(RaceEntry.objects.filter(driver_id__in=list(moves)).values('driver_id')
+                         .annotate(n=Count('*')).values_list('driver_id', 'n')) if moves else {}
+    for pk, (old_team_id, new_team_id) in moves.items():
+        drivers[old_team_id] -= 1
+        drivers[new_team_id] += 1
+        entries[old_team_id] -= moved_entries.get(pk, 0)
+        entries[new_team_id] += moved_entries.get(pk, 0)
+    counters.adjust(Team, 'driver_count', drivers)
+    counters.adjust(Team, 'registered_driver_count', entries)
+
+
+def drivers_written_in_bulk(updated_driver_ids, team_ids):
+    #bulk_create/bulk_update send no signals: do what the receivers in racing.signals would
+    bump_generation(Driver)
+    race_ids = RaceEntry.objects.filter(driver_id__in=updated_driver_ids).values_list('race_id', flat=True) \
+        if updated_driver_ids else ()
+    invalidate_rows(team_ids=team_ids, driver_ids=updated_driver_ids, race_ids=race_ids)
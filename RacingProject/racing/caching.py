@@ -0,0 +1,119 @@
+import hashlib
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.utils import make_template_fragment_key
+from django.db import DEFAULT_DB_ALIAS, transaction
+
+from .routers import pin_seconds, read_alias, reading_from_replica, replica_alias
+
+#{% cache %} fragment names used by the list templates, one fragment per row
+TEAM_ROW = 'team_row'
+DRIVER_ROW = 'driver_row'
+RACE_ROW = 'race_row'
+ROW_CACHE_TIMEOUT = 3600
+
+#With a read replica (racing.routers) an entry filled from it may be as stale as the replica
+#was: such entries are kept apart (keyed by the database read) and only for the pin window,
+#so clients pinned to the primary never get them and they don't outlive the lag we allow for.
+
+
+def fragment_cache():
+    #same lookup as the {% cache %} tag
+    if 'template_fragments' in getattr(settings, 'CACHES', {}):
+        return caches['template_fragments']
+    return caches['default']
+
+
+def row_cache_context():
+    """{% cache %} arguments of the list-page rows, for the template context."""
+    return {'row_cache_timeout': pin_seconds() if reading_from_replica() else ROW_CACHE_TIMEOUT,
+            'read_db': read_alias()}
+
+
+def invalidate_rows(team_ids=(), driver_ids=(), race_ids=(), using=DEFAULT_DB_ALIAS):
+    """Drop the cached list-page rows of the given objects once the writer's transaction
+    commits: dropped earlier, a page rendered before the commit would cache the old rows again."""
+    aliases = [DEFAULT_DB_ALIAS] + ([replica_alias()] if replica_alias() else [])
+    keys = []
+    #the ids may be lazy querysets: resolve them now, while the rows are still there
+    for fragment, ids in ((TEAM_ROW, team_ids), (DRIVER_ROW, driver_ids), (RACE_ROW, race_ids)):
+        keys += [make_template_fragment_key(fragment, [pk, alias])
+                 for pk in ids if pk is not None for alias in aliases]
+    if keys:
+        transaction.on_commit(lambda: fragment_cache().delete_many(keys), using=using)
+
+
+#Read API response cache. Every entry key embeds the current generation of each model
+#the response depends on; the signal receivers bump a model's generation on any write,
+#so old entries are simply never looked up again (and expire on their own).
+GENERATION_KEY = 'racing:generation:{}'
+
+
+def response_cache():
+    return caches[getattr(settings, 'RACING_RESPONSE_CACHE_ALIAS', 'default')]
+
+
+def response_cache_timeout():
+    timeout = getattr(settings, 'RACING_RESPONSE_CACHE_TIMEOUT', 300)
+    if reading_from_replica():
+        return pin_seconds() if timeout is None else min(timeout, pin_seconds())
+    return timeout
+
+
+def get_generations(*models):
+    cache = response_cache()
+    keys = [GENERATION_KEY.format(model._meta.label_lower) for model in models]
+    values = cache.get_many(keys)
+    for key in keys:
+        if key not in values:
+            #a fresh (or evicted) counter starts at the current time, so it can't fall back
+            #onto a generation that older entries were stored under
+            cache.add(key, time.time_ns(), timeout=None)
+            values[key] = cache.get(key)
+    return [values[key] for key in keys]
+
+
+def bump_generation(*models, using=DEFAULT_DB_ALIAS):
+    """Start a new generation of each model once the writer's transaction commits (at once
+    outside a transaction): bumped earlier, a read between the bump and the commit would
+    cache the old rows under the new generation."""
+    transaction.on_commit(lambda: _bump(models), using=using)
+
+
+def _bump(models):
+    cache = response_cache()
+    for model in models:
+        key = GENERATION_KEY.format(model._meta.label_lower)
+        try:
+            cache.incr(key)
+        except ValueError:
+            cache.add(key, time.time_ns(), timeout=None)
+
+
+async def aget_generations(*models):
+    #get_generations() for the async views, through the cache's async API
+    cache = response_cache()
+    keys = [GENERATION_KEY.format(model._meta.label_lower) for model in models]
+    values = await cache.aget_many(keys)
+    for key in keys:
+        if key not in values:
+            await cache.aadd(key, time.time_ns(), timeout=None)
+            values[key] = await cache.aget(key)
+    return [values[key] for key in keys]
+
+
+def response_cache_key(view_name, models, request, extra=''):
+    return build_response_key(view_name, get_generations(*models), request, extra)
+
+
+async def aresponse_cache_key(view_name, models, request, extra=''):
+    return build_response_key(view_name, await aget_generations(*models), request, extra)
+
+
+def build_response_key(view_name, generations, request, extra):
+    generations = '.'.join(str(generation) for generation in generations)
+    query = sorted(request.GET.lists())
+    raw = f'{view_name}|{request.path}|{query}|{extra}|{generations}|{read_alias()}'
+    return 'racing:response:' + hashlib.md5(raw.encode('utf-8')).hexdigest()
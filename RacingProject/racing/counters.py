@@ -0,0 +1,118 @@
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.db.models import Case, Count, F, IntegerField, OuterRef, Subquery, Value, When
+from django.db.models.functions import Coalesce
+
+from .caching import invalidate_rows
+from .models import Driver, Race, Team
+
+#Maintained counters:
+#  Race.registered_driver_count  - its race entries
+#  Team.driver_count             - its drivers
+#  Team.registered_driver_count  - race entries of its drivers
+#
+#The receivers in racing.signals move them with F() updates, so concurrent writers
+#add up instead of overwriting each other. Bulk paths that send no signals call
+#adjust()/entries_changed() themselves; recount() repairs any drift.
+RaceEntry = Race.registered_drivers.through
+
+LOOKUP_CHUNK = 500
+RECOUNT_BATCH_SIZE = 500
+
+#(model, field) -> {pk: delta} collected inside deferred(), None outside
+pending = ContextVar('racing_counter_deltas', default=None)
+
+
+def adjust(model, field, deltas):
+    """Add ``deltas`` ({pk: n}) to ``field``; one UPDATE, or none when deferred."""
+    batch = pending.get()
+    if batch is not None:
+        batch[(model, field)].update(deltas)
+        return
+    apply(model, field, deltas)
+
+
+def apply(model, field, deltas):
+    deltas = {pk: n for pk, n in deltas.items() if pk is not None and n}
+    if not deltas:
+        return
+    by_delta = defaultdict(list)
+    for pk, n in deltas.items():
+        by_delta[n].append(pk)
+    if len(by_delta) == 1:
+        [(n, ids)] = by_delta.items()
+        model.objects.filter(pk__in=ids).update(**{field: F(field) + n})
+        return
+    change = Case(*[When(pk__in=ids, then=Value(n)) for n, ids in by_delta.items()],
+                  default=Value(0), output_field=IntegerField())
+    model.objects.filter(pk__in=list(deltas)).update(**{field: F(field) + change})
+
+
+@contextmanager
+def deferred():
+    """Collect the counter changes made inside the block and write them at the end,
+    one UPDATE per counter (bulk and cascaded deletes). Nested blocks join the outer one."""
+    if pending.get() is not None:
+        yield
+        return
+    batch = defaultdict(Counter)
+    token = pending.set(batch)
+    try:
+        yield
+    finally:
+        pending.reset(token)
+    for (model, field), deltas in batch.items():
+        apply(model, field, deltas)
+
+
+def entries_changed(entries, sign=1):
+    """Count race entries ((race_id, driver_id) pairs) added (sign=1) or removed (-1)."""
+    race_deltas, driver_entries = Counter(), Counter()
+    for race_id, driver_id in entries:
+        race_deltas[race_id] += sign
+        driver_entries[driver_id] += sign
+    adjust(Race, 'registered_driver_count', race_deltas)
+
+    team_deltas = Counter()
+    driver_ids = list(driver_entries)
+    for start in range(0, len(driver_ids), LOOKUP_CHUNK):
+        for pk, team_id in (Driver.objects.filter(id__in=driver_ids[start:start + LOOKUP_CHUNK], team__isnull=False)
+                            .values_list('id', 'team_id')):
+            team_deltas[team_id] += driver_entries[pk]
+    adjust(Team, 'registered_driver_count', team_deltas)
+
+
+def counted(queryset, key):
+    #COUNT(*) of ``queryset`` rows whose ``key`` is the outer row, as a subquery
+    rows = queryset.filter(**{key: OuterRef('pk')}).order_by().values(key).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def actual_counts():
+    return {
+        (Race, 'registered_driver_count'): counted(RaceEntry.objects.all(), 'race_id'),
+        (Team, 'driver_count'): counted(Driver.objects.all(), 'team_id'),
+        (Team, 'registered_driver_count'): counted(RaceEntry.objects.all(), 'driver__team_id'),
+    }
+
+
+def recount(batch_size=RECOUNT_BATCH_SIZE):
+    """Recompute every counter from the tables and fix the rows that drifted.
+
+    One query per counter finds the drifted rows, which are then corrected with one
+    UPDATE per ``batch_size`` rows, and their cached list rows dropped (update() sends
+    no signals). Returns {'<model>.<field>': rows corrected}.
+    """
+    corrected = {}
+    for (model, field), actual in actual_counts().items():
+        drifted = list(model.objects.annotate(actual=actual).exclude(**{field: F('actual')})
+                       .values_list('pk', 'actual'))
+        for start in range(0, len(drifted), batch_size):
+            batch = drifted[start:start + batch_size]
+            value = Case(*[When(pk=pk, then=Value(n)) for pk, n in batch], output_field=IntegerField())
+            model.objects.filter(pk__in=[pk for pk, n in batch]).update(**{field: value})
+        invalidate_rows(**{f'{model._meta.model_name}_ids': [pk for pk, n in drifted]})
+        corrected[f'{model._meta.model_name}.{field}'] = len(drifted)
+    return corrected
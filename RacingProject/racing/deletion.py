@@ -0,0 +1,32 @@
+from django.db import router, transaction
+
+from .counters import deferred
+
+
+def bulk_delete(model, ids):
+    """Delete the given Team/Driver/Race ids that have no race entries.
+
+    The ids are partitioned into deletable, blocked and not found with one
+    query (rows locked where the database supports it), then the deletable set
+    is removed with a single queryset delete inside the same transaction; the
+    team counters it changes are written with one UPDATE.
+    """
+    requested = list(dict.fromkeys(ids))
+    using = router.db_for_write(model)
+
+    with transaction.atomic(using=using):
+        flags = dict(model.objects.using(using)
+                     .filter(id__in=requested)
+                     .with_race_entries()
+                     .select_for_update(of=('self',))
+                     .values_list('id', 'race_entries_exist'))
+        deletable = [pk for pk in requested if pk in flags and not flags[pk]]
+        if deletable:
+            with deferred():
+                model.objects.using(using).filter(id__in=deletable).delete()
+
+    return {
+        'deleted': deletable,
+        'blocked': [pk for pk in requested if flags.get(pk)],
+        'not_found': [pk for pk in requested if pk not in flags],
+    }
@@ -0,0 +1,93 @@
+import csv
+import json
+
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Prefetch
+
+from .models import Driver, Race, Team
+
+#Rows are read with QuerySet.iterator(chunk_size=...), which also runs the prefetches
+#chunk by chunk, so memory stays flat however large the export is.
+EXPORT_CHUNK_SIZE = 1000
+
+FORMATS = {
+    'csv': 'text/csv; charset=utf-8',
+    'ndjson': 'application/x-ndjson',
+}
+
+ENTRY_FIELDS = ['race_id', 'race_track_name', 'track_location', 'race_date', 'registration_closure_date',
+                'driver_id', 'driver_name', 'team']
+ROSTER_FIELDS = ['team_id', 'team', 'location', 'driver_id', 'driver_name', 'dob']
+
+
+class Echo:
+    #csv.writer target that hands each line back instead of buffering it
+    def write(self, value):
+        return value
+
+
+def _drivers():
+    return (Driver.objects.select_related('team')
+            .only('id', 'first_name', 'last_name', 'dob', 'team__name')
+            .order_by('last_name', 'first_name', 'id'))
+
+
+def _driver_dict(driver):
+    return {'driver_id': driver.id, 'driver_name': f"{driver.first_name} {driver.last_name}",
+            'team': driver.team.name if driver.team_id else None}
+
+
+def race_entries():
+    """Races in calendar order, each with its entry list (driver and team name)."""
+    races = (Race.objects.order_by('race_date', 'id')
+             .prefetch_related(Prefetch('registered_drivers', queryset=_drivers())))
+    for race in races.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'race_id': race.id,
+            'race_track_name': race.race_track_name,
+            'track_location': race.track_location,
+            'race_date': race.race_date,
+            'registration_closure_date': race.registration_closure_date,
+            'drivers': [_driver_dict(driver) for driver in race.registered_drivers.all()],
+        }
+
+
+def team_rosters():
+    """Teams by name, each with its drivers."""
+    teams = (Team.objects.order_by('name', 'id').only('id', 'name', 'location')
+             .prefetch_related(Prefetch('drivers', queryset=_drivers())))
+    for team in teams.iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield {
+            'team_id': team.id,
+            'team': team.name,
+            'location': team.location,
+            'drivers': [{'driver_id': driver.id, 'driver_name': f"{driver.first_name} {driver.last_name}",
+                         'dob': driver.dob} for driver in team.drivers.all()],
+        }
+
+
+def flatten(records, fields):
+    #one CSV row per driver; a race/team without drivers still gets one row
+    for record in records:
+        drivers = record['drivers'] or [{}]
+        for driver in drivers:
+            row = {**record, **driver}
+            yield [row.get(field) for field in fields]
+
+
+def csv_stream(records, fields):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in flatten(records, fields):
+        yield writer.writerow(row)
+
+
+def ndjson_stream(records):
+    for record in records:
+        yield json.dumps(record, cls=DjangoJSONEncoder) + '\n'
+
+
+def stream(records, fields, fmt):
+    if fmt == 'csv':
+        return csv_stream(records, fields)
+    return ndjson_stream(records)
@@ -1,5 +1,42 @@
 from django import forms
+from django.urls import reverse
 from .models import Team, Driver, Race
+
+
+class AutocompleteSelectMultiple(forms.SelectMultiple):
+    """Multiple select that is filled from a lookup endpoint as the user types.
+
+    Only the selected options are rendered (one id__in query), not one option per
+    row of the table; see templates/widgets/autocomplete_select.html.
+    """
+    template_name = 'widgets/autocomplete_select.html'
+
+    def __init__(self, lookup_url_name, attrs=None):
+        super().__init__(attrs)
+        self.lookup_url_name = lookup_url_name
+
+    def optgroups(self, name, value, attrs=None):
+        selected = [pk for pk in value if pk.isdigit()]
+        objects = self.choices.queryset.filter(pk__in=selected) if selected else []
+        options = [self.create_option(name, obj.pk, self.choices.field.label_from_instance(obj), True, index)
+                   for index, obj in enumerate(objects)]
+        return [(None, options, 0)]
+
+    def get_context(self, name, value, attrs):
+        context = super().get_context(name, value, attrs)
+        context['widget']['lookup_url'] = reverse(self.lookup_url_name)
+        return context
+
+
+#labels match the lookup endpoints' "text"
+class DriverMultipleChoiceField(forms.ModelMultipleChoiceField):
+    def label_from_instance(self, obj):
+        return f"{obj.first_name} {obj.last_name}"
+
+
+class RaceMultipleChoiceField(forms.ModelMultipleChoiceField):
+    def label_from_instance(self, obj):
+        return f"{obj.race_track_name} ({obj.race_date})"
  
 class TeamForm(forms.ModelForm):
     class Meta:
@@ -14,17 +51,76 @@ class DriverForm(forms.ModelForm):
 class RaceForm(forms.ModelForm):
     class Meta:
         model = Race
-        fields = ['race_track_name', 'track_location', 'race_date', 'registration_closure_date','registered_drivers']
+        fields = ['race_track_name', 'track_location', 'race_date', 'registration_closure_date', 'capacity',
+                  'registered_drivers']
+
+    def clean(self):
+        cleaned_data = super().clean()
+        capacity, drivers = cleaned_data.get('capacity'), cleaned_data.get('registered_drivers')
+        if capacity is not None and drivers is not None and len(drivers) > capacity:
+            self.add_error('registered_drivers', f"The race has {capacity} places, {len(drivers)} drivers selected.")
+        return cleaned_data
  
-class RegisterDriverToRaceForm(forms.Form):
+class DeltaInput(forms.MultipleHiddenInput):
+    """Hidden ids written by the autocomplete script on submit; never rendered back."""
+    def format_value(self, value):
+        return []
+
+
+class SelectionChangeForm(forms.Form):
+    """Base of the forms picking related rows with AutocompleteSelectMultiple.
+
+    The widget posts only the change, as ``<field>_add`` / ``<field>_remove`` ids
+    (validated with one id__in query each). Without JavaScript the whole selection
+    comes in ``<field>`` and changes() diffs it against the current one; so does a
+    re-rendered (bound) form, which shows the selection the user was after. Such
+    posts carry ``<field>_full``, as an emptied selection sends no ``<field>`` value.
+    """
+    selection_field = None
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        field = self.fields[self.selection_field]
+        field.queryset = self.selection_queryset()
+        field.required = False
+        if not self.is_bound:
+            field.widget.attrs['data-delta'] = 'true'
+        for suffix in ('add', 'remove'):
+            self.fields[f'{self.selection_field}_{suffix}'] = type(field)(
+                queryset=field.queryset, required=False, widget=DeltaInput)
+
+    def selection_queryset(self):
+        return self.fields[self.selection_field].queryset
+
+    def changes(self, current_ids):
+        """(ids to add, ids to remove), given the ids currently selected."""
+        name = self.selection_field
+        current = set(current_ids)
+        if name in self.data or f'{name}_full' in self.data:
+            selected = {obj.pk for obj in self.cleaned_data[name]}
+            return sorted(selected - current), sorted(current - selected)
+        add = [obj.pk for obj in self.cleaned_data[f'{name}_add']]
+        remove = [obj.pk for obj in self.cleaned_data[f'{name}_remove']]
+        #should the change be refused, the form is shown again with the selection asked for
+        self.data = self.data.copy()
+        self.data.setlist(name, [str(pk) for pk in sorted((current | set(add)) - set(remove))])
+        return add, remove
+
+class RegisterDriverToRaceForm(SelectionChangeForm):
 
     # driver = forms.ModelChoiceField(queryset=Driver.objects.all())
-    races = forms.ModelMultipleChoiceField(queryset=Race.objects.all(), widget= forms.CheckboxSelectMultiple)
+    races = RaceMultipleChoiceField(queryset=Race.objects.none(), widget=AutocompleteSelectMultiple('race-lookup'))
+    selection_field = 'races'
+
+    def selection_queryset(self):
+        #per form: which races are open moves with the date
+        return Race.objects.open_for_registration()
 
-class EditRaceDriversForm(forms.Form):
+class EditRaceDriversForm(SelectionChangeForm):
 
     #race = forms.ModelChoiceField(queryset=Race.objects.all())
-    drivers = forms.ModelMultipleChoiceField(queryset=Driver.objects.all(),  widget= forms.CheckboxSelectMultiple)
+    drivers = DriverMultipleChoiceField(queryset=Driver.objects.all(), widget=AutocompleteSelectMultiple('driver-lookup'))
+    selection_field = 'drivers'
        
 
    
@@ -0,0 +1,51 @@
+import hashlib
+import io
+import re
+
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, UnidentifiedImageError, features
+
+#Team logo renditions: fixed-size thumbnails stored under content-hash names, so a
+#rendition URL always serves the same bytes and can be cached as immutable.
+RENDITION_SIZES = (64, 256)
+RENDITION_DIR = 'logos/renditions/'
+RENDITION_NAME_RE = re.compile(r'^[0-9a-f]{20}-\d+\.(webp|png)$')
+
+
+def rendition_format():
+    #WebP when Pillow is built with it, PNG otherwise
+    return ('WEBP', 'webp') if features.check('webp') else ('PNG', 'png')
+
+
+def build_logo_renditions(logo, storage=default_storage):
+    """Write the thumbnails of an uploaded logo and return {size: storage name}.
+
+    Identical logos share their renditions. A file Pillow can't read gives no renditions.
+    """
+    try:
+        logo.open('rb')
+        data = logo.read()
+        logo.seek(0)
+        image = Image.open(io.BytesIO(data))
+        image.load()
+    except (OSError, ValueError, UnidentifiedImageError, Image.DecompressionBombError):
+        return {}
+
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    image_format, extension = rendition_format()
+    image = image.convert('RGBA')
+    renditions = {}
+    for size in RENDITION_SIZES:
+        name = f'{RENDITION_DIR}{digest}-{size}.{extension}'
+        if not storage.exists(name):
+            thumbnail = image.copy()
+            thumbnail.thumbnail((size, size), Image.LANCZOS)
+            buffer = io.BytesIO()
+            thumbnail.save(buffer, format=image_format)
+            saved = storage.save(name, ContentFile(buffer.getvalue()))
+            if saved != name:
+                #written concurrently by another upload of the same logo - same bytes, keep theirs
+                storage.delete(saved)
+        renditions[str(size)] = name
+    return renditions
@@ -0,0 +1,95 @@
+import asyncio
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+from django.test import AsyncClient, Client, override_settings
+from django.urls import reverse
+
+from racing.models import Driver, Race, Team
+
+#endpoint -> (sync url name, async url name)
+ENDPOINTS = {
+    'teams': ('team-list', 'team-list-async'),
+    'drivers': ('driver-list', 'driver-list-async'),
+    'races': ('race-list', 'race-list-async'),
+    'upcoming': ('race-upcoming', 'race-upcoming-async'),
+    'team-page': ('team_list', 'team_list_async'),
+    'driver-page': ('driver_list', 'driver_list_async'),
+    'race-page': ('race_list', 'race_list_async'),
+}
+
+NO_CACHE = {'default': {'BACKEND': 'django.core.cache.backends.dummy.DummyCache'}}
+
+
+class Command(BaseCommand):
+    help = (
+        "Compare the sync views driven through Django's WSGI-style handler from a pool of "
+        "--concurrency threads with the async views driven through the ASGI handler from "
+        "--concurrency tasks on one event loop. Runs in-process against the configured database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                            help="Endpoint to measure, repeatable (default: all).")
+        parser.add_argument('--requests', type=int, default=200, help="Requests per run (default 200).")
+        parser.add_argument('--concurrency', type=int, default=16, help="In-flight requests (default 16).")
+        parser.add_argument('--cached', action='store_true',
+                            help="Keep the configured caches; by default every request reaches the database.")
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1 or options['concurrency'] < 1:
+            raise CommandError("--requests and --concurrency must be positive.")
+        self.stdout.write(f"{Team.objects.count()} teams, {Driver.objects.count()} drivers, "
+                          f"{Race.objects.count()} races; {options['requests']} requests at "
+                          f"concurrency {options['concurrency']}")
+        self.stdout.write(f"{'endpoint':<12} {'mode':<5} {'req/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'errors':>7}")
+
+        overrides = {} if options['cached'] else {'CACHES': NO_CACHE}
+        with override_settings(**overrides):
+            for endpoint in options['endpoint'] or sorted(ENDPOINTS):
+                sync_name, async_name = ENDPOINTS[endpoint]
+                self.report(endpoint, 'wsgi', *self.run_sync(reverse(sync_name), options))
+                self.report(endpoint, 'asgi', *self.run_async(reverse(async_name), options))
+
+    def run_sync(self, url, options):
+        def fetch(_):
+            started = time.perf_counter()
+            status_code = Client().get(url).status_code
+            return time.perf_counter() - started, status_code
+
+        def close_connection():
+            #each pool thread opened its own connection
+            connections.close_all()
+
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=options['concurrency']) as pool:
+            results = list(pool.map(fetch, range(options['requests'])))
+            list(pool.map(lambda _: close_connection(), range(options['concurrency'])))
+        return time.perf_counter() - started, results
+
+    def run_async(self, url, options):
+        async def run():
+            client = AsyncClient()
+            semaphore = asyncio.Semaphore(options['concurrency'])
+
+            async def fetch():
+                async with semaphore:
+                    started = time.perf_counter()
+                    response = await client.get(url)
+                    return time.perf_counter() - started, response.status_code
+
+            started = time.perf_counter()
+            results = await asyncio.gather(*(fetch() for _ in range(options['requests'])))
+            return time.perf_counter() - started, results
+
+        return asyncio.run(run())
+
+    def report(self, endpoint, mode, elapsed, results):
+        latencies = sorted(latency * 1000 for latency, _ in results)
+        errors = sum(1 for _, status_code in results if status_code != 200)
+        p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+        self.stdout.write(f"{endpoint:<12} {mode:<5} {len(results) / elapsed:>9.1f} "
+                          f"{statistics.median(latencies):>9.2f} {p95:>9.2f} {errors:>7}")
@@ -0,0 +1,68 @@
+import io
+import statistics
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+from racing.parsers import FastJSONParser
+from racing.renderers import FastJSONRenderer, MessagePackRenderer, msgpack, orjson
+from racing.views import DriverListView, RaceListView, TeamListView
+
+ENDPOINTS = {
+    'teams': TeamListView,
+    'drivers': DriverListView,
+    'races': RaceListView,
+}
+
+
+class Command(BaseCommand):
+    help = (
+        "Serialize --rows rows of the team, driver and race list endpoints once, then time "
+        "encoding them with DRF's stdlib JSONRenderer, the orjson renderer and MessagePack "
+        "(and decoding the JSON back with both parsers). Reports bytes/second per format."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--endpoint', action='append', choices=sorted(ENDPOINTS),
+                            help="Endpoint to measure, repeatable (default: all).")
+        parser.add_argument('--rows', type=int, default=10000, help="Rows per payload (default 10000).")
+        parser.add_argument('--repeat', type=int, default=5, help="Timed runs per format (default 5).")
+
+    def handle(self, *args, **options):
+        if options['rows'] < 1 or options['repeat'] < 1:
+            raise CommandError("--rows and --repeat must be positive.")
+        if orjson is None:
+            self.stdout.write("orjson is not installed: the fast renderer and parser fall back to json.")
+        self.stdout.write(f"{'endpoint':<9} {'rows':>6} {'format':<16} {'bytes':>11} {'median ms':>10} {'MB/s':>9}")
+
+        for endpoint in options['endpoint'] or sorted(ENDPOINTS):
+            data = self.payload(ENDPOINTS[endpoint], options['rows'])
+            rows = len(data)
+            body = JSONRenderer().render(data)
+            formats = [('json', lambda: JSONRenderer().render(data)),
+                       ('orjson', lambda: FastJSONRenderer().render(data))]
+            if msgpack is not None:
+                formats.append(('msgpack', lambda: MessagePackRenderer().render(data)))
+            formats += [('json parse', lambda: JSONParser().parse(io.BytesIO(body))),
+                        ('orjson parse', lambda: FastJSONParser().parse(io.BytesIO(body)))]
+            for name, run in formats:
+                size, median = self.measure(run, options['repeat'])
+                self.stdout.write(f"{endpoint:<9} {rows:>6} {name:<16} {size or len(body):>11} "
+                                  f"{median * 1000:>10.2f} {(size or len(body)) / median / 1e6:>9.1f}")
+
+    def payload(self, view_class, rows):
+        #what the list view would render, without paging: same queryset, prefetches and serializer
+        serializer_class = view_class.serializer_class
+        queryset = serializer_class.setup_eager_loading(view_class.queryset.order_by('id'))[:rows]
+        return serializer_class(queryset, many=True).data
+
+    def measure(self, run, repeat):
+        #(bytes produced, or None for the parsers; median seconds)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            output = run()
+            timings.append(time.perf_counter() - started)
+        return (len(output) if isinstance(output, bytes) else None), statistics.median(timings)
@@ -0,0 +1,33 @@
+from django.core.management.base import BaseCommand
+
+from racing.caching import bump_generation, invalidate_rows
+from racing.images import build_logo_renditions
+from racing.models import Team
+
+
+class Command(BaseCommand):
+    help = "Build the logo thumbnails of teams uploaded before renditions existed."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true', help="Rebuild every team, not only the ones missing renditions.")
+
+    def handle(self, *args, **options):
+        teams = Team.objects.exclude(logo='').only('id', 'logo', 'logo_renditions').order_by('id')
+        if not options['all']:
+            teams = teams.filter(logo_renditions={})
+
+        built, missing = [], 0
+        for team in teams.iterator(chunk_size=500):
+            renditions = build_logo_renditions(team.logo, storage=team.logo.storage)
+            if not renditions:
+                missing += 1
+                self.stderr.write(f"Team {team.pk}: logo '{team.logo.name}' could not be read")
+                continue
+            Team.objects.filter(pk=team.pk).update(logo_renditions=renditions)
+            built.append(team.pk)
+
+        if built:
+            #update() sends no signals
+            bump_generation(Team)
+            invalidate_rows(team_ids=built)
+        self.stdout.write(self.style.SUCCESS(f"Built renditions for {len(built)} team(s), {missing} unreadable."))
@@ -0,0 +1,240 @@
+import csv
+import json
+import time
+from pathlib import Path
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+from django.utils.dateparse import parse_date
+
+from racing import counters
+from racing.caching import bump_generation, invalidate_rows
+from racing.models import Driver, Race
+from racing.serializers import match_driver_names
+
+RaceEntry = Race.registered_drivers.through
+
+NAME_LOOKUP_CHUNK = 500      # distinct driver names per lookup query
+MAX_ERRORS_SHOWN = 20
+
+
+class Command(BaseCommand):
+    help = (
+        "Import a season calendar with entry lists from CSV or JSON. "
+        "CSV columns: race_track_name, track_location, race_date, registration_closure_date, "
+        "drivers (';'-separated 'First Last' names). JSON: a list of objects with the same keys, "
+        "drivers as a list. The whole file is validated first, then written in batched transactions. "
+        "Races already in the database (same race_track_name and race_date) are skipped, entries included, "
+        "so a file can be imported again."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help="CSV or JSON file to import.")
+        parser.add_argument('--format', choices=['csv', 'json'], help="Defaults to the file extension.")
+        parser.add_argument('--batch-size', type=int, default=1000, help="Races per transaction (default 1000).")
+        parser.add_argument('--dry-run', action='store_true', help="Validate and report without writing anything.")
+        parser.add_argument('--allow-past-dates', action='store_true',
+                            help="Accept races dated today or earlier (historical imports).")
+
+    def handle(self, *args, **options):
+        path = Path(options['path'])
+        if not path.exists():
+            raise CommandError(f"File not found: {path}")
+        fmt = options['format'] or path.suffix.lstrip('.').lower()
+        if fmt not in ('csv', 'json'):
+            raise CommandError("Cannot tell the file format, pass --format csv|json.")
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+
+        started = time.monotonic()
+        records = self.read(path, fmt)
+        races, entries, errors = self.validate(records, options['allow_past_dates'])
+        entry_count = sum(len(driver_ids) for driver_ids in entries)
+        self.stdout.write(f"Validated {len(records)} races, {entry_count} entries "
+                          f"in {time.monotonic() - started:.2f}s.")
+
+        if errors:
+            for error in errors[:MAX_ERRORS_SHOWN]:
+                self.stderr.write(error)
+            if len(errors) > MAX_ERRORS_SHOWN:
+                self.stderr.write(f"... and {len(errors) - MAX_ERRORS_SHOWN} more.")
+            raise CommandError(f"{len(errors)} invalid row(s), nothing imported.")
+
+        races, entries, skipped = self.skip_existing(races, entries)
+        if skipped:
+            self.stdout.write(f"Skipped {skipped} race(s) already in the database.")
+
+        if options['dry_run']:
+            self.stdout.write(self.style.SUCCESS("Dry run: file is valid, nothing written."))
+            return
+
+        self.write(races, entries, options['batch_size'], started)
+
+    def read(self, path, fmt):
+        try:
+            with path.open(encoding='utf-8', newline='') as handle:
+                if fmt == 'json':
+                    records = json.load(handle)
+                    if not isinstance(records, list):
+                        raise CommandError("JSON input must be a list of races.")
+                    return records
+                records = list(csv.DictReader(handle))
+        except (OSError, UnicodeDecodeError, json.JSONDecodeError, csv.Error) as exc:
+            raise CommandError(f"Cannot read {path}: {exc}")
+        for record in records:
+            names = record.get('drivers') or ''
+            record['drivers'] = [name.strip() for name in names.split(';') if name.strip()]
+        return records
+
+    def validate(self, records, allow_past_dates):
+        """Check every row in Python and resolve all driver names set-wise.
+
+        Returns unsaved Race objects, the driver ids of each race and the error list.
+        """
+        today = timezone.now().date()
+        errors, races, seen = [], [], {}
+
+        for number, record in enumerate(records, start=1):
+            if not isinstance(record, dict):
+                errors.append(f"Row {number}: expected an object.")
+                races.append(None)
+                continue
+            row_errors = []
+            name = self.text(record.get('race_track_name'), 'race_track_name', row_errors)
+            location = self.text(record.get('track_location'), 'track_location', row_errors)
+            if name is not None and (not name or len(name) > 256):
+                row_errors.append("race_track_name is required (max 256 characters)")
+            if location is not None and (not location or len(location) > 100):
+                row_errors.append("track_location is required (max 100 characters)")
+            race_date = self.parse_date(record.get('race_date'), 'race_date', row_errors, required=True)
+            closure_date = self.parse_date(record.get('registration_closure_date'),
+                                           'registration_closure_date', row_errors)
+            if race_date and race_date <= today and not allow_past_dates:
+                row_errors.append("Race date must be in the future.")
+            if race_date and closure_date and closure_date >= race_date:
+                row_errors.append("Registration Closure date must be before the Race date !")
+            if self.driver_names(record) is None:
+                row_errors.append("drivers must be a list of names")
+
+            key = (name, location, race_date)
+            if not row_errors and key in seen:
+                row_errors.append(f"duplicate of row {seen[key]}")
+            seen.setdefault(key, number)
+
+            if row_errors:
+                errors.append(f"Row {number}: " + '; '.join(row_errors))
+                races.append(None)
+            else:
+                races.append(Race(race_track_name=name, track_location=location, race_date=race_date,
+                                  registration_closure_date=closure_date))
+
+        names = sorted({name for record in records if isinstance(record, dict)
+                        for name in self.driver_names(record) or ()})
+        drivers, name_errors = {}, []
+        for start in range(0, len(names), NAME_LOOKUP_CHUNK):
+            found, chunk_errors = match_driver_names(names[start:start + NAME_LOOKUP_CHUNK])
+            drivers.update(found)
+            name_errors += chunk_errors
+        errors += name_errors
+
+        entries = []
+        for record, race in zip(records, races):
+            if race is None:
+                entries.append([])
+                continue
+            entries.append(list(dict.fromkeys(drivers[name].id for name in self.driver_names(record) if name in drivers)))
+        return races, entries, errors
+
+    def skip_existing(self, races, entries):
+        """Drop the races already imported, matched on (race_track_name, race_date) with one
+        query per NAME_LOOKUP_CHUNK dates; returns the other races, their entries and the count."""
+        dates = sorted({race.race_date for race in races})
+        existing = set()
+        for start in range(0, len(dates), NAME_LOOKUP_CHUNK):
+            existing.update(Race.objects.filter(race_date__in=dates[start:start + NAME_LOOKUP_CHUNK])
+                            .values_list('race_track_name', 'race_date'))
+        kept = [(race, race_entries) for race, race_entries in zip(races, entries)
+                if (race.race_track_name, race.race_date) not in existing]
+        return [race for race, _ in kept], [race_entries for _, race_entries in kept], len(races) - len(kept)
+
+    def text(self, value, field, row_errors):
+        #JSON values can be of any type: anything but a string (or a missing value) is an
+        #error, reported here and returned as None
+        if value is None:
+            return ''
+        if not isinstance(value, str):
+            row_errors.append(f"{field} must be a string")
+            return None
+        return value.strip()
+
+    def driver_names(self, record):
+        #the row's driver names (none when missing or null), None unless they are a list of strings
+        names = record.get('drivers')
+        if names is None:
+            return []
+        if isinstance(names, list) and all(isinstance(name, str) for name in names):
+            return names
+        return None
+
+    def parse_date(self, value, field, row_errors, required=False):
+        if value in (None, ''):
+            if required:
+                row_errors.append(f"{field} is required")
+            return None
+        if not isinstance(value, str):
+            row_errors.append(f"{field} must be a YYYY-MM-DD string")
+            return None
+        try:
+            parsed = parse_date(value)
+        except ValueError:
+            parsed = None
+        if parsed is None:
+            row_errors.append(f"{field} '{value}' is not a YYYY-MM-DD date")
+        return parsed
+
+    def write(self, races, entries, batch_size, started):
+        total, written, entry_count, driver_ids = len(races), 0, 0, set()
+        write_started = time.monotonic()
+        for start in range(0, total, batch_size):
+            batch = races[start:start + batch_size]
+            batch_entries = entries[start:start + batch_size]
+            with transaction.atomic():
+                created = Race.objects.bulk_create(batch)
+                if created and created[0].pk is None:
+                    self.fetch_primary_keys(created)
+                rows = [RaceEntry(race_id=race.pk, driver_id=driver_id)
+                        for race, race_driver_ids in zip(created, batch_entries) for driver_id in race_driver_ids]
+                RaceEntry.objects.bulk_create(rows, batch_size=batch_size, ignore_conflicts=True)
+                #the races are new and their driver ids distinct, so every row was inserted
+                counters.entries_changed((row.race_id, row.driver_id) for row in rows)
+            written += len(created)
+            entry_count += len(rows)
+            driver_ids.update(row.driver_id for row in rows)
+            elapsed = time.monotonic() - write_started
+            rate = (written + entry_count) / elapsed if elapsed else 0
+            self.stdout.write(f"  {written}/{total} races, {entry_count} entries ({rate:,.0f} rows/s)")
+
+        #bulk_create sends no signals, so refresh what the receivers would have
+        bump_generation(Race, Driver)
+        invalidate_rows(driver_ids=driver_ids)
+
+        elapsed = time.monotonic() - started
+        rows_per_second = (written + entry_count) / elapsed if elapsed else 0
+        self.stdout.write(self.style.SUCCESS(
+            f"Imported {written} races and {entry_count} entries in {elapsed:.2f}s ({rows_per_second:,.0f} rows/s)."))
+
+    def fetch_primary_keys(self, created):
+        #backends that can't return ids from a bulk insert (MySQL): the batch was just
+        #inserted in this transaction, so read it back newest first and match field by field
+        keys = {}
+        for pk, name, location, race_date, closure in (
+                Race.objects.order_by('-id')[:len(created)]
+                .values_list('id', 'race_track_name', 'track_location', 'race_date', 'registration_closure_date')):
+            keys.setdefault((name, location, race_date, closure), []).append(pk)
+        for race in reversed(created):
+            candidates = keys.get((race.race_track_name, race.track_location, race.race_date,
+                                   race.registration_closure_date))
+            if not candidates:
+                raise CommandError("Could not read back the ids of an inserted batch; retry with a smaller --batch-size.")
+            race.pk = candidates.pop(0)
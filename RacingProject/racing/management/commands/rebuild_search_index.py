@@ -0,0 +1,21 @@
+from django.core.management.base import BaseCommand
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from racing import search
+
+
+class Command(BaseCommand):
+    help = "Re-index every driver, team and race in the SQLite full-text search table."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def handle(self, *args, **options):
+        connection = connections[options['database']]
+        if connection.vendor != 'sqlite':
+            self.stdout.write(f"Nothing to rebuild on {connection.vendor}: its search indexes are maintained by the database.")
+            return
+        with transaction.atomic(using=options['database']):
+            search.ensure_triggers(connection)
+            search.rebuild(connection)
+        self.stdout.write(self.style.SUCCESS("Search index rebuilt."))
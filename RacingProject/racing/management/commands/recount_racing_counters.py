@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+
+from racing import counters
+from racing.caching import bump_generation
+from racing.models import Race, Team
+
+
+class Command(BaseCommand):
+    help = (
+        "Recompute Race.registered_driver_count, Team.driver_count and Team.registered_driver_count "
+        "from the tables and correct the rows that drifted (e.g. after raw SQL writes)."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=counters.RECOUNT_BATCH_SIZE,
+                            help=f"Rows per UPDATE (default {counters.RECOUNT_BATCH_SIZE}).")
+
+    def handle(self, *args, **options):
+        if options['batch_size'] < 1:
+            raise CommandError("--batch-size must be positive.")
+        with transaction.atomic():
+            corrected = counters.recount(options['batch_size'])
+        if any(corrected.values()):
+            bump_generation(Team, Race)
+        for counter, rows in corrected.items():
+            self.stdout.write(f"  {counter}: {rows} row(s) corrected")
+        self.stdout.write(self.style.SUCCESS(f"Counters recounted, {sum(corrected.values())} row(s) corrected."))
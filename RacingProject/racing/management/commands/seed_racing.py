@@ -0,0 +1,50 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from racing.seeding import seed
+
+
+class Command(BaseCommand):
+    help = (
+        "Generate synthetic teams, drivers, races and race entries with batched bulk_create, "
+        "for load tests and benchmark datasets. All teams share one logo file."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--teams', type=int, default=0)
+        parser.add_argument('--drivers', type=int, default=0)
+        parser.add_argument('--races', type=int, default=0)
+        parser.add_argument('--entries-per-race', type=int, default=0,
+                            help="Distinct drivers registered to each new race.")
+        parser.add_argument('--batch-size', type=int, default=5000, help="Rows per INSERT/transaction (default 5000).")
+        parser.add_argument('--seed', type=int, default=0, help="Random seed, for reproducible datasets.")
+
+    def handle(self, *args, **options):
+        counts = [options[name] for name in ('teams', 'drivers', 'races', 'entries_per_race')]
+        if any(count < 0 for count in counts) or options['batch_size'] < 1:
+            raise CommandError("Counts must not be negative and --batch-size must be positive.")
+        if not any(counts[:3]):
+            raise CommandError("Nothing to do: pass --teams, --drivers and/or --races.")
+
+        started = time.monotonic()
+        last = {}
+
+        def progress(model, written):
+            elapsed = time.monotonic() - started
+            last[model] = written
+            self.stdout.write(f"  {model._meta.verbose_name_plural}: {written} "
+                              f"({sum(last.values()) / elapsed if elapsed else 0:,.0f} rows/s)")
+
+        try:
+            created = seed(teams=options['teams'], drivers=options['drivers'], races=options['races'],
+                           entries_per_race=options['entries_per_race'], batch_size=options['batch_size'],
+                           seed=options['seed'], progress=progress)
+        except ValueError as exc:
+            raise CommandError(str(exc))
+
+        elapsed = time.monotonic() - started
+        total = sum(created.values())
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {created['teams']} teams, {created['drivers']} drivers, {created['races']} races and "
+            f"{created['entries']} entries in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} rows/s)."))
@@ -0,0 +1,196 @@
+import json
+import logging
+import time
+from collections import Counter
+from contextvars import ContextVar
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+
+from .routers import pin_seconds, reads_on_replica, replica_alias
+
+logger = logging.getLogger('racing.requests')
+
+#stats of the request being handled; a ContextVar so that queries run by async views
+#(in sync_to_async threads, which copy the context) are counted too
+current_stats = ContextVar('racing_request_stats', default=None)
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.statements = Counter()
+
+    def record(self, sql, duration):
+        self.queries += 1
+        self.db_time += duration
+        self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        #same SQL text run again, whatever the parameters: the shape of an N+1
+        return sum(count - 1 for count in self.statements.values())
+
+    def top_duplicate(self):
+        if not self.statements:
+            return None, 0
+        sql, count = self.statements.most_common(1)[0]
+        return (sql, count) if count > 1 else (None, 0)
+
+
+def record_query(execute, sql, params, many, context):
+    stats = current_stats.get()
+    if stats is None:
+        return execute(sql, params, many, context)
+    started = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        stats.record(sql, time.perf_counter() - started)
+
+
+def install(connection):
+    if record_query not in connection.execute_wrappers:
+        connection.execute_wrappers.append(record_query)
+
+
+@receiver(connection_created)
+def instrument_connection(sender, connection, **kwargs):
+    #connections are per thread; this catches the ones opened by sync_to_async workers
+    install(connection)
+
+
+class QueryTimingMiddleware:
+    """Measure every request's SQL: query count, DB time, duplicate queries and view time.
+
+    The numbers go out in a ``Server-Timing`` header (unless ``RACING_SERVER_TIMING`` is
+    False), and requests slower than ``RACING_SLOW_REQUEST_MS`` (default 500; None turns
+    it off) are logged as one JSON line on the ``racing.requests`` logger, with the most
+    repeated statement. Enable it with ``'racing.middleware.QueryTimingMiddleware'`` near
+    the top of ``MIDDLEWARE``. Queries made while a streamed response is consumed come
+    after the measurement and aren't counted.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        for alias in connections:
+            install(connections[alias])
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    async def __acall__(self, request):
+        stats = RequestStats()
+        token = current_stats.set(stats)
+        started = time.perf_counter()
+        try:
+            response = await self.get_response(request)
+        finally:
+            current_stats.reset(token)
+        return self.finish(request, response, stats, time.perf_counter() - started)
+
+    def finish(self, request, response, stats, elapsed):
+        if getattr(settings, 'RACING_SERVER_TIMING', True):
+            response['Server-Timing'] = (
+                f'db;dur={stats.db_time * 1000:.2f};desc="{stats.queries} queries, {stats.duplicates} duplicates", '
+                f'view;dur={elapsed * 1000:.2f}'
+            )
+
+        threshold = getattr(settings, 'RACING_SLOW_REQUEST_MS', 500)
+        if threshold is not None and elapsed * 1000 >= threshold:
+            sql, count = stats.top_duplicate()
+            record = {
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'view_ms': round(elapsed * 1000, 2),
+                'db_ms': round(stats.db_time * 1000, 2),
+                'queries': stats.queries,
+                'duplicates': stats.duplicates,
+                'top_duplicate_sql': sql,
+                'top_duplicate_count': count,
+            }
+            logger.warning(json.dumps(record), extra={'request_stats': record})
+        return response
+
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS', 'TRACE')
+
+
+class ReplicaMiddleware:
+    """Serve safe-method requests from the read replica, with read-your-writes.
+
+    Works with ``racing.routers.ReplicaRouter`` and ``RACING_REPLICA_DATABASE`` (without
+    it the middleware is skipped). Other methods run on the primary, and once one succeeds
+    the client gets the ``RACING_PRIMARY_COOKIE`` cookie (default ``racing_primary``) for
+    ``RACING_REPLICA_PIN_SECONDS`` (default 10): until it expires that client reads from
+    the primary too, so it sees its own writes whatever the replica lag.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        alias = replica_alias()
+        if not alias:
+            raise MiddlewareNotUsed
+        if alias not in settings.DATABASES:
+            raise ImproperlyConfigured(f"RACING_REPLICA_DATABASE {alias!r} is not in DATABASES.")
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        token = reads_on_replica.set(self.may_use_replica(request))
+        try:
+            response = self.get_response(request)
+        finally:
+            reads_on_replica.reset(token)
+        return self.finish(request, response)
+
+    async def __acall__(self, request):
+        token = reads_on_replica.set(self.may_use_replica(request))
+        try:
+            response = await self.get_response(request)
+        finally:
+            reads_on_replica.reset(token)
+        return self.finish(request, response)
+
+    @staticmethod
+    def cookie_name():
+        return getattr(settings, 'RACING_PRIMARY_COOKIE', 'racing_primary')
+
+    def may_use_replica(self, request):
+        if request.method not in SAFE_METHODS:
+            return False
+        try:
+            #the cookie holds the time the pin ends; max_age is up to the client to honour
+            return float(request.COOKIES.get(self.cookie_name(), 0)) <= time.time()
+        except ValueError:
+            return True
+
+    def finish(self, request, response):
+        if request.method not in SAFE_METHODS and response.status_code < 400:
+            seconds = pin_seconds()
+            response.set_cookie(self.cookie_name(), str(int(time.time() + seconds) + 1), max_age=seconds,
+                                httponly=True, samesite='Lax')
+        return response
@@ -0,0 +1,21 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:15
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('racing', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='driver',
+            index=models.Index(fields=['last_name', 'first_name', 'id'], name='driver_name_order_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='race',
+            index=models.Index(fields=['race_date', 'id'], name='race_date_order_idx'),
+        ),
+    ]
@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:16
+
+from functools import reduce
+from operator import or_
+
+from django.db import migrations, models
+from django.db.models import Count, Q
+
+MAX_DUPLICATES_SHOWN = 20
+
+
+def check_duplicate_drivers(apps, schema_editor):
+    #the constraint can't be added over rows that already break it: list them, so they can
+    #be merged or corrected by hand before migrating again
+    Driver = apps.get_model('racing', 'Driver')
+    drivers = Driver.objects.using(schema_editor.connection.alias)
+    groups = list(drivers.values('first_name', 'last_name', 'dob').annotate(n=Count('id')).filter(n__gt=1)
+                  .order_by('last_name', 'first_name', 'dob'))
+    if not groups:
+        return
+    shown = groups[:MAX_DUPLICATES_SHOWN]
+    ids = {}
+    for pk, first_name, last_name, dob in (
+            drivers.filter(reduce(or_, (Q(first_name=group['first_name'], last_name=group['last_name'], dob=group['dob'])
+                                        for group in shown)))
+            .order_by('id').values_list('id', 'first_name', 'last_name', 'dob')):
+        ids.setdefault((first_name, last_name, dob), []).append(str(pk))
+    lines = [f"  {group['first_name']} {group['last_name']} ({group['dob']}): ids "
+             + ', '.join(ids[group['first_name'], group['last_name'], group['dob']]) for group in shown]
+    if len(groups) > MAX_DUPLICATES_SHOWN:
+        lines.append(f"  ... and {len(groups) - MAX_DUPLICATES_SHOWN} more.")
+    raise RuntimeError(
+        f"Cannot add unique_driver_identity: {len(groups)} name and date of birth combination(s) belong to "
+        f"more than one driver. Merge or correct these drivers, then migrate again:\n" + '\n'.join(lines))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('racing', '0002_keyset_pagination_indexes'),
+    ]
+
+    operations = [
+        migrations.RunPython(check_duplicate_drivers, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='driver',
+            constraint=models.UniqueConstraint(fields=('first_name', 'last_name', 'dob'), name='unique_driver_identity', violation_error_message='Driver already exists'),
+        ),
+    ]
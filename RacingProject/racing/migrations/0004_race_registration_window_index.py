@@ -0,0 +1,17 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('racing', '0003_driver_identity_constraint'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='race',
+            index=models.Index(fields=['registration_closure_date'], name='race_closure_date_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:20
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('racing', '0004_race_registration_window_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='team',
+            name='logo_renditions',
+            field=models.JSONField(blank=True, default=dict, editable=False),
+        ),
+    ]
@@ -0,0 +1,84 @@
+from django.db import migrations
+
+#The index as it was when this migration was written; racing.search holds the live
+#definitions (and restores the SQLite triggers after later table rebuilds).
+SQLITE_INSTALL = [
+    "CREATE VIRTUAL TABLE IF NOT EXISTS racing_search_driver USING fts5("
+    "name, detail, tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+    "CREATE TRIGGER IF NOT EXISTS racing_driver_search_ai AFTER INSERT ON racing_driver BEGIN "
+    "INSERT INTO racing_search_driver(rowid, name, detail) VALUES (new.id, new.first_name || ' ' || new.last_name, ''); END",
+    "CREATE TRIGGER IF NOT EXISTS racing_driver_search_au AFTER UPDATE OF first_name, last_name ON racing_driver BEGIN "
+    "DELETE FROM racing_search_driver WHERE rowid = old.id; "
+    "INSERT INTO racing_search_driver(rowid, name, detail) VALUES (new.id, new.first_name || ' ' || new.last_name, ''); END",
+    "CREATE TRIGGER IF NOT EXISTS racing_driver_search_ad AFTER DELETE ON racing_driver BEGIN "
+    "DELETE FROM racing_search_driver WHERE rowid = old.id; END",
+
+    "CREATE VIRTUAL TABLE IF NOT EXISTS racing_search_team USING fts5("
+    "name, detail, tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+    "CREATE TRIGGER IF NOT EXISTS racing_team_search_ai AFTER INSERT ON racing_team BEGIN "
+    "INSERT INTO racing_search_team(rowid, name, detail) VALUES (new.id, new.name, new.location); END",
+    "CREATE TRIGGER IF NOT EXISTS racing_team_search_au AFTER UPDATE OF name, location ON racing_team BEGIN "
+    "DELETE FROM racing_search_team WHERE rowid = old.id; "
+    "INSERT INTO racing_search_team(rowid, name, detail) VALUES (new.id, new.name, new.location); END",
+    "CREATE TRIGGER IF NOT EXISTS racing_team_search_ad AFTER DELETE ON racing_team BEGIN "
+    "DELETE FROM racing_search_team WHERE rowid = old.id; END",
+
+    "CREATE VIRTUAL TABLE IF NOT EXISTS racing_search_race USING fts5("
+    "name, detail, tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+    "CREATE TRIGGER IF NOT EXISTS racing_race_search_ai AFTER INSERT ON racing_race BEGIN "
+    "INSERT INTO racing_search_race(rowid, name, detail) VALUES (new.id, new.race_track_name, new.track_location); END",
+    "CREATE TRIGGER IF NOT EXISTS racing_race_search_au AFTER UPDATE OF race_track_name, track_location ON racing_race BEGIN "
+    "DELETE FROM racing_search_race WHERE rowid = old.id; "
+    "INSERT INTO racing_search_race(rowid, name, detail) VALUES (new.id, new.race_track_name, new.track_location); END",
+    "CREATE TRIGGER IF NOT EXISTS racing_race_search_ad AFTER DELETE ON racing_race BEGIN "
+    "DELETE FROM racing_search_race WHERE rowid = old.id; END",
+
+    #index the rows already there
+    "INSERT INTO racing_search_driver(rowid, name, detail) SELECT id, first_name || ' ' || last_name, '' FROM racing_driver",
+    "INSERT INTO racing_search_team(rowid, name, detail) SELECT id, name, location FROM racing_team",
+    "INSERT INTO racing_search_race(rowid, name, detail) SELECT id, race_track_name, track_location FROM racing_race",
+]
+SQLITE_UNINSTALL = [
+    f"DROP TRIGGER IF EXISTS racing_{kind}_search_{suffix}" for kind in ('driver', 'team', 'race')
+    for suffix in ('ai', 'au', 'ad')
+] + [f"DROP TABLE IF EXISTS racing_search_{kind}" for kind in ('driver', 'team', 'race')]
+
+POSTGRESQL_INSTALL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS racing_driver_search_trgm ON racing_driver "
+    "USING gin ((first_name || ' ' || last_name) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS racing_team_search_trgm ON racing_team USING gin ((name) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS racing_team_search_detail_trgm ON racing_team USING gin ((location) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS racing_race_search_trgm ON racing_race USING gin ((race_track_name) gin_trgm_ops)",
+    "CREATE INDEX IF NOT EXISTS racing_race_search_detail_trgm ON racing_race USING gin ((track_location) gin_trgm_ops)",
+]
+POSTGRESQL_UNINSTALL = [
+    f"DROP INDEX IF EXISTS racing_{kind}_search{suffix}_trgm" for kind in ('driver', 'team', 'race')
+    for suffix in ('', '_detail')
+]
+
+
+def run(schema_editor, statements):
+    for statement in statements.get(schema_editor.connection.vendor, []):
+        schema_editor.execute(statement)
+
+
+def install_search_index(apps, schema_editor):
+    run(schema_editor, {'sqlite': SQLITE_INSTALL, 'postgresql': POSTGRESQL_INSTALL})
+
+
+def uninstall_search_index(apps, schema_editor):
+    run(schema_editor, {'sqlite': SQLITE_UNINSTALL, 'postgresql': POSTGRESQL_UNINSTALL})
+
+
+class Migration(migrations.Migration):
+    """Full-text search index: an FTS5 table with triggers on SQLite, trigram indexes
+    on PostgreSQL, nothing elsewhere (racing.search falls back to prefix lookups)."""
+
+    dependencies = [
+        ('racing', '0005_team_logo_renditions'),
+    ]
+
+    operations = [
+        migrations.RunPython(install_search_index, uninstall_search_index),
+    ]
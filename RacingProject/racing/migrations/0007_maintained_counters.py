@@ -0,0 +1,59 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:45
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def counted(queryset, key):
+    rows = queryset.filter(**{key: OuterRef('pk')}).order_by().values(key).annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), Value(0))
+
+
+def backfill_counters(apps, schema_editor):
+    Team, Driver, Race = (apps.get_model('racing', name) for name in ('Team', 'Driver', 'Race'))
+    RaceEntry = Race.registered_drivers.through
+    using = schema_editor.connection.alias
+    Race.objects.using(using).update(registered_driver_count=counted(RaceEntry.objects.using(using), 'race_id'))
+    Team.objects.using(using).update(
+        driver_count=counted(Driver.objects.using(using), 'team_id'),
+        registered_driver_count=counted(RaceEntry.objects.using(using), 'driver__team_id'),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('racing', '0006_search_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='race',
+            name='registered_driver_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='driver_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='team',
+            name='registered_driver_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(backfill_counters, migrations.RunPython.noop),
+        migrations.AddIndex(
+            model_name='race',
+            index=models.Index(fields=['registered_driver_count', 'id'], name='race_entry_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['driver_count', 'id'], name='team_driver_count_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='team',
+            index=models.Index(fields=['registered_driver_count', 'id'], name='team_entry_count_idx'),
+        ),
+    ]
@@ -0,0 +1,22 @@
+# Generated by Django 5.2.18 on 2026-10-18 08:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('racing', '0007_maintained_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='race',
+            name='capacity',
+            field=models.PositiveIntegerField(blank=True, help_text='Grid size; leave empty for unlimited entries.', null=True),
+        ),
+        migrations.AddConstraint(
+            model_name='race',
+            constraint=models.CheckConstraint(condition=models.Q(('capacity__isnull', True), ('registered_driver_count__lte', models.F('capacity')), _connector='OR'), name='race_within_capacity', violation_error_message='The race is full.'),
+        ),
+    ]
@@ -1,8 +1,11 @@
-from django.db import models
+from django.db import connections, models, router, transaction
+from django.db.models import Case, Exists, F, OuterRef, Q, Value, When
 from django.core.exceptions import ValidationError
 from django.utils import timezone
 from django.core.validators import FileExtensionValidator
 import datetime
+import os
+from django.urls import reverse
 
 # Create your models here.
 #Custom validations
@@ -17,51 +20,222 @@ def validate_dob(value):
 def validate_future_date(value):
     if value <= timezone.now().date():
         raise ValidationError("Race date must be in the future.")
+
+def race_entries():
+    #the Race <-> Driver registration (through) table
+    return Race.registered_drivers.through.objects
+
+
+def lock_rows(queryset):
+    #until the end of the transaction; SQLite has no row locks, so a no-op UPDATE takes
+    #the database write lock instead (as racing.registration.lock_races does)
+    if connections[queryset.db].features.has_select_for_update:
+        list(queryset.select_for_update().values_list('pk', flat=True))
+    else:
+        pk = queryset.model._meta.pk.attname
+        queryset.update(**{pk: F(pk)})
+
+
+class DeleteGuardMixin:
+    """delete() refuses (ValidationError) while the object has race entries. The check and
+    the delete run in one transaction, after locking the rows a registration would touch
+    (locked_for_delete()), so no entry can come in between."""
+    delete_blocked_message = None
+
+    def locked_for_delete(self, using):
+        return type(self).objects.using(using).filter(pk=self.pk)
+
+    def delete(self, *args, **kwargs):
+        using = kwargs.get('using') or router.db_for_write(type(self), instance=self)
+        with transaction.atomic(using=using):
+            lock_rows(self.locked_for_delete(using))
+            if self.has_race_entries(using=using):
+                raise ValidationError(self.delete_blocked_message)
+            return super().delete(*args, **kwargs)
+
+
+#Delete preflight: a team, driver or race with race entries can't be deleted.
+#with_race_entries() flags a whole queryset with one EXISTS subquery per row,
+#has_race_entries() checks a single object with one EXISTS query.
+class TeamQuerySet(models.QuerySet):
+    def with_race_entries(self):
+        return self.annotate(race_entries_exist=Exists(race_entries().filter(driver__team=OuterRef('pk'))))
+
+
+class DriverQuerySet(models.QuerySet):
+    def with_race_entries(self):
+        return self.annotate(race_entries_exist=Exists(race_entries().filter(driver=OuterRef('pk'))))
+
+
+class CountedModel(models.Model):
+    """Base of models with maintained counter columns (see racing.counters).
+
+    The counters are only written with F() updates, so saving an existing row leaves
+    them out: a stale instance must not write its old counts back.
+    """
+    counter_fields = ()
+
+    class Meta:
+        abstract = True
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and kwargs.get('update_fields') is None and not kwargs.get('force_insert'):
+            kwargs['update_fields'] = [field.name for field in self._meta.concrete_fields
+                                       if not field.primary_key and field.name not in self.counter_fields]
+        super().save(*args, **kwargs)
+
         
-class Team(models.Model):
+class Team(DeleteGuardMixin, CountedModel):
     name = models.CharField(max_length=256, unique=True )
     location = models.CharField(max_length=256)
     logo = models.ImageField(upload_to='logos/',validators=[validate_image_size],null=False,blank=False)
     description = models.TextField(max_length=1024, null=True, blank=True)
+    logo_renditions = models.JSONField(default=dict, blank=True, editable=False)   #{size: storage name}, see racing.images
+    driver_count = models.PositiveIntegerField(default=0, editable=False)
+    registered_driver_count = models.PositiveIntegerField(default=0, editable=False)   #race entries of its drivers
+
+    objects = TeamQuerySet.as_manager()
+    counter_fields = ('driver_count', 'registered_driver_count')
+    delete_blocked_message = "Cannot delete team with drivers registered to races."
+
+    class Meta:
+        indexes = [
+            #?ordering= and ?min_drivers= / ?min_entries= of the team list
+            models.Index(fields=['driver_count', 'id'], name='team_driver_count_idx'),
+            models.Index(fields=['registered_driver_count', 'id'], name='team_entry_count_idx'),
+        ]
+
+    def save(self, *args, **kwargs):
+        #thumbnails are built once, when a new logo file is uploaded
+        if self.logo and not self.logo._committed:
+            from .images import build_logo_renditions
+            self.logo_renditions = build_logo_renditions(self.logo, storage=self.logo.storage)
+            update_fields = kwargs.get('update_fields')
+            if update_fields is not None and 'logo' in update_fields:
+                kwargs['update_fields'] = set(update_fields) | {'logo_renditions'}
+        super().save(*args, **kwargs)
+
+    def rendition_url(self, size):
+        name = self.logo_renditions.get(str(size))
+        if not name:
+            return None
+        return reverse('logo-rendition', args=[os.path.basename(name)])
+
+    @property
+    def logo_thumbnail_url(self):
+        return self.rendition_url(64) or (self.logo.url if self.logo else '')
+
+    def has_race_entries(self, using=None):
+        return race_entries().using(using).filter(driver__team_id=self.pk).exists()
+
+    def locked_for_delete(self, using):
+        #an entry locks its driver's row (a foreign key), not the team's
+        return Driver.objects.using(using).filter(team_id=self.pk)
 
     def delete(self, *args, **kwargs):
-        for driver in self.drivers.all():
-            if driver.registered_races.exists():
-                raise ValidationError("Cannot delete team with drivers registered to races.")
-        super().delete(*args, **kwargs)
+        from .counters import deferred
+        with deferred():       #one counter update for all the cascaded drivers
+            return super().delete(*args, **kwargs)
 
 
     def __str__(self):
         return self.name
 
    
-class Driver(models.Model):
+class Driver(DeleteGuardMixin, models.Model):
     first_name = models.CharField(max_length=96, null=False)
     last_name = models.CharField(max_length=96, null=False)
     dob = models.DateField(validators=[validate_dob])
     team = models.ForeignKey(Team,  null=True, blank=True, on_delete= models.CASCADE, related_name='drivers')
 
-    def delete(self, *args, **kwargs):
-        if self.registered_races.exists():
-            raise ValidationError("Cannot delete driver registered to a race.")
-        super().delete(*args, **kwargs)
+    objects = DriverQuerySet.as_manager()
+    delete_blocked_message = "Cannot delete driver registered to a race."
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['last_name', 'first_name', 'id'], name='driver_name_order_idx'),   #keyset pagination order
+        ]
+        constraints = [
+            #its index also serves the (first_name, last_name) lookups of the serializers
+            models.UniqueConstraint(fields=['first_name', 'last_name', 'dob'], name='unique_driver_identity',
+                                    violation_error_message="Driver already exists"),
+        ]
+
+    #The team the stored row has, recorded whenever it is read (and by the post_save
+    #receiver), so a save can tell a team move without querying the old row again
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        driver = super().from_db(db, field_names, values)
+        if 'team_id' in driver.__dict__:
+            driver._loaded_team_id = driver.team_id
+        return driver
+
+    def refresh_from_db(self, using=None, fields=None, from_queryset=None):
+        super().refresh_from_db(using=using, fields=fields, from_queryset=from_queryset)
+        if fields is None or {'team', 'team_id'} & set(fields):
+            self._loaded_team_id = self.team_id
+
+    def has_race_entries(self, using=None):
+        return race_entries().using(using).filter(driver_id=self.pk).exists()
 
-    
-    def clean(self):
-        if Driver.objects.exclude(pk=self.pk).filter(first_name= self.first_name, last_name=self.last_name, dob= self.dob).exists():
-            raise ValidationError("Driver already exists")
 
     def __str__(self):
         return f"{self.first_name} {self.last_name}"
 
 
-class Race(models.Model):
+class RaceQuerySet(models.QuerySet):
+    #Registration is open until the end of registration_closure_date, or until race day when no closure date is set.
+    def open_condition(self, today=None):
+        today = today or timezone.now().date()
+        return Q(registration_closure_date__gte=today) | Q(registration_closure_date__isnull=True, race_date__gt=today)
+
+    def upcoming(self, today=None):
+        return self.filter(race_date__gt=today or timezone.now().date())
+
+    def open_for_registration(self, today=None):
+        return self.filter(self.open_condition(today))
+
+    def closed_for_registration(self, today=None):
+        return self.exclude(self.open_condition(today))
+
+    def with_race_entries(self):
+        return self.annotate(race_entries_exist=Exists(race_entries().filter(race=OuterRef('pk'))))
+
+    def with_registration_status(self, today=None):
+        return self.annotate(registration_status=Case(
+            When(self.open_condition(today), then=Value('open')),
+            default=Value('closed'),
+            output_field=models.CharField(),
+        ))
+
+
+class Race(DeleteGuardMixin, CountedModel):
     race_track_name = models.CharField(max_length=256)
     track_location = models.CharField(max_length=100)
     race_date = models.DateField(validators=[validate_future_date]) 
     registration_closure_date = models.DateField(blank=True, null=True)
     registered_drivers = models.ManyToManyField(Driver, related_name='registered_races', blank=True, null=True)
 #null=True is not valid for ManyToManyField. Only blank=True is needed.
+    registered_driver_count = models.PositiveIntegerField(default=0, editable=False)
+    capacity = models.PositiveIntegerField(null=True, blank=True,
+                                           help_text="Grid size; leave empty for unlimited entries.")
+
+    objects = RaceQuerySet.as_manager()
+    counter_fields = ('registered_driver_count',)
+    delete_blocked_message = "Cannot delete race with registered drivers."
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['race_date', 'id'], name='race_date_order_idx'),   #keyset pagination order, race_date ranges
+            models.Index(fields=['registration_closure_date'], name='race_closure_date_idx'),
+            models.Index(fields=['registered_driver_count', 'id'], name='race_entry_count_idx'),
+        ]
+        constraints = [
+            #last line of defence against over-subscription, see racing.registration
+            models.CheckConstraint(condition=Q(capacity__isnull=True) | Q(registered_driver_count__lte=F('capacity')),
+                                   name='race_within_capacity',
+                                   violation_error_message="The race is full."),
+        ]
  
     def __str__(self):
         return self.race_track_name
@@ -71,10 +245,8 @@ class Race(models.Model):
             if self.registration_closure_date >= self.race_date:
                 raise ValidationError("Registration Closure date must be before the Race date !")
 
-    def delete(self, *args, **kwargs):
-        if self.registered_drivers.exists():
-            raise ValidationError("Cannot delete race with registered drivers.")
-        super().delete(*args, **kwargs)
+    def has_race_entries(self, using=None):
+        return race_entries().using(using).filter(race_id=self.pk).exists()
 
 
 
@@ -0,0 +1,194 @@
+import json
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models import Q
+from rest_framework.exceptions import NotFound, ValidationError
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+
+
+class KeysetPagination(BasePagination):
+    """Cursor pagination on the full ``ordering`` tuple.
+
+    The cursor stores the ordering values of the last (or first) row of a page,
+    and the next page is fetched with ``WHERE (a, b, id) > (...)`` expanded into
+    plain comparisons. Every page is an index range scan of ``page_size`` rows,
+    however deep it is. ``ordering`` must end with a unique field.
+
+    ``orderings`` names the alternatives a client may pick with ``?ordering=``; each
+    needs an index on its full tuple to keep the range scans.
+    """
+    ordering = ('id',)
+    orderings = {}
+    ordering_query_param = 'ordering'
+    page_size = 50
+    max_page_size = 500
+    page_size_query_param = 'page_size'
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Invalid cursor'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        return self.finish_page(list(self.page_queryset(queryset, request)))
+
+    async def apaginate_queryset(self, queryset, request, view=None):
+        #same page through the async ORM, for the async read views
+        return self.finish_page([row async for row in self.page_queryset(queryset, request)])
+
+    def page_queryset(self, queryset, request):
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        self.ordering = self.get_ordering(request)
+        self.fields = [field.lstrip('-') for field in self.ordering]
+        self.descending = [field.startswith('-') for field in self.ordering]
+
+        self.position, self.reverse = self.decode_cursor(request, queryset.model)
+        ordering = self.ordering
+        if self.reverse:
+            ordering = [field[1:] if field.startswith('-') else f'-{field}' for field in ordering]
+        queryset = queryset.order_by(*ordering)
+        if self.position is not None:
+            queryset = queryset.filter(self.after(self.position, self.reverse))
+        return queryset[:self.page_size + 1]
+
+    def finish_page(self, rows):
+        has_more = len(rows) > self.page_size
+        rows = rows[:self.page_size]
+        if self.reverse:
+            rows.reverse()
+
+        #coming back from a later page means there is always a next page, and vice versa
+        if self.reverse:
+            self.has_next, self.has_previous = self.position is not None, has_more
+        else:
+            self.has_next, self.has_previous = has_more, self.position is not None
+        self.page = rows
+        return rows
+
+    def after(self, position, reverse=False):
+        #(a, b, c) > (x, y, z)  ==  a > x OR (a = x AND b > y) OR (a = x AND b = y AND c > z)
+        condition = Q()
+        for i, field in enumerate(self.fields):
+            greater = self.descending[i] == reverse
+            term = Q(**{f'{field}__{"gt" if greater else "lt"}': position[i]})
+            for prev in range(i):
+                term &= Q(**{self.fields[prev]: position[prev]})
+            condition |= term
+        return condition
+
+    def get_ordering(self, request):
+        name = request.query_params.get(self.ordering_query_param)
+        if not name:
+            return self.ordering
+        if name not in self.orderings:
+            raise ValidationError({self.ordering_query_param: [f"Choose one of: {', '.join(self.orderings)}."]})
+        return self.orderings[name]
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params[self.page_size_query_param])
+        except (KeyError, ValueError):
+            return self.page_size
+        if size <= 0:
+            return self.page_size
+        return min(size, self.max_page_size)
+
+    def get_position(self, instance):
+        return [getattr(instance, field) for field in self.fields]
+
+    def decode_cursor(self, request, model):
+        encoded = request.query_params.get(self.cursor_query_param)
+        if not encoded:
+            return None, False
+        try:
+            data = json.loads(urlsafe_b64decode(encoded.encode('ascii')).decode('utf-8'))
+            position, reverse = data['p'], bool(data.get('r'))
+        except (TypeError, ValueError, KeyError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        if not isinstance(position, list) or len(position) != len(self.fields):
+            raise NotFound(self.invalid_cursor_message)
+        #a hand-edited cursor may hold values its fields can't be compared with
+        try:
+            position = [model._meta.get_field(field).to_python(value) for field, value in zip(self.fields, position)]
+        except (DjangoValidationError, TypeError, ValueError):
+            raise NotFound(self.invalid_cursor_message)
+        if None in position:
+            raise NotFound(self.invalid_cursor_message)
+        return position, reverse
+
+    def encode_cursor(self, instance, reverse):
+        data = {'p': self.get_position(instance)}
+        if reverse:
+            data['r'] = 1
+        encoded = urlsafe_b64encode(json.dumps(data, cls=DjangoJSONEncoder).encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, encoded)
+
+    def get_next_link(self):
+        if not self.has_next or not self.page:
+            return None
+        return self.encode_cursor(self.page[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.has_previous:
+            return None
+        if not self.page:
+            return remove_query_param(self.base_url, self.cursor_query_param)
+        return self.encode_cursor(self.page[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+    def get_paginated_response_schema(self, schema):
+        return {
+            'type': 'object',
+            'required': ['results'],
+            'properties': {
+                'next': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'previous': {'type': 'string', 'nullable': True, 'format': 'uri'},
+                'results': schema,
+            },
+        }
+
+
+class TeamPagination(KeysetPagination):
+    ordering = ('name', 'id')
+    orderings = {
+        'name': ('name', 'id'),
+        'driver_count': ('driver_count', 'id'),
+        '-driver_count': ('-driver_count', '-id'),
+        'registered_driver_count': ('registered_driver_count', 'id'),
+        '-registered_driver_count': ('-registered_driver_count', '-id'),
+    }
+
+
+class DriverPagination(KeysetPagination):
+    ordering = ('last_name', 'first_name', 'id')
+
+
+class RacePagination(KeysetPagination):
+    ordering = ('race_date', 'id')
+    orderings = {
+        'race_date': ('race_date', 'id'),
+        'registered_driver_count': ('registered_driver_count', 'id'),
+        '-registered_driver_count': ('-registered_driver_count', '-id'),
+    }
+
+
+#Autocomplete lookups: short pages, and only the orderings their .only() columns cover
+class DriverLookupPagination(DriverPagination):
+    page_size = 20
+    max_page_size = 50
+    orderings = {}
+
+
+class RaceLookupPagination(RacePagination):
+    page_size = 20
+    max_page_size = 50
+    orderings = {}
@@ -0,0 +1,46 @@
+import codecs
+import csv
+
+from django.conf import settings
+from rest_framework.exceptions import ParseError
+from rest_framework.parsers import BaseParser, FormParser, JSONParser, MultiPartParser
+
+try:
+    import orjson
+except ImportError:     #optional: the stdlib json module is used instead
+    orjson = None
+
+
+class CSVParser(BaseParser):
+    """text/csv with a header row -> list of dicts. Empty cells become None."""
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        try:
+            reader = csv.DictReader(codecs.getreader(encoding)(stream))
+            return [{key: (value if value != '' else None) for key, value in row.items() if key}
+                    for row in reader]
+        except (csv.Error, UnicodeDecodeError) as exc:
+            raise ParseError(f'CSV parse error - {exc}')
+
+
+class FastJSONParser(JSONParser):
+    """JSONParser decoding with orjson when it is installed. orjson takes UTF-8 only and
+    always rejects NaN/Infinity, so other charsets and STRICT_JSON = False go through
+    the stdlib parser."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if orjson is None or not self.strict or codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        try:
+            return orjson.loads(stream.read())
+        except orjson.JSONDecodeError as exc:
+            raise ParseError(f'JSON parse error - {exc}')
+
+
+#The API views' parsers: DRF's defaults with the JSON one swapped
+API_PARSER_CLASSES = [FastJSONParser, FormParser, MultiPartParser]
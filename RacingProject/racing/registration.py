@@ -0,0 +1,236 @@
+from django.core.exceptions import ValidationError
+from django.db import connections, router, transaction
+from django.db.models import Exists, F, OuterRef
+from django.db.models.signals import m2m_changed
+
+from .models import Driver, Race
+
+RaceEntry = Race.registered_drivers.through
+
+#per-driver statuses returned by register_drivers()
+REGISTERED = 'registered'
+ALREADY_REGISTERED = 'already_registered'
+NOT_FOUND = 'not_found'
+RACE_FULL = 'race_full'
+#per-id statuses of the removals in change_registrations()
+REMOVED = 'removed'
+NOT_REGISTERED = 'not_registered'
+
+#Capacity: every path that adds entries locks the race row first (lock_races()), reads
+#the capacity and the maintained registered_driver_count under that lock and only then
+#inserts. Registrations for the same race queue on that one row for a few milliseconds;
+#other races aren't blocked. The race_within_capacity check constraint backs it up.
+
+
+def _send_m2m_changed(instance, action, pk_set, using):
+    #bulk_create() bypasses the related manager, so send the signals .add() would send
+    reverse = isinstance(instance, Driver)
+    m2m_changed.send(sender=RaceEntry, instance=instance, action=action, reverse=reverse,
+                     model=Race if reverse else Driver, pk_set=pk_set, using=using)
+
+
+def _entries(instance, other_ids):
+    #(race_id, driver_id) through rows between ``instance`` and each of ``other_ids``
+    if isinstance(instance, Driver):
+        return [RaceEntry(race_id=pk, driver_id=instance.pk) for pk in other_ids]
+    return [RaceEntry(race_id=instance.pk, driver_id=pk) for pk in other_ids]
+
+
+def _insert_entries(instance, other_ids, using):
+    #one INSERT for the whole delta
+    if other_ids:
+        _send_m2m_changed(instance, 'pre_add', set(other_ids), using)
+        RaceEntry.objects.using(using).bulk_create(_entries(instance, other_ids), ignore_conflicts=True)
+        _send_m2m_changed(instance, 'post_add', set(other_ids), using)
+
+
+def _delete_entries(instance, other_ids, using):
+    #one DELETE; the ids are known to be registered, so post_remove alone carries them
+    if other_ids:
+        column, other = ('driver_id', 'race_id') if isinstance(instance, Driver) else ('race_id', 'driver_id')
+        RaceEntry.objects.using(using).filter(**{column: instance.pk, f'{other}__in': other_ids}).delete()
+        _send_m2m_changed(instance, 'post_remove', set(other_ids), using)
+
+
+def _registered(instance, other_ids, using):
+    column, other = ('driver_id', 'race_id') if isinstance(instance, Driver) else ('race_id', 'driver_id')
+    if not other_ids:
+        return set()
+    return set(RaceEntry.objects.using(using).filter(**{column: instance.pk, f'{other}__in': other_ids})
+               .values_list(other, flat=True))
+
+
+def _removal_report(remove, removing):
+    return [{'id': pk, 'status': REMOVED if pk in removing else NOT_REGISTERED} for pk in remove]
+
+
+def lock_races(race_ids, using):
+    """Lock the race rows until the end of the transaction; returns {id: (capacity, registered)}.
+
+    SQLite has no row locks: a no-op UPDATE takes the database write lock up front
+    instead, so concurrent registrations wait on the busy timeout rather than failing
+    to upgrade a read lock.
+    """
+    races = Race.objects.using(using).filter(id__in=race_ids).order_by('id')    #one lock order, no deadlocks
+    if connections[using].features.has_select_for_update:
+        races = races.select_for_update()
+    else:
+        races.update(capacity=F('capacity'))
+    return {pk: (capacity, registered)
+            for pk, capacity, registered in races.values_list('id', 'capacity', 'registered_driver_count')}
+
+
+def free_seats(capacity, registered):
+    return None if capacity is None else max(capacity - registered, 0)
+
+
+def register_drivers(race, driver_ids, partial=True):
+    """Register the given driver ids to ``race`` and return a per-driver report.
+
+    Known and already registered drivers are found with one query, the new
+    entries are written with a single bulk insert. When the race has fewer free
+    seats than new drivers, the first ones (in request order) get them and the
+    rest are reported as ``race_full``; with ``partial=False`` nobody is registered.
+    """
+    requested = list(dict.fromkeys(driver_ids))
+    using = router.db_for_write(RaceEntry, instance=race)
+
+    with transaction.atomic(using=using):
+        seats = lock_races([race.pk], using)
+        rows = (Driver.objects.using(using)
+                .filter(id__in=requested)
+                .annotate(is_registered=Exists(RaceEntry.objects.filter(race=race, driver=OuterRef('pk'))))
+                .values_list('id', 'is_registered'))
+        known = dict(rows)
+
+        new_ids = [driver_id for driver_id in requested if driver_id in known and not known[driver_id]]
+        free = free_seats(*seats.get(race.pk, (None, 0)))
+        if free is not None and len(new_ids) > free:
+            new_ids = new_ids[:free] if partial else []
+        _insert_entries(race, new_ids, using)
+
+    return [{'driver': driver_id, 'status': status} for driver_id, status in _add_report(requested, known, new_ids)]
+
+
+def _add_report(requested, known, added):
+    added = set(added)
+    for pk in requested:
+        if pk not in known:
+            yield pk, NOT_FOUND
+        elif known[pk]:
+            yield pk, ALREADY_REGISTERED
+        elif pk in added:
+            yield pk, REGISTERED
+        else:
+            yield pk, RACE_FULL
+
+
+def change_registrations(race, add=(), remove=(), partial=True):
+    """Apply an add/remove delta to the entry list of ``race``.
+
+    Work scales with the delta, not the grid: the race lock, one query for the drivers
+    to add, one for the entries to remove, then one INSERT and one DELETE. Removals free
+    their places first. Returns {'add': [{'id', 'status'}], 'remove': [{'id', 'status'}]};
+    with ``partial=False`` a delta that doesn't fit raises ValidationError and writes nothing.
+    """
+    add, remove = list(dict.fromkeys(add)), list(dict.fromkeys(remove))
+    using = router.db_for_write(RaceEntry, instance=race)
+
+    with transaction.atomic(using=using):
+        capacity, registered = lock_races([race.pk], using).get(race.pk, (None, 0))
+        known = dict(Driver.objects.using(using).filter(id__in=add)
+                     .annotate(is_registered=Exists(RaceEntry.objects.filter(race=race, driver=OuterRef('pk'))))
+                     .values_list('id', 'is_registered')) if add else {}
+        removing = _registered(race, [pk for pk in remove if pk not in add], using)
+
+        new_ids = [pk for pk in add if pk in known and not known[pk]]
+        free = free_seats(capacity, registered - len(removing))
+        if free is not None and len(new_ids) > free:
+            if not partial:
+                raise ValidationError(f"The race has {capacity} places, {free} free: {len(new_ids)} drivers to add.")
+            new_ids = new_ids[:free]
+        _delete_entries(race, removing, using)
+        _insert_entries(race, new_ids, using)
+
+    return {
+        'add': [{'id': pk, 'status': status} for pk, status in _add_report(add, known, new_ids)],
+        'remove': _removal_report(remove, removing),
+    }
+
+
+def change_driver_registrations(driver, add=(), remove=(), partial=True):
+    """change_registrations() from the driver's side: ``add`` and ``remove`` are race ids.
+
+    Every race joined needs a free place; the races are locked in id order.
+    """
+    add, remove = list(dict.fromkeys(add)), list(dict.fromkeys(remove))
+    using = router.db_for_write(RaceEntry, instance=driver)
+
+    with transaction.atomic(using=using):
+        seats = lock_races(add, using) if add else {}
+        joined = _registered(driver, add, using)
+        known = {pk: pk in joined for pk in add if pk in seats}
+        removing = _registered(driver, [pk for pk in remove if pk not in add], using)
+
+        new_ids = [pk for pk in add if pk in known and not known[pk] and free_seats(*seats[pk]) != 0]
+        full = [pk for pk in add if pk in known and not known[pk] and pk not in new_ids]
+        if full and not partial:
+            raise ValidationError(f"Full: {', '.join(str(race) for race in Race.objects.using(using).filter(id__in=full))}.")
+        _delete_entries(driver, removing, using)
+        _insert_entries(driver, new_ids, using)
+
+    return {
+        'add': [{'id': pk, 'status': status} for pk, status in _add_report(add, known, new_ids)],
+        'remove': _removal_report(remove, removing),
+    }
+
+
+def set_race_drivers(race, drivers):
+    """Make ``drivers`` the entry list of ``race`` (the edit forms' .set()).
+
+    The list must fit ``race.capacity`` - the value on the instance, which an edit
+    form may be about to save. Raises ValidationError, and changes nothing, when it doesn't.
+    """
+    if race.capacity is not None and len(drivers) > race.capacity:
+        raise ValidationError(f"The race has {race.capacity} places, {len(drivers)} drivers selected.")
+    using = router.db_for_write(RaceEntry, instance=race)
+    with transaction.atomic(using=using):
+        lock_races([race.pk], using)        #wait for registrations in flight
+        race.registered_drivers.set(drivers)
+
+
+def save_race_entries(race, drivers, save):
+    """Save ``race`` through ``save()`` and make ``drivers`` its entry list, in the order the
+    race_within_capacity constraint allows: a capacity that grows (or goes) is saved before
+    the entries are written, one that shrinks after. Both happen under the race lock.
+    """
+    using = router.db_for_write(Race, instance=race)
+    with transaction.atomic(using=using):
+        if race.pk is None:
+            save()
+            set_race_drivers(race, drivers)
+            return race
+        stored, _ = lock_races([race.pk], using).get(race.pk, (None, 0))
+        if race.capacity is not None and (stored is None or race.capacity < stored):
+            set_race_drivers(race, drivers)
+            save()
+        else:
+            save()
+            set_race_drivers(race, drivers)
+    return race
+
+
+def set_driver_races(driver, races):
+    """Make ``races`` the races of ``driver``; every race it joins must have a free seat.
+
+    Raises ValidationError, and changes nothing, when one of them is full.
+    """
+    using = router.db_for_write(RaceEntry, instance=driver)
+    with transaction.atomic(using=using):
+        seats = lock_races([race.pk for race in races], using) if races else {}
+        current = set(RaceEntry.objects.using(using).filter(driver_id=driver.pk).values_list('race_id', flat=True))
+        full = [race for race in races
+                if race.pk not in current and race.pk in seats and free_seats(*seats[race.pk]) == 0]
+        if full:
+            raise ValidationError(f"Full: {', '.join(str(race) for race in full)}.")
+        driver.registered_races.set(races)
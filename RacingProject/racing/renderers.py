@@ -0,0 +1,54 @@
+from rest_framework.renderers import BaseRenderer, BrowsableAPIRenderer, JSONRenderer
+from rest_framework.utils.encoders import JSONEncoder
+
+try:
+    import orjson
+except ImportError:     #optional: the stdlib json module is used instead
+    orjson = None
+
+try:
+    import msgpack
+except ImportError:     #optional: application/msgpack is only offered when installed
+    msgpack = None
+
+
+#types orjson/msgpack don't encode themselves (lazy strings, Decimal, datetimes...) are
+#converted the way DRF's JSON encoder does, so every format carries the same values
+encode_default = JSONEncoder().default
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer output, encoded with orjson when it is installed.
+
+    Indented, ASCII-only or non-compact output (?indent= in the Accept header, the
+    UNICODE_JSON / COMPACT_JSON settings) and installs without orjson go through DRF's
+    stdlib encoder.
+    """
+    #datetimes go through encode_default() for DRF's format (milliseconds, 'Z')
+    ORJSON_OPTIONS = (orjson.OPT_NON_STR_KEYS | orjson.OPT_PASSTHROUGH_DATETIME) if orjson else 0
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if (orjson is None or data is None or self.ensure_ascii or not self.compact
+                or self.get_indent(accepted_media_type, renderer_context or {}) is not None):
+            return super().render(data, accepted_media_type, renderer_context)
+        ret = orjson.dumps(data, default=encode_default, option=self.ORJSON_OPTIONS)
+        #same as JSONRenderer: U+2028/U+2029 are valid JSON but not valid JavaScript
+        return ret.replace(b'\xe2\x80\xa8', b'\\u2028').replace(b'\xe2\x80\xa9', b'\\u2029')
+
+
+class MessagePackRenderer(BaseRenderer):
+    """application/msgpack, picked by the Accept header; needs the msgpack package."""
+    media_type = 'application/msgpack'
+    format = 'msgpack'
+    charset = None
+    render_style = 'binary'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        return msgpack.packb(data, default=encode_default, use_bin_type=True, datetime=False)
+
+
+#The API views' renderers: JSON first (the default for clients that accept anything),
+#the browsable API, then MessagePack when available
+API_RENDERER_CLASSES = [FastJSONRenderer, BrowsableAPIRenderer] + ([MessagePackRenderer] if msgpack else [])
@@ -0,0 +1,49 @@
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS
+
+#Read/write split. ReplicaMiddleware decides per request whether its reads may go to the
+#replica; a ContextVar, so async views (and their sync_to_async threads, which copy the
+#context) route like the request they serve. Outside a request - management commands,
+#tests, streamed responses being consumed - everything stays on the primary.
+reads_on_replica = ContextVar('racing_reads_on_replica', default=False)
+
+
+def replica_alias():
+    return getattr(settings, 'RACING_REPLICA_DATABASE', None)
+
+
+def pin_seconds():
+    #how long a client stays on the primary after a write; also the replica lag we allow for
+    return getattr(settings, 'RACING_REPLICA_PIN_SECONDS', 10)
+
+
+def read_alias():
+    """The database reads go to right now."""
+    alias = replica_alias()
+    return alias if alias and reads_on_replica.get() else DEFAULT_DB_ALIAS
+
+
+def reading_from_replica():
+    return read_alias() != DEFAULT_DB_ALIAS
+
+
+class ReplicaRouter:
+    """Reads go to ``RACING_REPLICA_DATABASE`` while ReplicaMiddleware allows it, everything
+    else to the primary ('default'). Enable it with ``DATABASE_ROUTERS =
+    ['racing.routers.ReplicaRouter']``; both databases hold the same schema.
+    """
+
+    def db_for_read(self, model, **hints):
+        return read_alias()
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        #the replica holds the same rows as the primary
+        aliases = {DEFAULT_DB_ALIAS, replica_alias()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
@@ -0,0 +1,209 @@
+import re
+
+from django.db import connections, router
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Team, Driver, Race
+
+#Search over driver names, team names/locations and race tracks/locations.
+#
+#  SQLite     - an FTS5 table per model (rowid = object id), kept in sync by triggers.
+#  PostgreSQL - pg_trgm GIN expression indexes, queried with word_similarity / ILIKE.
+#  other      - prefix match on the indexed name columns.
+#
+#Triggers (and indexes) live in the database, so bulk_create, update() and raw SQL
+#writes are indexed too. Results: [{'type', 'id', 'name', 'detail'}], best match first.
+#Migration 0006 creates them with its own frozen copy of the DDL; the definitions here
+#serve the queries, the trigger restore after table rebuilds and the rebuild command.
+
+SQLITE_TABLE = 'racing_search_{}'
+KINDS = ('driver', 'team', 'race')
+MODELS = {'driver': Driver, 'team': Team, 'race': Race}
+MAX_TERMS = 8
+#FTS5 ranking function for ORDER BY rank: name matches weigh more than detail matches
+SQLITE_RANK = 'bm25(10.0, 2.0)'
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+#(kind, table, name expression, detail expression) - shared by triggers, rebuild and PostgreSQL
+DOCUMENTS = (
+    ('driver', 'racing_driver', "{t}first_name || ' ' || {t}last_name", "''"),
+    ('team', 'racing_team', "{t}name", "{t}location"),
+    ('race', 'racing_race', "{t}race_track_name", "{t}track_location"),
+)
+WATCHED_COLUMNS = {
+    'driver': 'first_name, last_name',
+    'team': 'name, location',
+    'race': 'race_track_name, track_location',
+}
+
+
+def sqlite_statements():
+    """DDL of the FTS5 tables and their triggers; safe to run again (IF NOT EXISTS)."""
+    statements = []
+    for kind, table, name, detail in DOCUMENTS:
+        index = SQLITE_TABLE.format(kind)
+        insert = (f"INSERT INTO {index}(rowid, name, detail) VALUES "
+                  f"(new.id, {name.format(t='new.')}, {detail.format(t='new.')});")
+        delete = f"DELETE FROM {index} WHERE rowid = old.id;"
+        statements += [
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {index} USING fts5("
+            f"name, detail, tokenize='unicode61 remove_diacritics 2', prefix='1 2 3')",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_ai AFTER INSERT ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_au AFTER UPDATE OF {WATCHED_COLUMNS[kind]} ON {table} "
+            f"BEGIN {delete} {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_ad AFTER DELETE ON {table} BEGIN {delete} END",
+        ]
+    return statements
+
+
+def ensure_triggers(connection):
+    #SQLite drops a table's triggers when a migration rebuilds the table; the copied rows
+    #keep their ids, so recreating the triggers is enough to stay in sync
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM sqlite_master WHERE name = %s", [SQLITE_TABLE.format('driver')])
+        if cursor.fetchone() is None:
+            return       #search migration not applied yet
+        for statement in sqlite_statements():
+            cursor.execute(statement)
+
+
+def rebuild(connection):
+    """Re-index every row (SQLite); for repairs after writes that bypassed the triggers."""
+    if connection.vendor != 'sqlite':
+        return
+    with connection.cursor() as cursor:
+        for kind, table, name, detail in DOCUMENTS:
+            index = SQLITE_TABLE.format(kind)
+            cursor.execute(f"DELETE FROM {index}")
+            cursor.execute(f"INSERT INTO {index}(rowid, name, detail) "
+                           f"SELECT id, {name.format(t='')}, {detail.format(t='')} FROM {table}")
+            cursor.execute(f"INSERT INTO {index}({index}) VALUES ('optimize')")
+
+
+def terms(query):
+    return TOKEN_RE.findall(query.lower())[:MAX_TERMS]
+
+
+def search(query, kinds=KINDS, limit=10):
+    """Ranked, prefix-aware search: every term must match the start of a word, so
+    partial words work for type-ahead. Returns at most ``limit`` results."""
+    words = terms(query)
+    if not words or not kinds:
+        return []
+    connection = connections[router.db_for_read(Driver)]
+    if connection.vendor == 'sqlite':
+        hits = sqlite_search(connection, words, kinds, limit)
+    elif connection.vendor == 'postgresql':
+        hits = postgresql_search(connection, words, kinds, limit)
+    else:
+        hits = prefix_search(words, kinds, limit)
+    return describe(hits)
+
+
+def fts_match(words):
+    #every term prefix-matched: "ham lew" finds Lewis Hamilton
+    return ' '.join(f'"{word}"*' for word in words)
+
+
+def sqlite_search(connection, words, kinds, limit):
+    match = fts_match(words)
+    scored = []
+    with connection.cursor() as cursor:
+        for kind in kinds:
+            index = SQLITE_TABLE.format(kind)
+            #every match is ranked: FTS5 keeps only the best ``limit`` while sorting by rank
+            cursor.execute(
+                f"SELECT rowid, rank FROM {index} WHERE {index} MATCH %s AND rank MATCH %s "
+                f"ORDER BY rank LIMIT %s",
+                [match, SQLITE_RANK, limit],
+            )
+            scored += [(score, kind, pk) for pk, score in cursor.fetchall()]
+    #bm25 is lower-is-better
+    return [(kind, pk) for score, kind, pk in sorted(scored)[:limit]]
+
+
+def postgresql_search(connection, words, kinds, limit):
+    phrase = ' '.join(words)
+    parts, params = [], []
+    for kind, table, name, detail in DOCUMENTS:
+        if kind not in kinds:
+            continue
+        name, detail = name.format(t=''), detail.format(t='')
+        #%> and ILIKE 'x%' are both answered from the gin_trgm_ops indexes
+        parts.append(
+            f"(SELECT '{kind}' AS kind, id, GREATEST(word_similarity(%s, {name}), word_similarity(%s, {detail}) * 0.5) "
+            f"+ CASE WHEN {name} ILIKE %s THEN 1 ELSE 0 END AS score FROM {table} "
+            f"WHERE {name} %%> %s OR {detail} %%> %s OR {name} ILIKE %s ORDER BY score DESC LIMIT %s)"
+        )
+        params += [phrase, phrase, f'{phrase}%', phrase, phrase, f'{phrase}%', limit]
+    with connection.cursor() as cursor:
+        cursor.execute(' UNION ALL '.join(parts) + " ORDER BY score DESC LIMIT %s", params + [limit])
+        return [(kind, pk) for kind, pk, score in cursor.fetchall()]
+
+
+PREFIX_LOOKUPS = {
+    'driver': ['last_name__istartswith', 'first_name__istartswith'],
+    'team': ['name__istartswith'],
+    'race': ['race_track_name__istartswith'],
+}
+
+
+def prefix_search(words, kinds, limit):
+    #no full-text index: the first term as a prefix of the indexed name columns
+    first = words[0]
+    hits = []
+    for kind in kinds:
+        for lookup in PREFIX_LOOKUPS[kind]:
+            ids = MODELS[kind].objects.filter(**{lookup: first}).order_by(lookup.split('__')[0], 'id')
+            hits += [(kind, pk) for pk in ids.values_list('id', flat=True)[:limit] if (kind, pk) not in hits]
+    return hits[:limit]
+
+
+def filter_queryset(queryset, kind, query):
+    """Narrow a queryset of ``kind`` rows to the ones search() would match, unranked,
+    so the caller keeps its own ordering and pagination (the autocomplete lookups)."""
+    words = terms(query)
+    if not words:
+        return queryset
+    connection = connections[queryset.db]
+    if connection.vendor == 'sqlite':
+        index = SQLITE_TABLE.format(kind)
+        return queryset.filter(id__in=RawSQL(f"SELECT rowid FROM {index} WHERE {index} MATCH %s", [fts_match(words)]))
+    if connection.vendor == 'postgresql':
+        table, name, detail = next((table, name.format(t=''), detail.format(t=''))
+                                   for doc_kind, table, name, detail in DOCUMENTS if doc_kind == kind)
+        phrase = ' '.join(words)
+        return queryset.filter(id__in=RawSQL(
+            f"SELECT id FROM {table} WHERE {name} %%> %s OR {detail} %%> %s OR {name} ILIKE %s",
+            [phrase, phrase, f'{phrase}%']))
+    condition = Q()
+    for lookup in PREFIX_LOOKUPS[kind]:
+        condition |= Q(**{lookup: words[0]})
+    return queryset.filter(condition)
+
+
+def describe(hits):
+    #one query per kind present in the hits
+    objects = {}
+    for kind in {kind for kind, pk in hits}:
+        queryset = MODELS[kind].objects.all()
+        if kind == 'driver':
+            queryset = queryset.select_related('team')
+        objects[kind] = queryset.in_bulk([pk for hit_kind, pk in hits if hit_kind == kind])
+
+    results = []
+    for kind, pk in hits:
+        obj = objects[kind].get(pk)
+        if obj is None:
+            continue
+        if kind == 'driver':
+            name, detail = f"{obj.first_name} {obj.last_name}", obj.team.name if obj.team else ''
+        elif kind == 'team':
+            name, detail = obj.name, obj.location
+        else:
+            name, detail = obj.race_track_name, f"{obj.track_location}, {obj.race_date}"
+        results.append({'type': kind, 'id': pk, 'name': name, 'detail': detail})
+    return results
@@ -0,0 +1,198 @@
+import io
+import random
+from datetime import date, timedelta
+from itertools import islice
+
+from django.core.files.base import ContentFile
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image
+
+from . import counters
+from .caching import bump_generation, invalidate_rows
+from .images import build_logo_renditions
+from .models import Team, Driver, Race
+
+#Synthetic, constraint-valid data for load tests and benchmarks, written with bulk_create.
+RaceEntry = Race.registered_drivers.through
+
+FIRST_NAMES = (
+    "Max", "Lewis", "Charles", "Lando", "Oscar", "George", "Carlos", "Fernando", "Sergio", "Pierre",
+    "Esteban", "Yuki", "Alex", "Nico", "Kevin", "Valtteri", "Lance", "Daniel", "Logan", "Oliver",
+    "Liam", "Franco", "Andrea", "Gabriel", "Isack", "Jack", "Kimi", "Sebastian", "Mick", "Antonio",
+    "Zhou", "Nyck", "Felipe", "Jenson", "Mark", "Rubens", "Jarno", "Giancarlo", "Heikki", "Romain",
+    "Marcus", "Pascal", "Brendon", "Jolyon", "Stoffel", "Robert", "Nelson", "Ayrton", "Alain", "Niki",
+    "Mika", "Damon", "Jacques", "Eddie", "David", "Ralf", "Juan", "Emerson", "Jody", "Gilles",
+)
+LAST_NAMES = (
+    "Verstappen", "Hamilton", "Leclerc", "Norris", "Piastri", "Russell", "Sainz", "Alonso", "Perez", "Gasly",
+    "Ocon", "Tsunoda", "Albon", "Hulkenberg", "Magnussen", "Bottas", "Stroll", "Ricciardo", "Sargeant", "Bearman",
+    "Lawson", "Colapinto", "Antonelli", "Bortoleto", "Hadjar", "Doohan", "Raikkonen", "Vettel", "Schumacher", "Giovinazzi",
+    "Guanyu", "DeVries", "Massa", "Button", "Webber", "Barrichello", "Trulli", "Fisichella", "Kovalainen", "Grosjean",
+    "Ericsson", "Wehrlein", "Hartley", "Palmer", "Vandoorne", "Kubica", "Piquet", "Senna", "Prost", "Lauda",
+    "Hakkinen", "Hill", "Villeneuve", "Irvine", "Coulthard", "Montoya", "Fittipaldi", "Scheckter", "Rosberg", "Rindt",
+    "Brundle", "Herbert", "Alesi", "Berger", "Patrese", "Mansell", "Arnoux", "Jones", "Reutemann", "Watson",
+    "Surtees", "Clark", "Stewart", "Brabham", "Hunt", "Peterson", "Ickx", "Andretti", "Depailler", "Laffite",
+)
+CITIES = (
+    "Maranello", "Brackley", "Milton Keynes", "Woking", "Enstone", "Silverstone", "Faenza", "Hinwil", "Kannapolis",
+    "Grove", "Monaco", "Barcelona", "Melbourne", "Suzuka", "Sao Paulo", "Austin", "Montreal", "Spa", "Monza", "Zandvoort",
+)
+TRACKS = (
+    ("Bahrain International Circuit", "Sakhir"), ("Jeddah Corniche Circuit", "Jeddah"),
+    ("Albert Park", "Melbourne"), ("Suzuka", "Japan"), ("Shanghai International Circuit", "China"),
+    ("Miami International Autodrome", "Miami"), ("Imola", "Italy"), ("Circuit de Monaco", "Monaco"),
+    ("Circuit Gilles Villeneuve", "Montreal"), ("Circuit de Barcelona-Catalunya", "Spain"),
+    ("Red Bull Ring", "Austria"), ("Silverstone", "United Kingdom"), ("Hungaroring", "Hungary"),
+    ("Spa-Francorchamps", "Belgium"), ("Zandvoort", "Netherlands"), ("Monza", "Italy"),
+    ("Baku City Circuit", "Azerbaijan"), ("Marina Bay", "Singapore"), ("Circuit of the Americas", "Austin"),
+    ("Autodromo Hermanos Rodriguez", "Mexico City"), ("Interlagos", "Sao Paulo"), ("Las Vegas Strip Circuit", "Las Vegas"),
+    ("Lusail International Circuit", "Qatar"), ("Yas Marina", "Abu Dhabi"),
+)
+
+SEED_LOGO = 'logos/seed_logo.png'
+DOB_BASE = date(1960, 1, 1)
+LATEST_DOB = date(2000, 12, 31)       #validate_dob
+FREE_AGENT_SHARE = 0.05
+
+
+def seed_logo(storage):
+    """The single logo file all seeded teams share, and its renditions."""
+    if not storage.exists(SEED_LOGO):
+        buffer = io.BytesIO()
+        Image.new('RGB', (128, 128), (200, 16, 46)).save(buffer, format='PNG')
+        storage.save(SEED_LOGO, ContentFile(buffer.getvalue()))
+    with storage.open(SEED_LOGO, 'rb') as logo:
+        return SEED_LOGO, build_logo_renditions(logo, storage=storage)
+
+
+def driver_identity(index):
+    """Name and date of birth of the index-th seeded driver.
+
+    A name pair repeats once every len(FIRST_NAMES) * len(LAST_NAMES) drivers, with the
+    date of birth one day later each time, so (first_name, last_name, dob) stays unique.
+    """
+    pairs = len(FIRST_NAMES) * len(LAST_NAMES)
+    pair, cycle = index % pairs, index // pairs
+    dob = DOB_BASE + timedelta(days=(pair * 97) % 10000 + cycle)
+    return FIRST_NAMES[pair % len(FIRST_NAMES)], LAST_NAMES[pair // len(FIRST_NAMES)], dob
+
+
+def max_drivers():
+    return len(FIRST_NAMES) * len(LAST_NAMES) * ((LATEST_DOB - DOB_BASE).days - 10000 + 1)
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+def write(model, objects, batch_size, progress=None):
+    """bulk_create ``objects`` (any iterable) one batch per transaction; returns the row count."""
+    written = 0
+    for batch in batched(objects, batch_size):
+        with transaction.atomic():
+            model.objects.bulk_create(batch)
+        written += len(batch)
+        if progress:
+            progress(model, written)
+    return written
+
+
+def new_ids(model, after):
+    #ids of the rows just written; works on backends where bulk_create returns no pks
+    return list(model.objects.filter(id__gt=after).order_by('id').values_list('id', flat=True))
+
+
+def last_id(model):
+    return model.objects.order_by('-id').values_list('id', flat=True).first() or 0
+
+
+def make_teams(count, start, logo, renditions):
+    for index in range(start, start + count):
+        city = CITIES[index % len(CITIES)]
+        yield Team(name=f"{city} Racing {index + 1}", location=city, logo=logo, logo_renditions=renditions,
+                   description=f"Seeded team based in {city}.")
+
+
+def make_drivers(count, start, team_ids, rng):
+    for index in range(start, start + count):
+        first_name, last_name, dob = driver_identity(index)
+        team_id = rng.choice(team_ids) if team_ids and rng.random() >= FREE_AGENT_SHARE else None
+        yield Driver(first_name=first_name, last_name=last_name, dob=dob, team_id=team_id)
+
+
+def make_races(count, start, rng):
+    today = timezone.now().date()
+    for index in range(start, start + count):
+        track, location = TRACKS[index % len(TRACKS)]
+        race_date = today + timedelta(days=7 + index // len(TRACKS) * 7 + index % len(TRACKS))
+        closure = race_date - timedelta(days=rng.randint(1, 14)) if rng.random() < 0.8 else None
+        yield Race(race_track_name=f"{track} {index // len(TRACKS) + 1}", track_location=location,
+                   race_date=race_date, registration_closure_date=closure)
+
+
+def make_entries(race_ids, driver_ids, per_race, rng):
+    #distinct drivers per race: a window of the driver list at a random offset
+    per_race = min(per_race, len(driver_ids))
+    for race_id in race_ids:
+        offset = rng.randrange(len(driver_ids))
+        for step in range(per_race):
+            yield RaceEntry(race_id=race_id, driver_id=driver_ids[(offset + step) % len(driver_ids)])
+
+
+def seed(teams=0, drivers=0, races=0, entries_per_race=0, batch_size=5000, seed=0, storage=None, progress=None):
+    """Add synthetic teams, drivers, races and race entries; returns the created counts.
+
+    New drivers join the new teams (the existing ones when no team is created), and
+    entries go to the new races, drawn from the new drivers (the existing ones when no
+    driver is created). Counters and row caches are refreshed at the end, as bulk_create
+    sends no signals.
+    """
+    rng = random.Random(seed)
+    #name/identity offsets: a row seeded as the index-th always gets an id above index, so
+    #starting after the highest id never repeats a name still in use; row counts would,
+    #once rows have been deleted
+    start_teams, start_drivers, start_races = last_id(Team), last_id(Driver), last_id(Race)
+    if start_drivers + drivers > max_drivers():
+        raise ValueError(f"At most {max_drivers()} seeded drivers fit the unique name/dob scheme.")
+    created = {'teams': 0, 'drivers': 0, 'races': 0, 'entries': 0}
+    touched_team_ids, touched_driver_ids = [], []
+
+    team_ids = []
+    if teams:
+        storage = storage or Team._meta.get_field('logo').storage
+        logo, renditions = seed_logo(storage)
+        after = start_teams
+        created['teams'] = write(Team, make_teams(teams, start_teams, logo, renditions), batch_size, progress)
+        team_ids = new_ids(Team, after)
+
+    driver_ids = []
+    if drivers:
+        if not team_ids:
+            team_ids = touched_team_ids = list(Team.objects.values_list('id', flat=True))
+        after = start_drivers
+        created['drivers'] = write(Driver, make_drivers(drivers, start_drivers, team_ids, rng), batch_size, progress)
+        driver_ids = new_ids(Driver, after)
+
+    race_ids = []
+    if races:
+        after = start_races
+        created['races'] = write(Race, make_races(races, start_races, rng), batch_size, progress)
+        race_ids = new_ids(Race, after)
+
+    if race_ids and entries_per_race:
+        if not driver_ids:
+            driver_ids = touched_driver_ids = list(Driver.objects.values_list('id', flat=True))
+        if driver_ids:
+            created['entries'] = write(RaceEntry, make_entries(race_ids, driver_ids, entries_per_race, rng),
+                                       batch_size, progress)
+
+    counters.recount()
+    bump_generation(Team, Driver, Race)
+    for batch in batched(touched_team_ids, 1000):
+        invalidate_rows(team_ids=batch)
+    for batch in batched(touched_driver_ids, 1000):
+        invalidate_rows(driver_ids=batch)
+    return created
@@ -1,59 +1,237 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Prefetch
+from django.utils.functional import cached_property
 from rest_framework import serializers
-from .models import Team, Driver, Race
+from django.core.exceptions import ValidationError as DjangoValidationError
+from .models import Team, Driver, Race, validate_dob
+from .registration import save_race_entries, set_race_drivers
 
-class TeamSerializer(serializers.ModelSerializer):
+#Sparse fieldsets: ?fields=id,name renders only the listed fields, ?expand=drivers renders
+#the listed relations as nested objects instead of names. The views hand the same selection
+#to setup_eager_loading(), so a relation that isn't rendered isn't prefetched either.
+def split_names(value):
+    return [name for name in (part.strip() for part in value.split(',')) if name]
+
+
+class FieldSelectionMixin:
+    """Reads ?fields= / ?expand= from the request in the serializer context.
+
+    ``expandable`` maps a field to (serializer class, many) for its nested form. Only
+    the output is trimmed: fields left out are never read (method fields aren't called),
+    while writes still accept every field.
+    """
+    expandable = {}
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        request = self.context.get('request')
+        self.selected_fields, self.expanded = (self.field_selection(request.query_params)
+                                               if request is not None else (None, frozenset()))
+
+    @classmethod
+    def field_selection(cls, query_params):
+        """(names to render, None for all; names to expand); unknown names are a ValidationError."""
+        fields = split_names(query_params.get('fields', '')) or None
+        expand = split_names(query_params.get('expand', ''))
+        errors = {}
+        unknown = sorted(set(fields or ()) - set(cls.Meta.fields))
+        if unknown:
+            errors['fields'] = [f"Unknown field(s): {', '.join(unknown)}."]
+        unknown = sorted(set(expand) - set(cls.expandable))
+        if unknown:
+            errors['expand'] = [f"Cannot expand: {', '.join(unknown)}."]
+        if errors:
+            raise serializers.ValidationError(errors)
+        expand = frozenset(expand)
+        return (None if fields is None else frozenset(fields) | expand), expand
+
+    @cached_property
+    def expanded_fields(self):
+        fields = {}
+        for name in self.expanded:
+            serializer_class, many = self.expandable[name]
+            fields[name] = serializer_class(many=many, read_only=True)
+            fields[name].bind(name, self)
+        return fields
+
+    @property
+    def _readable_fields(self):
+        for field in super()._readable_fields:
+            if self.selected_fields is not None and field.field_name not in self.selected_fields:
+                continue
+            yield self.expanded_fields.get(field.field_name, field)
+
+
+def wants(fields, name):
+    return fields is None or name in fields
+
+
+#nested forms of the relations, for ?expand=
+class TeamBriefSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Team
+        fields = ['id', 'name', 'location']
+
+
+class DriverBriefSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Driver
+        fields = ['id', 'first_name', 'last_name']
+
+
+class RaceBriefSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Race
+        fields = ['id', 'race_track_name', 'race_date']
+
+
+class TeamSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     #drivers= DriversTeamSerializer( many=True, read_only=True)
     drivers = serializers.SerializerMethodField()  #field def'd using SerializerMtdField(w/c is inherently read-only).
+    logo_renditions = serializers.SerializerMethodField()   #{"64": url, "256": url}, immutable thumbnails
+
+    expandable = {'drivers': (DriverBriefSerializer, True)}
 
     class Meta:
         model = Team
-        fields = ['id' ,'name', 'location', 'logo', 'description', 'drivers']
+        fields = ['id' ,'name', 'location', 'logo', 'logo_renditions', 'description', 'drivers',
+                  'driver_count', 'registered_driver_count']
+
+    def get_logo_renditions(self, obj):
+        request = self.context.get('request')
+        renditions = {}
+        for size in obj.logo_renditions:
+            url = obj.rendition_url(size)
+            renditions[size] = request.build_absolute_uri(url) if request else url
+        return renditions
     
     def get_drivers(self, obj):
         return [f"{driver.first_name} {driver.last_name}" for driver in obj.drivers.all()]
 
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=()):
+        if not wants(fields, 'drivers'):
+            return queryset
+        #only the columns get_drivers() and DriverBriefSerializer read (team_id matches the prefetch)
+        return queryset.prefetch_related(
+            Prefetch('drivers', queryset=Driver.objects.only(*DriverBriefSerializer.Meta.fields, 'team_id'))
+        )
 
-class DriverSerializer(serializers.ModelSerializer):
+
+class DriverSerializer(FieldSelectionMixin, serializers.ModelSerializer):
     team= serializers.CharField()  #show only team name, not entire team info &  # Accept team name as input
     #registered_races= RaceShortSerializer(many=True, read_only=True)
     registered_races= serializers.SerializerMethodField()
+    expandable = {'team': (TeamBriefSerializer, False), 'registered_races': (RaceBriefSerializer, True)}
     
     class Meta:
         model = Driver
         fields = [ 'id', 'first_name', 'last_name', 'dob', 'team', 'registered_races']
         #extra_kwargs={ 'registered_races':{'required':False, 'allow_empty':True}   }
+        #duplicates are rejected by the unique_driver_identity constraint, see save_driver()
+        validators = []
 
-    def create(self, validated_data):
-        print("before pop:", validated_data)
-        team_name = validated_data.pop('team')
-        print("after:", team_name)
+    def save_driver(self, save, validated_data, instance=None):
+        #the constraint is race-safe under concurrent creates, unlike a SELECT before INSERT
         try:
-            team = Team.objects.get(name=team_name)
-        except Team.DoesNotExist:
-            raise serializers.ValidationError({'team': 'Team with this name does not exist.'})
-        driver = Driver.objects.create(team=team, **validated_data)
+            with transaction.atomic():
+                return save()
+        except IntegrityError:
+            #only unique_driver_identity means a duplicate; other failures (foreign key, NOT NULL) are bugs
+            identity = {field: validated_data[field] if field in validated_data else getattr(instance, field)
+                        for field in ('first_name', 'last_name', 'dob')}
+            taken = Driver.objects.filter(**identity)
+            if instance is not None:
+                taken = taken.exclude(pk=instance.pk)
+            if taken.exists():
+                raise serializers.ValidationError({'non_field_errors': ["Driver already exists"]})
+            raise
+
+    def create(self, validated_data):
+        #validate_team() already turned the name into a Team instance
+        driver = self.save_driver(lambda: Driver.objects.create(**validated_data), validated_data)
         return driver
     
     def validate_team(self, value):
-        if not Team.objects.filter(name=value).exists():
+        try:
+            return Team.objects.get(name=value)
+        except Team.DoesNotExist:
             raise serializers.ValidationError("Team with this name does not exist.")
-        return value
 
     
     def update(self, instance, validated_data):
-        team_name = validated_data.pop('team', None)
-        if team_name:
-            try:
-                team = Team.objects.get(name=team_name)
-                instance.team = team
-            except Team.DoesNotExist:
-                raise serializers.ValidationError("Team with this name does not exist.")
-        return super().update(instance, validated_data)
+        return self.save_driver(lambda: super(DriverSerializer, self).update(instance, validated_data),
+                                validated_data, instance)
     
     
     def get_registered_races(self, obj):
         return [f"{race.race_track_name} on {race.race_date}" for race in obj.registered_races.all()]
 
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=()):
+        #team name is read through str(driver.team), races through get_registered_races()
+        if wants(fields, 'team'):
+            queryset = queryset.select_related('team')
+        if wants(fields, 'registered_races'):
+            queryset = queryset.prefetch_related(
+                Prefetch('registered_races', queryset=Race.objects.only(*RaceBriefSerializer.Meta.fields))
+            )
+        return queryset
+
+
+def match_driver_names(names):
+    """Look up 'First Last' names with one query.
+
+    Returns ``(drivers, errors)``: ``drivers`` maps each resolvable name to its
+    Driver (duplicates in the input collapse), ``errors`` lists every badly
+    formatted, unknown or ambiguous name.
+    """
+    errors = []
+    wanted = {}                   # (first_name, last_name) -> submitted name
+    for full_name in names:
+        try:
+            first_name, last_name = str(full_name).split(' ', 1)
+        except ValueError:
+            errors.append(f"Invalid driver name format: '{full_name}'. Use 'First Last'.")
+            continue
+        wanted.setdefault((first_name, last_name), full_name)
+
+    matches = {}
+    if wanted:
+        #first_name IN (..) AND last_name IN (..) keeps the SQL flat for long entry lists,
+        #the exact pairs are matched below
+        candidates = Driver.objects.filter(
+            first_name__in={first for first, _ in wanted},
+            last_name__in={last for _, last in wanted},
+        )
+        for driver in candidates:
+            key = (driver.first_name, driver.last_name)
+            if key in wanted:
+                matches.setdefault(key, []).append(driver)
+
+    drivers = {}
+    for key, full_name in wanted.items():
+        found = matches.get(key, [])
+        if not found:
+            errors.append(f"Driver '{full_name}' not found.")
+        elif len(found) > 1:
+            errors.append(f"Driver name '{full_name}' is ambiguous: {len(found)} drivers share it.")
+        else:
+            drivers[full_name] = found[0]
+    return drivers, errors
+
+
+def resolve_driver_names(names):
+    """Resolve a list of 'First Last' names to Driver instances in one query.
+
+    Every badly formatted, unknown or ambiguous name is reported in a single
+    ValidationError. Duplicate names in the input are returned once.
+    """
+    drivers, errors = match_driver_names(names)
+    if errors:
+        raise serializers.ValidationError(errors)
+    return list(drivers.values())
+
 
 class DriverNameListField(serializers.Field):      #to make reg_drivers both read & write field
     def to_representation(self, value):
@@ -68,37 +246,198 @@ class DriverNameListField(serializers.Field):      #to make reg_drivers both rea
         # Convert list of names to driver instances
         if not isinstance(data, list):
             raise serializers.ValidationError("Expected a list of driver names.")
-        
-        driver_objs = []
-        for full_name in data:
-            try:
-                first_name, last_name = full_name.split(' ', 1)
-            except ValueError:
-                raise serializers.ValidationError(
-                    f"Invalid driver name format: '{full_name}'. Use 'First Last'."
-                )
-            try:
-                driver = Driver.objects.get(first_name=first_name, last_name=last_name)
-                driver_objs.append(driver)
-            except Driver.DoesNotExist:
-                raise serializers.ValidationError(f"Driver '{full_name}' not found.")
-        return driver_objs
+        return resolve_driver_names(data)
 
-class RaceSerializer(serializers.ModelSerializer):   
+class RaceSerializer(FieldSelectionMixin, serializers.ModelSerializer):   
     registered_drivers = DriverNameListField()
+    expandable = {'registered_drivers': (DriverBriefSerializer, True)}
     
     
     class Meta:
         model = Race
-        fields = ['id','race_track_name', 'track_location', 'race_date','registration_closure_date','registered_drivers'
+        fields = ['id','race_track_name', 'track_location', 'race_date','registration_closure_date','registered_drivers',
+                  'registered_driver_count', 'capacity'
         ]
+
+    def validate(self, data):
+        capacity = data.get('capacity', getattr(self.instance, 'capacity', None))
+        if 'registered_drivers' in data:
+            entries = len(data['registered_drivers'])
+        else:
+            entries = getattr(self.instance, 'registered_driver_count', 0)
+        if capacity is not None and entries > capacity:
+            raise serializers.ValidationError({'capacity': f"The race has {capacity} places, {entries} drivers registered."})
+        return data
+
+    #the entry list is written by set_race_drivers(), under the race lock (see racing.registration)
+    def create(self, validated_data):
+        drivers = validated_data.pop('registered_drivers', None)
+        if not drivers:
+            return super().create(validated_data)
+        with transaction.atomic():
+            race = super().create(validated_data)
+            self.set_drivers(race, drivers)
+        return race
+
+    def update(self, instance, validated_data):
+        drivers = validated_data.pop('registered_drivers', None)
+        try:
+            if drivers is None:
+                return super().update(instance, validated_data)
+            for attr, value in validated_data.items():
+                setattr(instance, attr, value)
+            try:
+                #capacity first when it grows, entries first when it shrinks
+                return save_race_entries(instance, drivers,
+                                         lambda: super(RaceSerializer, self).update(instance, validated_data))
+            except DjangoValidationError as e:
+                raise serializers.ValidationError({'registered_drivers': e.messages})
+        except IntegrityError:
+            #race_within_capacity: registrations came in after validate()
+            raise serializers.ValidationError({'capacity': "The race has more drivers registered than that."})
+
+    def set_drivers(self, race, drivers):
+        try:
+            set_race_drivers(race, drivers)
+        except DjangoValidationError as e:
+            raise serializers.ValidationError({'registered_drivers': e.messages})
+
+    @staticmethod
+    def setup_eager_loading(queryset, fields=None, expand=()):
+        #DriverNameListField only renders the driver names
+        if not wants(fields, 'registered_drivers'):
+            return queryset
+        return queryset.prefetch_related(
+            Prefetch('registered_drivers', queryset=Driver.objects.only(*DriverBriefSerializer.Meta.fields))
+        )
    
+class UpcomingRaceSerializer(RaceSerializer):
+    registration_status = serializers.CharField(read_only=True)   #annotated by RaceQuerySet.with_registration_status()
+
+    class Meta(RaceSerializer.Meta):
+        fields = RaceSerializer.Meta.fields + ['registration_status']
+
+
+#Query parameters of the upcoming races endpoint
+class UpcomingRaceFilterSerializer(serializers.Serializer):
+    status = serializers.ChoiceField(choices=['open', 'closed'], required=False)
+    date_from = serializers.DateField(required=False)
+    date_to = serializers.DateField(required=False)
+
+    def validate(self, data):
+        if data.get('date_from') and data.get('date_to') and data['date_from'] > data['date_to']:
+            raise serializers.ValidationError("date_from must not be after date_to.")
+        return data
+
+#Query parameters of the team and race lists: ranges of the maintained counters,
+#?min_<name>= / ?max_<name>= for each entry of ``counters`` (name -> model field)
+class CounterFilterSerializer(serializers.Serializer):
+    counters = {}
+
+    def get_fields(self):
+        fields = super().get_fields()
+        for name in self.counters:
+            fields[f'min_{name}'] = serializers.IntegerField(min_value=0, required=False)
+            fields[f'max_{name}'] = serializers.IntegerField(min_value=0, required=False)
+        return fields
+
+    def validate(self, data):
+        for name in self.counters:
+            low, high = data.get(f'min_{name}'), data.get(f'max_{name}')
+            if low is not None and high is not None and low > high:
+                raise serializers.ValidationError(f"min_{name} must not be above max_{name}.")
+        return data
+
+
+class TeamListFilterSerializer(CounterFilterSerializer):
+    counters = {'drivers': 'driver_count', 'entries': 'registered_driver_count'}
+
+
+class RaceListFilterSerializer(CounterFilterSerializer):
+    counters = {'entries': 'registered_driver_count'}
+
+#Query parameters of the search endpoint
+class SearchQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100)
+    type = serializers.CharField(required=False)        #comma-separated: driver,team,race
+    limit = serializers.IntegerField(min_value=1, max_value=50, default=10)
+
+    def validate_type(self, value):
+        kinds = [kind.strip() for kind in value.split(',') if kind.strip()]
+        unknown = [kind for kind in kinds if kind not in ('driver', 'team', 'race')]
+        if unknown or not kinds:
+            raise serializers.ValidationError("Use a comma-separated list of driver, team and race.")
+        return kinds
+
+#Autocomplete lookups: ?q= narrows the list as search() would, see racing.search.filter_queryset
+class LookupQuerySerializer(serializers.Serializer):
+    q = serializers.CharField(max_length=100, required=False, allow_blank=True)
+
+
+class DriverLookupSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    text = serializers.SerializerMethodField()
+
+    def get_text(self, obj):
+        return f"{obj.first_name} {obj.last_name}"
+
+
+class RaceLookupSerializer(serializers.Serializer):
+    id = serializers.IntegerField()
+    text = serializers.SerializerMethodField()
+
+    def get_text(self, obj):
+        return f"{obj.race_track_name} ({obj.race_date})"
+
 #When using ModelSerializer, need to add Meta cls with model name & fields
 #Here, use  'serializers.Serializer' , as taking a list of names
 
 #Serializers - To pass driver IDs, race IDs in POST data      
 class AddDriversToRaceSerializer1(serializers.Serializer):      
-    drivers= serializers.PrimaryKeyRelatedField(many= True, queryset= Driver.objects.all()) 
+    drivers= serializers.ListField(child= serializers.IntegerField(min_value=1), max_length=1000)
+
+    def validate_drivers(self, value):
+        if not value:
+            return value
+        #all ids checked with one query (a related field would fetch them one by one)
+        known = set(Driver.objects.filter(id__in=value).values_list('id', flat=True))
+        missing = [pk for pk in dict.fromkeys(value) if pk not in known]
+        if missing:
+            raise serializers.ValidationError(f"Unknown driver ids: {missing}.")
+        return value
+
+
+#One row of the bulk driver endpoint - field checks only, the batch is resolved in racing.bulk
+class DriverBulkRowSerializer(serializers.Serializer):
+    id= serializers.IntegerField(min_value=1, required=False, allow_null=True)
+    first_name= serializers.CharField(max_length=96)
+    last_name= serializers.CharField(max_length=96)
+    dob= serializers.DateField(validators=[validate_dob])
+    team= serializers.CharField(max_length=256, required=False, allow_null=True, allow_blank=True)
+
+
+#Bulk delete by ids - partitioned set-wise in racing.deletion
+class BulkDeleteSerializer(serializers.Serializer):
+    ids= serializers.ListField(child= serializers.IntegerField(min_value=1), allow_empty=False, max_length=5000)
+
+
+#Bulk registration by driver ids - resolved set-wise in racing.registration
+class RaceRegistrationSerializer(serializers.Serializer):
+    drivers= serializers.ListField(child= serializers.IntegerField(min_value=1), allow_empty=False, max_length=1000)
+
+
+#Registration delta: ids to add and to remove, applied by racing.registration.change_registrations()
+class RegistrationChangeSerializer(serializers.Serializer):
+    add= serializers.ListField(child= serializers.IntegerField(min_value=1), default=list, max_length=1000)
+    remove= serializers.ListField(child= serializers.IntegerField(min_value=1), default=list, max_length=1000)
+
+    def validate(self, data):
+        if not data['add'] and not data['remove']:
+            raise serializers.ValidationError("Nothing to add or remove.")
+        both = set(data['add']) & set(data['remove'])
+        if both:
+            raise serializers.ValidationError(f"Ids both added and removed: {sorted(both)}.")
+        return data
 
 
 #To accept names as i/p - resolve them to actual model instances
@@ -106,27 +445,20 @@ class AddDriversToRaceSerializer2(serializers.Serializer):      #Using driver na
     drivers= serializers.ListField(child= serializers.CharField())
 
     def validate_drivers(self, value):
-        driver_objs= []
-        existing_drivers= []         # already_registered
+        drivers = resolve_driver_names(value)
         race= self.context.get('race')     #race s/d b passed via Serializer context
 
-        for name in value:
-            try:
-                first_name, last_name= name.split(' ',1)    #Assume first_name + last_name is unique
-                driver= Driver.objects.get(first_name= first_name, last_name= last_name)
-
-                if race and driver in race.registered_drivers.all():
-                    existing_drivers.append(name)
-                else:
-                    driver_objs.append(driver)
-
-            except(Driver.DoesNotExist, ValueError):
-                raise serializers.ValidationError( f"Driver '{name}' not found or invalid format : Use 'first last'")
+        existing_drivers= []         # already_registered
+        if race:
+            #one query for the submitted ids instead of scanning the entry list per name
+            registered_ids = set(race.registered_drivers.filter(id__in=[driver.id for driver in drivers])
+                                 .values_list('id', flat=True))
+            existing_drivers = [str(driver) for driver in drivers if driver.id in registered_ids]
 
         if existing_drivers:
             raise serializers.ValidationError( f" Driver(s) {', '.join(existing_drivers)} already registered for the race !")
         else:
-            return driver_objs
+            return drivers
 '''
 #Allow only valid drivers in .save()
     def save(self, **kwargs):
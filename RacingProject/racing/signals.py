@@ -0,0 +1,130 @@
+from collections import Counter
+
+from django.db import connections
+from django.db.models.signals import m2m_changed, post_delete, post_migrate, post_save, pre_save
+from django.dispatch import receiver
+
+from . import counters
+from .caching import bump_generation, invalidate_rows
+from .models import Driver, Race, Team
+from .search import ensure_triggers
+
+RaceEntry = Race.registered_drivers.through
+
+
+#What each list row shows:
+#  team row   - team fields + its drivers' names
+#  driver row - driver fields + team name + registered races (name, date)
+#  race row   - race fields + registered drivers' names
+
+@receiver(pre_save, sender=Driver)
+def remember_previous_team(sender, instance, raw=False, **kwargs):
+    if raw or instance.pk is None:
+        instance._previous_team_id = None
+    elif hasattr(instance, '_loaded_team_id'):
+        instance._previous_team_id = instance._loaded_team_id       #see Driver.from_db()
+    else:
+        #built by hand (or its team deferred): read the stored row
+        instance._previous_team_id = (Driver.objects.filter(pk=instance.pk)
+                                      .values_list('team_id', flat=True).first())
+
+
+@receiver(post_save, sender=Team)
+def team_saved(sender, instance, **kwargs):
+    bump_generation(Team)
+    invalidate_rows(team_ids=[instance.pk],
+                    driver_ids=Driver.objects.filter(team_id=instance.pk).values_list('id', flat=True))
+
+
+@receiver(post_save, sender=Driver)
+def driver_saved(sender, instance, created=False, raw=False, **kwargs):
+    if not raw:
+        count_driver_move(instance, created)
+    bump_generation(Driver)
+    invalidate_rows(team_ids={instance.team_id, getattr(instance, '_previous_team_id', None)},
+                    driver_ids=[instance.pk],
+                    race_ids=RaceEntry.objects.filter(driver_id=instance.pk).values_list('race_id', flat=True))
+    instance._loaded_team_id = instance.team_id         #what the row holds now
+
+
+def count_driver_move(driver, created):
+    previous_team_id = None if created else getattr(driver, '_previous_team_id', driver.team_id)
+    if previous_team_id == driver.team_id:
+        return
+    counters.adjust(Team, 'driver_count', Counter({driver.team_id: 1, previous_team_id: -1}))
+    if not created:
+        #its race entries move with it
+        entries = RaceEntry.objects.filter(driver_id=driver.pk).count()
+        counters.adjust(Team, 'registered_driver_count',
+                        Counter({driver.team_id: entries, previous_team_id: -entries}))
+
+
+@receiver(post_save, sender=Race)
+def race_saved(sender, instance, **kwargs):
+    bump_generation(Race)
+    invalidate_rows(race_ids=[instance.pk],
+                    driver_ids=RaceEntry.objects.filter(race_id=instance.pk).values_list('driver_id', flat=True))
+
+
+#Deletes are blocked while race entries exist (see has_race_entries()), and a cascaded
+#team delete sends post_delete for each of its drivers, so these need no queries -
+#bulk deletes stay at a constant query count (their counter updates are batched by
+#counters.deferred()).
+@receiver(post_delete, sender=Team)
+def team_deleted(sender, instance, **kwargs):
+    bump_generation(Team)
+    invalidate_rows(team_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Driver)
+def driver_deleted(sender, instance, **kwargs):
+    counters.adjust(Team, 'driver_count', {instance.team_id: -1})
+    bump_generation(Driver)
+    invalidate_rows(team_ids=[instance.team_id], driver_ids=[instance.pk])
+
+
+@receiver(post_delete, sender=Race)
+def race_deleted(sender, instance, **kwargs):
+    bump_generation(Race)
+    invalidate_rows(race_ids=[instance.pk])
+
+
+@receiver(m2m_changed, sender=RaceEntry)
+def registrations_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action == 'pre_remove':
+        #post_remove's pk_set also holds ids that weren't registered; keep the real ones
+        column, other = ('driver_id', 'race_id') if reverse else ('race_id', 'driver_id')
+        instance._removed_pks = set(RaceEntry.objects.filter(**{column: instance.pk, f'{other}__in': pk_set})
+                                    .values_list(other, flat=True))
+        return
+    if action == 'pre_clear':
+        #post_clear carries no pk_set, so collect the affected side before the rows go
+        if reverse:
+            instance._cleared_pks = set(RaceEntry.objects.filter(driver_id=instance.pk).values_list('race_id', flat=True))
+        else:
+            instance._cleared_pks = set(RaceEntry.objects.filter(race_id=instance.pk).values_list('driver_id', flat=True))
+        return
+    if action == 'post_clear':
+        pk_set = instance.__dict__.pop('_cleared_pks', set())
+    elif action == 'post_remove':
+        #a post_remove sent without pre_remove (racing.registration) carries the exact ids
+        pk_set = instance.__dict__.pop('_removed_pks', pk_set)
+    elif action != 'post_add':
+        return
+
+    bump_generation(Race, Driver)    #entry lists and registered_races both change
+    if reverse:     # driver.registered_races
+        driver_ids, race_ids = [instance.pk], pk_set
+    else:           # race.registered_drivers
+        driver_ids, race_ids = pk_set, [instance.pk]
+    #post_add's pk_set only holds the new entries
+    counters.entries_changed([(race_id, driver_id) for race_id in race_ids for driver_id in driver_ids],
+                             sign=1 if action == 'post_add' else -1)
+    invalidate_rows(driver_ids=driver_ids, race_ids=race_ids)
+
+
+#A migration that rebuilds one of the searched tables on SQLite drops its search triggers
+@receiver(post_migrate)
+def restore_search_triggers(sender, using='default', **kwargs):
+    if sender.name == 'racing':
+        ensure_triggers(connections[using])
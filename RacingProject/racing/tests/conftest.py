@@ -0,0 +1,31 @@
+import pytest
+from django.core.cache import cache
+from racing.tests import factories
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    #list-row fragments and API responses are cached; start every test cold
+    cache.clear()
+    yield
+    cache.clear()
+
+
+@pytest.fixture
+def logo_upload():
+    return factories.logo_upload()
+
+
+@pytest.fixture
+def team(db):
+    return factories.make_team()
+
+
+@pytest.fixture
+def driver(team):
+    return factories.make_driver(team=team)
+
+
+@pytest.fixture
+def race(db):
+    return factories.make_race()
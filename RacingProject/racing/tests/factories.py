@@ -0,0 +1,53 @@
+import io
+from datetime import timedelta
+from functools import lru_cache
+from itertools import count
+
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.utils import timezone
+from PIL import Image
+
+from racing.models import Team, Driver, Race
+from racing.seeding import driver_identity
+
+#Row factories for tests: every call gives a new, constraint-valid object, with any
+#field overridable. Larger datasets come from racing.seeding.seed().
+sequence = count(1)
+
+LOGO = 'logos/logo.png'       #stored name only, for teams that never read the file
+
+
+@lru_cache(maxsize=None)
+def logo_bytes(size=(100, 100)):
+    buffer = io.BytesIO()
+    Image.new('RGB', size, (200, 16, 46)).save(buffer, format='PNG')
+    return buffer.getvalue()
+
+
+def logo_upload(name='logo.png'):
+    #a fresh upload object each call, the PNG is only drawn once
+    return SimpleUploadedFile(name, logo_bytes(), content_type='image/png')
+
+
+def make_team(**fields):
+    n = next(sequence)
+    fields.setdefault('name', f"Team {n}")
+    fields.setdefault('location', "Silverstone")
+    fields.setdefault('logo', LOGO)
+    return Team.objects.create(**fields)
+
+
+def make_driver(**fields):
+    first_name, last_name, dob = driver_identity(next(sequence))
+    fields.setdefault('first_name', first_name)
+    fields.setdefault('last_name', last_name)
+    fields.setdefault('dob', dob)
+    return Driver.objects.create(**fields)
+
+
+def make_race(**fields):
+    n = next(sequence)
+    fields.setdefault('race_track_name', f"Track {n}")
+    fields.setdefault('track_location', "Somewhere")
+    fields.setdefault('race_date', timezone.now().date() + timedelta(days=10 + n % 300))
+    return Race.objects.create(**fields)
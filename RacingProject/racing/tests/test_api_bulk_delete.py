@@ -0,0 +1,64 @@
+from datetime import date, timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from racing.models import Team, Driver, Race
+
+
+class BulkDeleteAPITests(APITestCase):
+
+    def setUp(self):
+        today = timezone.now().date()
+        self.teams = [Team.objects.create(name=f"Team {i}", location="Somewhere", logo="logos/logo.png")
+                      for i in range(4)]
+        self.drivers = [
+            Driver.objects.create(first_name=f"Driver{i}", last_name="Grid", dob=date(1990, 1, i + 1), team=self.teams[i])
+            for i in range(4)
+        ]
+        self.races = [Race.objects.create(race_track_name=f"Track {i}", track_location="Location",
+                                          race_date=today + timedelta(days=10 + i))
+                      for i in range(4)]
+        self.races[0].registered_drivers.add(self.drivers[0])
+
+    def test_bulk_delete_teams(self):
+        ids = [team.id for team in self.teams] + [999]
+        response = self.client.post(reverse('team-bulk-delete'), {'ids': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['blocked'], [self.teams[0].id])
+        self.assertEqual(response.data['not_found'], [999])
+        self.assertEqual(sorted(response.data['deleted']), sorted(team.id for team in self.teams[1:]))
+        self.assertEqual(list(Team.objects.values_list('id', flat=True)), [self.teams[0].id])
+        #drivers of deleted teams cascade, the registered one stays
+        self.assertEqual(list(Driver.objects.values_list('id', flat=True)), [self.drivers[0].id])
+
+    def test_bulk_delete_drivers(self):
+        ids = [driver.id for driver in self.drivers]
+        response = self.client.post(reverse('driver-bulk-delete'), {'ids': ids}, format='json')
+        self.assertEqual(response.data['blocked'], [self.drivers[0].id])
+        self.assertEqual(len(response.data['deleted']), 3)
+        self.assertEqual(Driver.objects.count(), 1)
+
+    def test_bulk_delete_races(self):
+        ids = [race.id for race in self.races]
+        response = self.client.post(reverse('race-bulk-delete'), {'ids': ids}, format='json')
+        self.assertEqual(response.data['blocked'], [self.races[0].id])
+        self.assertEqual(Race.objects.count(), 1)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        def count_queries(ids):
+            with CaptureQueriesContext(connection) as captured:
+                self.client.post(reverse('race-bulk-delete'), {'ids': ids}, format='json')
+            return len(captured)
+
+        small = count_queries([self.races[1].id])
+        today = timezone.now().date()
+        more = [Race.objects.create(race_track_name=f"Extra {i}", track_location="Location",
+                                    race_date=today + timedelta(days=30 + i)).id for i in range(10)]
+        self.assertEqual(count_queries(more), small)
+
+    def test_bulk_delete_requires_ids(self):
+        response = self.client.post(reverse('team-bulk-delete'), {'ids': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -1,21 +1,20 @@
 
+from django.db import IntegrityError, connection
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
+from rest_framework.exceptions import ValidationError
 from datetime import date
 from racing.models import Driver, Team
+from racing.serializers import DriverSerializer
 from django.core.files.uploadedfile import SimpleUploadedFile
-import tempfile
-from PIL import Image
+from racing.tests.factories import logo_upload
 
 class DriverAPITestCase(APITestCase):
 
     def generate_logo(self):
-        image = Image.new('RGB', (100, 100))
-        tmp_file = tempfile.NamedTemporaryFile(suffix='.png')
-        image.save(tmp_file, format='PNG')
-        tmp_file.seek(0)
-        return SimpleUploadedFile("logo.png", tmp_file.read(), content_type='image/png')
+        return logo_upload()
 
     def setUp(self):
         self.team = Team.objects.create(
@@ -96,3 +95,98 @@ class DriverAPITestCase(APITestCase):
         response = self.client.post(url, invalid_data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('dob', response.data)
+
+    def test_create_duplicate_driver(self):
+        url = reverse('driver-create')
+        self.client.post(url, self.driver_data, format='json')
+        response = self.client.post(url, self.driver_data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(response.data['non_field_errors'][0], "Driver already exists")
+        self.assertEqual(Driver.objects.count(), 1)
+
+    def test_other_integrity_errors_are_not_duplicates(self):
+        def fail():
+            raise IntegrityError("NOT NULL constraint failed: racing_driver.dob")
+        serializer = DriverSerializer()
+        identity = {'first_name': "Max", 'last_name': "Verstappen", 'dob': date(1997, 9, 30)}
+        with self.assertRaises(IntegrityError):
+            serializer.save_driver(fail, identity)
+        driver = Driver.objects.create(**identity)
+        #an update keeping its own identity isn't a duplicate of itself
+        with self.assertRaises(IntegrityError):
+            serializer.save_driver(fail, {'first_name': "Max"}, driver)
+        with self.assertRaises(ValidationError):
+            serializer.save_driver(fail, identity)
+
+
+class DriverBulkAPITestCase(APITestCase):
+
+    def setUp(self):
+        self.teams = [Team.objects.create(name=f"Team {i}", location="Somewhere", logo="logos/logo.png") for i in range(2)]
+        self.existing = Driver.objects.create(first_name="Max", last_name="Verstappen", dob="1997-09-30", team=self.teams[0])
+        self.url = reverse('driver-bulk-save')
+
+    def rows(self, count, start=0):
+        return [{"first_name": f"Junior{i}", "last_name": "Series", "dob": f"1999-01-{i % 28 + 1:02d}",
+                 "team": self.teams[i % 2].name} for i in range(start, start + count)]
+
+    def test_bulk_create_and_update(self):
+        rows = self.rows(3) + [{"id": self.existing.id, "first_name": "Max", "last_name": "Verstappen",
+                                "dob": "1997-09-30", "team": self.teams[1].name}]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([result['status'] for result in response.data['results']],
+                         ['created', 'created', 'created', 'updated'])
+        self.assertEqual(Driver.objects.filter(last_name="Series").count(), 3)
+        self.existing.refresh_from_db()
+        self.assertEqual(self.existing.team, self.teams[1])
+
+    def test_query_count_independent_of_batch_size(self):
+        with CaptureQueriesContext(connection) as small:
+            self.client.post(self.url, self.rows(2), format='json')
+        with CaptureQueriesContext(connection) as large:
+            self.client.post(self.url, self.rows(40, start=2), format='json')
+        self.assertEqual(len(small), len(large))
+
+    def test_per_row_errors_reject_the_batch(self):
+        rows = self.rows(2) + [
+            {"first_name": "No", "last_name": "Team", "dob": "1990-01-01", "team": "Missing Team"},
+            {"first_name": "Max", "last_name": "Verstappen", "dob": "1997-09-30"},
+            {"first_name": "Too", "last_name": "Young", "dob": "2010-01-01"},
+        ]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertEqual([error['row'] for error in response.data['errors']], [4])     # field errors first
+        rows.pop()
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        errors = {error['row']: error['errors'] for error in response.data['errors']}
+        self.assertIn('team', errors[2])
+        self.assertEqual(errors[3]['non_field_errors'], ["Driver already exists"])
+        self.assertEqual(Driver.objects.count(), 1)
+
+    def test_identities_are_checked_against_the_final_state(self):
+        lando = Driver.objects.create(first_name="Lando", last_name="Norris", dob="1999-11-13")
+        #a swap, and a new driver taking the identity an update gives up
+        rows = [{"id": self.existing.id, "first_name": "Lando", "last_name": "Norris", "dob": "1999-11-13"},
+                {"id": lando.id, "first_name": "Oscar", "last_name": "Piastri", "dob": "2000-04-06"},
+                {"first_name": "Max", "last_name": "Verstappen", "dob": "1997-09-30"}]
+        response = self.client.post(self.url, rows, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK, response.data)
+        self.assertEqual(sorted(Driver.objects.values_list('first_name', flat=True)), ["Lando", "Max", "Oscar"])
+        self.assertEqual(Driver.objects.get(pk=self.existing.pk).last_name, "Norris")
+        rows = [{"id": self.existing.id, "first_name": "Oscar", "last_name": "Piastri", "dob": "2000-04-06"},
+                {"id": lando.id, "first_name": "Lando", "last_name": "Norris", "dob": "1999-11-13"}]
+        self.assertEqual(self.client.post(self.url, rows, format='json').status_code, status.HTTP_200_OK)
+        self.assertEqual(Driver.objects.get(pk=lando.pk).first_name, "Lando")
+
+    def test_bulk_create_from_csv(self):
+        content = "first_name,last_name,dob,team\nAnna,Csv,1995-05-05,Team 0\nBen,Csv,1996-06-06,\n"
+        response = self.client.generic('POST', self.url, content, content_type='text/csv')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(Driver.objects.filter(last_name="Csv").count(), 2)
+        self.assertIsNone(Driver.objects.get(first_name="Ben").team)
+
+    def test_rejects_non_list_payload(self):
+        response = self.client.post(self.url, {"first_name": "Max"}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
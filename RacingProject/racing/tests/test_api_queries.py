@@ -0,0 +1,98 @@
+from datetime import date, timedelta
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from racing.models import Team, Driver, Race
+
+
+class APIQueryBudgetTests(APITestCase):
+    """List and detail endpoints must not issue extra queries per row."""
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        cls.races = []
+        for t in range(3):
+            team = Team.objects.create(name=f"Team {t}", location="Somewhere", logo="logos/logo.png")
+            for d in range(3):
+                Driver.objects.create(first_name=f"Driver{t}{d}", last_name="Test", dob=date(1990, 1, d + 1), team=team)
+        drivers = list(Driver.objects.all())
+        for r in range(3):
+            race = Race.objects.create(race_track_name=f"Track {r}", track_location="Location",
+                                       race_date=today + timedelta(days=10 + r))
+            race.registered_drivers.add(*drivers)
+            cls.races.append(race)
+        cls.driver = drivers[0]
+        cls.team = cls.driver.team
+
+    def assert_budget(self, url, queries):
+        with self.assertNumQueries(queries):
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response
+
+    def test_team_list_budget(self):
+        self.assert_budget(reverse('team-list'), 2)
+
+    def test_team_detail_budget(self):
+        response = self.assert_budget(reverse('team-detail', args=[self.team.id]), 2)
+        self.assertEqual(len(response.data['drivers']), 3)
+
+    def test_driver_list_budget(self):
+        self.assert_budget(reverse('driver-list'), 2)
+
+    def test_driver_detail_budget(self):
+        response = self.assert_budget(reverse('driver-detail', args=[self.driver.id]), 2)
+        self.assertEqual(response.data['team'], self.team.name)
+        self.assertEqual(len(response.data['registered_races']), 3)
+
+    def test_race_list_budget(self):
+        self.assert_budget(reverse('race-list'), 2)
+
+    def test_race_detail_budget(self):
+        response = self.assert_budget(reverse('race-detail', args=[self.races[0].id]), 2)
+        self.assertEqual(len(response.data['registered_drivers']), 9)
+
+    def test_budget_does_not_grow_with_rows(self):
+        team = Team.objects.create(name="Late Team", location="Elsewhere", logo="logos/logo.png")
+        for i in range(5):
+            driver = Driver.objects.create(first_name=f"Late{i}", last_name="Entry", dob=date(1991, 1, i + 1), team=team)
+            self.races[0].registered_drivers.add(driver)
+        self.assert_budget(reverse('team-list'), 2)
+        self.assert_budget(reverse('driver-list'), 2)
+        self.assert_budget(reverse('race-list'), 2)
+
+    def test_sparse_fields_skip_relations(self):
+        response = self.assert_budget(reverse('team-list') + '?fields=id,name', 1)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'name'})
+        response = self.assert_budget(reverse('driver-detail', args=[self.driver.id]) + '?fields=id,team', 1)
+        self.assertEqual(response.data, {'id': self.driver.id, 'team': self.team.name})
+        response = self.assert_budget(reverse('race-list') + '?fields=id,race_date', 1)
+        self.assertEqual(set(response.data['results'][0]), {'id', 'race_date'})
+
+    def test_expand_nests_the_relation(self):
+        response = self.assert_budget(reverse('team-detail', args=[self.team.id]) + '?fields=id&expand=drivers', 2)
+        self.assertEqual(response.data['drivers'][0], {'id': self.driver.id, 'first_name': self.driver.first_name,
+                                                       'last_name': "Test"})
+        response = self.assert_budget(reverse('driver-list') + '?expand=team,registered_races', 2)
+        driver = response.data['results'][0]
+        self.assertEqual(driver['team'], {'id': self.team.id, 'name': self.team.name, 'location': "Somewhere"})
+        self.assertEqual(set(driver['registered_races'][0]), {'id', 'race_track_name', 'race_date'})
+
+    def test_async_views_take_the_same_selection(self):
+        response = self.client.get(reverse('race-detail-async', args=[self.races[0].id]),
+                                   {'fields': 'id', 'expand': 'registered_drivers'})
+        self.assertEqual(set(response.json()), {'id', 'registered_drivers'})
+        self.assertEqual(len(response.json()['registered_drivers']), 9)
+
+    def test_unknown_names_are_rejected(self):
+        self.assertEqual(self.client.get(reverse('team-list'), {'fields': 'id,secret'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('race-detail', args=[self.races[0].id]),
+                                         {'expand': 'track_location'}).status_code, 400)
+        self.assertEqual(self.client.get(reverse('driver-list-async'), {'fields': 'nope'}).status_code, 400)
+
+    def test_writes_render_the_selection_only(self):
+        response = self.client.patch(reverse('race-update', args=[self.races[0].id]) + '?fields=id,track_location',
+                                     {'track_location': "Elsewhere"}, format='json')
+        self.assertEqual(response.data, {'id': self.races[0].id, 'track_location': "Elsewhere"})
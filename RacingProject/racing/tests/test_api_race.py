@@ -2,11 +2,10 @@
 from django.urls import reverse
 from rest_framework.test import APITestCase
 from rest_framework import status
-from datetime import date
+from datetime import date, timedelta
 from racing.models import Race, Driver, Team
 from django.core.files.uploadedfile import SimpleUploadedFile
-import tempfile
-from PIL import Image
+from racing.tests.factories import logo_upload
 
 from rest_framework.test import APITestCase
 from rest_framework import status
@@ -19,11 +18,7 @@ from racing.models import Race, Driver
 class RaceAPITestCase(APITestCase):
 
     def generate_logo(self):
-        image = Image.new('RGB', (100, 100))
-        tmp_file = tempfile.NamedTemporaryFile(suffix='.png')
-        image.save(tmp_file, format='PNG')
-        tmp_file.seek(0)
-        return SimpleUploadedFile("logo.png", tmp_file.read(), content_type='image/png')
+        return logo_upload()
 
     def setUp(self):
         self.team = Team.objects.create(
@@ -129,12 +124,26 @@ class AddDriversToRaceAPITests(APITestCase):
         self.assertIn(self.driver1, self.race.registered_drivers.all())
         self.assertIn(self.driver2, self.race.registered_drivers.all())
 
+    def test_add_no_drivers(self):
+        response = self.client.post(self.url, {'drivers': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.race.registered_drivers.count(), 0)
+
     def test_add_invalid_driver_id(self):
         data = {'drivers': [999]}  # Non-existent driver ID
         response = self.client.post(self.url, data, format='json')
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn('drivers', response.data)
 
+    def test_add_drivers_queries_do_not_grow_with_the_ids(self):
+        drivers = [Driver.objects.create(first_name=f"Driver{i}", last_name="Grid", dob=date(1990, 1, i + 1))
+                   for i in range(10)]
+        data = {'drivers': [driver.id for driver in drivers]}
+        with self.assertNumQueries(10):
+            response = self.client.post(self.url, data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.race.registered_drivers.count(), 10)
+
     def test_add_drivers_to_nonexistent_race(self):
         url = reverse('add-drivers-to-race', args=[999])  # Non-existent race
         data = {'drivers': [self.driver1.id]}
@@ -156,4 +165,82 @@ class RaceDeleteViewAPITests(APITestCase):
         response = self.client.delete(self.url)
         self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
         self.assertIn("error", response.data)
-        self.assertEqual(response.data["error"], "Cannot delete race with registered drivers.")
\ No newline at end of file
+        self.assertEqual(response.data["error"], "Cannot delete race with registered drivers.")
+
+
+class RaceRegistrationAPITests(APITestCase):
+    def setUp(self):
+        self.race = Race.objects.create(race_track_name="Monaco GP", race_date=date.today() + timedelta(days=30), track_location="Monaco")
+        self.drivers = [
+            Driver.objects.create(first_name=f"Driver{i}", last_name="Grid", dob=date(1990, 1, i + 1))
+            for i in range(4)
+        ]
+        self.race.registered_drivers.add(self.drivers[0])
+        self.url = reverse('race-register', args=[self.race.id])
+
+    def test_bulk_registration_reports_each_driver(self):
+        ids = [driver.id for driver in self.drivers] + [999]
+        response = self.client.post(self.url, {'drivers': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data['registered'], 3)
+        statuses = {result['driver']: result['status'] for result in response.data['results']}
+        self.assertEqual(statuses[self.drivers[0].id], 'already_registered')
+        self.assertEqual(statuses[self.drivers[1].id], 'registered')
+        self.assertEqual(statuses[999], 'not_found')
+        self.assertEqual(self.race.registered_drivers.count(), 4)
+
+    def test_bulk_registration_query_count_is_constant(self):
+        ids = [driver.id for driver in self.drivers]
+        # race lookup, race lock (on SQLite a no-op UPDATE plus a read), set-difference query,
+        # bulk insert, race counter update, driver teams lookup (these drivers have none, so
+        # no team counter update), plus the savepoint pair
+        with self.assertNumQueries(9):
+            response = self.client.post(self.url, {'drivers': ids}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+
+    def test_bulk_registration_requires_drivers(self):
+        response = self.client.post(self.url, {'drivers': []}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        self.assertIn('drivers', response.data)
+
+
+class UpcomingRaceAPITests(APITestCase):
+    def setUp(self):
+        today = date.today()
+        self.open_race = Race.objects.create(race_track_name="Open GP", track_location="A",
+                                             race_date=today + timedelta(days=20),
+                                             registration_closure_date=today + timedelta(days=5))
+        self.no_closure_race = Race.objects.create(race_track_name="Late GP", track_location="B",
+                                                   race_date=today + timedelta(days=40))
+        self.closed_race = Race.objects.create(race_track_name="Closed GP", track_location="C",
+                                               race_date=today + timedelta(days=3),
+                                               registration_closure_date=today - timedelta(days=1))
+        self.past_race = Race.objects.create(race_track_name="Past GP", track_location="D",
+                                             race_date=today - timedelta(days=10))
+        self.url = reverse('race-upcoming')
+
+    def names(self, response):
+        return [race['race_track_name'] for race in response.data['results']]
+
+    def test_lists_upcoming_races_with_status(self):
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(self.names(response), ["Closed GP", "Open GP", "Late GP"])
+        statuses = {race['race_track_name']: race['registration_status'] for race in response.data['results']}
+        self.assertEqual(statuses, {"Closed GP": "closed", "Open GP": "open", "Late GP": "open"})
+
+    def test_filter_open_and_closed(self):
+        self.assertEqual(self.names(self.client.get(self.url, {'status': 'open'})), ["Open GP", "Late GP"])
+        self.assertEqual(self.names(self.client.get(self.url, {'status': 'closed'})), ["Closed GP"])
+
+    def test_filter_date_range(self):
+        today = date.today()
+        response = self.client.get(self.url, {'date_from': (today + timedelta(days=10)).isoformat(),
+                                              'date_to': (today + timedelta(days=30)).isoformat()})
+        self.assertEqual(self.names(response), ["Open GP"])
+
+    def test_invalid_filters(self):
+        response = self.client.get(self.url, {'status': 'maybe'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'date_from': '2030-01-02', 'date_to': '2030-01-01'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -0,0 +1,94 @@
+from asgiref.sync import sync_to_async
+from datetime import date, timedelta
+from django.test import TestCase
+from django.urls import reverse
+from django.utils import timezone
+from racing.models import Team, Driver, Race
+
+
+class AsyncReadAPITests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        today = timezone.now().date()
+        cls.team = Team.objects.create(name="McLaren", location="Woking", logo="logos/logo.png")
+        cls.driver = Driver.objects.create(first_name="Lando", last_name="Norris", dob=date(1999, 11, 13), team=cls.team)
+        Driver.objects.create(first_name="Oscar", last_name="Piastri", dob=date(2001, 4, 6), team=cls.team)
+        cls.race = Race.objects.create(race_track_name="Monza", track_location="Italy",
+                                       race_date=today + timedelta(days=10),
+                                       registration_closure_date=today + timedelta(days=5))
+        Race.objects.create(race_track_name="Spa", track_location="Belgium", race_date=today + timedelta(days=20),
+                            registration_closure_date=today - timedelta(days=1))
+        cls.race.registered_drivers.add(cls.driver)
+
+    async def test_lists_match_the_sync_views(self):
+        for sync_name, async_name in [('team-list', 'team-list-async'), ('driver-list', 'driver-list-async'),
+                                      ('race-list', 'race-list-async'), ('race-upcoming', 'race-upcoming-async')]:
+            expected = (await self.async_client.get(reverse(sync_name))).json()
+            response = await self.async_client.get(reverse(async_name))
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.json()['results'], expected['results'])
+
+    async def test_details_match_the_sync_views(self):
+        for sync_name, async_name, pk in [('team-detail', 'team-detail-async', self.team.pk),
+                                          ('driver-detail', 'driver-detail-async', self.driver.pk),
+                                          ('race-detail', 'race-detail-async', self.race.pk)]:
+            expected = (await self.async_client.get(reverse(sync_name, args=[pk]))).json()
+            response = await self.async_client.get(reverse(async_name, args=[pk]))
+            self.assertEqual(response.json(), expected)
+
+    async def test_keyset_pages(self):
+        response = await self.async_client.get(reverse('driver-list-async'), {'page_size': 1})
+        first = response.json()
+        self.assertEqual([driver['last_name'] for driver in first['results']], ["Norris"])
+        second = (await self.async_client.get(first['next'])).json()
+        self.assertEqual([driver['last_name'] for driver in second['results']], ["Piastri"])
+        self.assertIsNone(second['next'])
+
+    async def test_upcoming_filters(self):
+        response = await self.async_client.get(reverse('race-upcoming-async'), {'status': 'closed'})
+        self.assertEqual([race['race_track_name'] for race in response.json()['results']], ["Spa"])
+        response = await self.async_client.get(reverse('race-upcoming-async'), {'status': 'bogus'})
+        self.assertEqual(response.status_code, 400)
+
+    async def test_errors(self):
+        response = await self.async_client.get(reverse('team-detail-async', args=[999]))
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(response.json(), {'detail': "No Team matches the given query."})
+        response = await self.async_client.get(reverse('race-list-async'), {'cursor': 'garbage'})
+        self.assertEqual(response.status_code, 404)
+
+    async def test_responses_are_cached_and_invalidated(self):
+        url = reverse('driver-detail-async', args=[self.driver.pk])
+        self.assertEqual((await self.async_client.get(url)).json()['team'], "McLaren")
+        #update() sends no signals, so a cached response still shows the old name
+        await Team.objects.filter(pk=self.team.pk).aupdate(name="Renamed")
+        self.assertEqual((await self.async_client.get(url)).json()['team'], "McLaren")
+        self.team.name = "McLaren F1"
+
+        def save():
+            #the cache refresh runs on commit, in the thread the ORM runs in
+            with self.captureOnCommitCallbacks(execute=True):
+                self.team.save()
+        await sync_to_async(save)()
+        self.assertEqual((await self.async_client.get(url)).json()['team'], "McLaren F1")
+
+
+class AsyncListPageTests(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        team = Team.objects.create(name="Williams", location="Grove", logo="logos/logo.png")
+        Driver.objects.create(first_name="Alex", last_name="Albon", dob=date(1996, 3, 23), team=team)
+        Race.objects.create(race_track_name="Suzuka", track_location="Japan",
+                            race_date=timezone.now().date() + timedelta(days=30))
+
+    async def test_pages_render_like_the_sync_pages(self):
+        for sync_name, async_name, text in [('team_list', 'team_list_async', "Alex Albon"),
+                                            ('driver_list', 'driver_list_async', "Williams"),
+                                            ('race_list', 'race_list_async', "Suzuka")]:
+            response = await self.async_client.get(reverse(async_name))
+            self.assertEqual(response.status_code, 200)
+            self.assertContains(response, text)
+            self.assertEqual(len(response.context['page_obj']),
+                             len((await self.async_client.get(reverse(sync_name))).context['page_obj']))
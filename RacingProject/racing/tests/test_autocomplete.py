@@ -0,0 +1,65 @@
+from datetime import date, timedelta
+
+import pytest
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from racing.forms import EditRaceDriversForm
+from racing.models import Driver
+from racing.tests.factories import make_race
+
+
+@pytest.fixture
+def drivers(db):
+    names = [("Lewis", "Hamilton"), ("Lando", "Norris"), ("Charles", "Leclerc"), ("Liam", "Lawson")]
+    return [Driver.objects.create(first_name=first, last_name=last, dob=date(1990, 1, 1 + n))
+            for n, (first, last) in enumerate(names)]
+
+
+def test_driver_lookup_matches_prefixes_and_pages(client, drivers):
+    data = client.get(reverse('driver-lookup'), {'q': "l"}).json()
+    assert [item['text'] for item in data['results']] == ["Lewis Hamilton", "Liam Lawson", "Charles Leclerc",
+                                                           "Lando Norris"]
+    data = client.get(reverse('driver-lookup'), {'q': "la", 'page_size': 1}).json()
+    assert [item['text'] for item in data['results']] == ["Liam Lawson"]
+    assert [item['text'] for item in client.get(data['next']).json()['results']] == ["Lando Norris"]
+
+
+def test_race_lookup_offers_open_races_only(client, db):
+    today = timezone.now().date()
+    open_race = make_race(race_track_name="Monza", race_date=today + timedelta(days=30))
+    make_race(race_track_name="Monaco", race_date=today + timedelta(days=30),
+              registration_closure_date=today - timedelta(days=1))
+    data = client.get(reverse('race-lookup'), {'q': "mon"}).json()
+    assert data['results'] == [{'id': open_race.id, 'text': f"Monza ({open_race.race_date})"}]
+
+
+def test_edit_page_renders_only_selected_drivers(client, drivers):
+    race = make_race()
+    race.registered_drivers.add(drivers[0])
+    response = client.get(reverse('edit_race_drivers', args=[race.id]))
+    html = response.content.decode()
+    assert html.count('<option') == 1 and "Lewis Hamilton" in html
+    assert reverse('driver-lookup') in html
+
+
+def test_post_checks_submitted_ids_with_one_query(drivers):
+    form = EditRaceDriversForm(data={'drivers': [drivers[1].id, drivers[2].id]})
+    with CaptureQueriesContext(connection) as queries:
+        assert form.is_valid()
+    assert len(queries) == 1 and ' IN ' in queries[0]['sql']
+    assert not EditRaceDriversForm(data={'drivers': [drivers[1].id, 999999]}).is_valid()
+
+
+def test_register_page_rejects_closed_races_and_keeps_past_entries(client, drivers):
+    today = timezone.now().date()
+    driver = drivers[0]
+    closed = make_race(registration_closure_date=today - timedelta(days=1))
+    closed.registered_drivers.add(driver)
+    open_race = make_race()
+
+    url = reverse('register_driver_to_race', args=[driver.id])
+    assert client.post(url, {'races': [closed.id]}).status_code == 200          #not a valid choice
+    assert client.post(url, {'races': [open_race.id]}).status_code == 302
+    assert set(driver.registered_races.values_list('id', flat=True)) == {closed.id, open_race.id}
@@ -0,0 +1,217 @@
+"""Endpoint benchmarks: latency and query count of every URL in racing/urls.py, per dataset size.
+
+Each endpoint is requested RUNS times on a seeded dataset, every run cold (caches cleared)
+and rolled back, and compared with benchmark_baseline.json:
+
+* more queries than the baseline fails;
+* with RACING_BENCHMARK_LATENCY set, a median latency above baseline *
+  RACING_BENCHMARK_LATENCY_RATIO (default 3) plus LATENCY_SLACK_MS fails. Timings depend
+  on the machine and its load, so the default run only checks query counts.
+
+Environment:
+    RACING_BENCHMARK_SIZES=100,10000,100000   dataset sizes in drivers (default 100)
+    RACING_BENCHMARK_RUNS=5                   requests per endpoint
+    RACING_BENCHMARK_LATENCY=1                also compare latencies with the baseline
+    RACING_BENCHMARK_UPDATE=1                 record the results as the new baseline
+Run only these with ``pytest -m benchmark``, skip them with ``-m "not benchmark"``.
+"""
+import json
+import os
+import statistics
+import time
+from datetime import date, timedelta
+from pathlib import Path
+from types import SimpleNamespace
+
+import pytest
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+from django.urls import URLPattern, reverse
+from django.utils import timezone
+
+from racing import urls
+from racing.models import Team, Driver, Race
+from racing.seeding import seed
+from racing.tests.factories import logo_upload
+
+pytestmark = pytest.mark.benchmark
+
+SIZES = [int(size) for size in os.environ.get('RACING_BENCHMARK_SIZES', '100').split(',')]
+RUNS = int(os.environ.get('RACING_BENCHMARK_RUNS', '5'))
+UPDATE = bool(os.environ.get('RACING_BENCHMARK_UPDATE'))
+CHECK_LATENCY = bool(os.environ.get('RACING_BENCHMARK_LATENCY'))
+LATENCY_RATIO = float(os.environ.get('RACING_BENCHMARK_LATENCY_RATIO', '3'))
+LATENCY_SLACK_MS = 25
+BASELINE_PATH = Path(__file__).with_name('benchmark_baseline.json')
+
+
+def seed_dataset(size):
+    """``size`` drivers in teams of 20, a race per 100 drivers with 20 entries each,
+    and one team/driver/race without entries for the delete endpoints."""
+    seed(teams=max(2, size // 20), drivers=size, races=max(4, size // 100), entries_per_race=20)
+    today = timezone.now().date()
+    race = Race.objects.filter(registered_drivers__isnull=False).order_by('id').first()
+    driver = Driver.objects.filter(team__isnull=False, registered_races=race).order_by('id').first()
+    return SimpleNamespace(
+        size=size,
+        team=driver.team,
+        driver=driver,
+        drivers=list(Driver.objects.order_by('id')[:10]),
+        race=race,
+        rendition=driver.team.logo_renditions['64'].rsplit('/', 1)[1],
+        spare_team=Team.objects.create(name="Spare Team", location="Benchmark", logo='logos/benchmark.png'),
+        spare_driver=Driver.objects.create(first_name="Spare", last_name="Driver", dob=date(1990, 1, 1)),
+        spare_race=Race.objects.create(race_track_name="Spare Race", track_location="Benchmark",
+                                       race_date=today + timedelta(days=4000)),
+    )
+
+
+def future(days):
+    return str(timezone.now().date() + timedelta(days=days))
+
+
+def get(**kwargs):
+    return ('get', lambda ds: kwargs, None)
+
+
+#url name -> (method, url kwargs(ds), payload(ds)); GET payloads are the query string, others
+#are sent as JSON unless they hold a file
+CASES = {
+    'home': get(),
+    'team_list': get(),
+    'team_create': get(),
+    'team_edit': ('get', lambda ds: {'pk': ds.team.pk}, None),
+    'team_delete': ('get', lambda ds: {'pk': ds.spare_team.pk}, None),
+    'logo-rendition': ('get', lambda ds: {'name': ds.rendition}, None),
+    'driver_list': get(),
+    'driver_create': get(),
+    'driver_edit': ('get', lambda ds: {'pk': ds.driver.pk}, None),
+    'driver_delete': ('get', lambda ds: {'pk': ds.spare_driver.pk}, None),
+    'race_list': get(),
+    'race_create': get(),
+    'race_edit': ('get', lambda ds: {'pk': ds.race.pk}, None),
+    'race_delete': ('get', lambda ds: {'pk': ds.spare_race.pk}, None),
+    'register_driver_to_race': ('get', lambda ds: {'driver_id': ds.driver.pk}, None),
+    'edit_race_drivers': ('get', lambda ds: {'race_id': ds.race.pk}, None),
+    'team_list_async': get(),
+    'driver_list_async': get(),
+    'race_list_async': get(),
+    'export_race_entries': get(fmt='csv'),
+    'export_team_rosters': get(fmt='csv'),
+
+    'team-list': get(),
+    'team-create': ('post', lambda ds: {}, lambda ds: {'name': "New Team", 'location': "Benchmark", 'logo': logo_upload()}),
+    'team-detail': ('get', lambda ds: {'pk': ds.team.pk}, None),
+    'team-update': ('patch', lambda ds: {'pk': ds.team.pk}, lambda ds: {'location': "Elsewhere"}),
+    'team-delete': ('delete', lambda ds: {'pk': ds.spare_team.pk}, None),
+    'team-bulk-delete': ('post', lambda ds: {}, lambda ds: {'ids': [ds.spare_team.pk]}),
+    'driver-list': get(),
+    'driver-create': ('post', lambda ds: {}, lambda ds: {'first_name': "New", 'last_name': "Driver",
+                                                         'dob': "1995-05-05", 'team': ds.team.name}),
+    'driver-detail': ('get', lambda ds: {'pk': ds.driver.pk}, None),
+    'driver-update': ('patch', lambda ds: {'pk': ds.driver.pk}, lambda ds: {'last_name': "Renamed"}),
+    'driver-delete': ('delete', lambda ds: {'pk': ds.spare_driver.pk}, None),
+    'driver-bulk-delete': ('post', lambda ds: {}, lambda ds: {'ids': [ds.spare_driver.pk]}),
+    'driver-bulk-save': ('post', lambda ds: {}, lambda ds: [
+        {'id': ds.driver.pk, 'first_name': ds.driver.first_name, 'last_name': "Renamed", 'dob': str(ds.driver.dob)},
+        {'first_name': "New", 'last_name': "Driver", 'dob': "1995-05-05", 'team': ds.team.name},
+    ]),
+    'race-list': get(),
+    'race-upcoming': get(),
+    'race-create': ('post', lambda ds: {}, lambda ds: {'race_track_name': "New Track", 'track_location': "Benchmark",
+                                                       'race_date': future(500), 'registered_drivers': []}),
+    'race-detail': ('get', lambda ds: {'pk': ds.race.pk}, None),
+    'race-update': ('patch', lambda ds: {'pk': ds.race.pk}, lambda ds: {'track_location': "Elsewhere"}),
+    'race-delete': ('delete', lambda ds: {'pk': ds.spare_race.pk}, None),
+    'race-bulk-delete': ('post', lambda ds: {}, lambda ds: {'ids': [ds.spare_race.pk]}),
+    'add-drivers-to-race': ('post', lambda ds: {'race_id': ds.spare_race.pk}, lambda ds: {'drivers': [ds.driver.pk]}),
+    'race-register': ('post', lambda ds: {'race_id': ds.spare_race.pk},
+                      lambda ds: {'drivers': [driver.pk for driver in ds.drivers]}),
+    'race-registrations': ('patch', lambda ds: {'race_id': ds.race.pk},
+                           lambda ds: {'add': [ds.spare_driver.pk], 'remove': [ds.driver.pk]}),
+    'driver-registrations': ('patch', lambda ds: {'driver_id': ds.driver.pk},
+                             lambda ds: {'add': [ds.spare_race.pk], 'remove': [ds.race.pk]}),
+    'search': ('get', lambda ds: {}, lambda ds: {'q': "ver"}),
+    'driver-lookup': ('get', lambda ds: {}, lambda ds: {'q': "l"}),
+    'race-lookup': ('get', lambda ds: {}, lambda ds: {'q': "m"}),
+    'team-list-async': get(),
+    'team-detail-async': ('get', lambda ds: {'pk': ds.team.pk}, None),
+    'driver-list-async': get(),
+    'driver-detail-async': ('get', lambda ds: {'pk': ds.driver.pk}, None),
+    'race-list-async': get(),
+    'race-upcoming-async': get(),
+    'race-detail-async': ('get', lambda ds: {'pk': ds.race.pk}, None),
+}
+
+
+@pytest.fixture(scope='module', params=SIZES, ids=lambda size: f'{size}-drivers')
+def dataset(request, django_db_setup, django_db_blocker):
+    with django_db_blocker.unblock():
+        yield seed_dataset(request.param)
+        Race.registered_drivers.through.objects.all().delete()
+        Race.objects.all().delete()
+        Driver.objects.all().delete()
+        Team.objects.all().delete()
+
+
+@pytest.fixture(scope='session')
+def results():
+    measured = {}
+    yield measured
+    if UPDATE and measured:
+        baseline = json.loads(BASELINE_PATH.read_text()) if BASELINE_PATH.exists() else {}
+        for size, cases in measured.items():
+            baseline.setdefault(size, {}).update(cases)
+        BASELINE_PATH.write_text(json.dumps(baseline, indent=2, sort_keys=True) + '\n')
+
+
+def send(client, name, ds):
+    method, kwargs, payload = CASES[name]
+    url = reverse(name, kwargs=kwargs(ds))
+    data = payload(ds) if payload else None
+    if data is None or method == 'get':
+        response = getattr(client, method)(url, data)
+    elif isinstance(data, dict) and any(isinstance(value, SimpleUploadedFile) for value in data.values()):
+        response = getattr(client, method)(url, data)
+    else:
+        response = getattr(client, method)(url, json.dumps(data), content_type='application/json')
+    if response.streaming:
+        b''.join(response.streaming_content)
+    return response
+
+
+def test_every_url_is_benchmarked():
+    names = {pattern.name for pattern in urls.urlpatterns if isinstance(pattern, URLPattern)}
+    assert names == set(CASES)
+
+
+@pytest.mark.django_db
+@pytest.mark.parametrize('name', sorted(CASES))
+def test_endpoint(client, dataset, results, name):
+    timings = []
+    for _ in range(RUNS):
+        cache.clear()
+        with transaction.atomic():
+            with CaptureQueriesContext(connection) as queries:
+                started = time.perf_counter()
+                response = send(client, name, dataset)
+                timings.append((time.perf_counter() - started) * 1000)
+            transaction.set_rollback(True)
+        assert response.status_code < 400, (name, response.status_code, getattr(response, 'content', b'')[:500])
+
+    measured = {'queries': len(queries), 'ms': round(statistics.median(timings), 2)}
+    results.setdefault(str(dataset.size), {})[name] = measured
+    if UPDATE:
+        return
+
+    baseline = json.loads(BASELINE_PATH.read_text()).get(str(dataset.size), {}).get(name)
+    if baseline is None:
+        pytest.skip(f"no baseline for {name} at {dataset.size} drivers")
+    assert measured['queries'] <= baseline['queries'], (
+        f"{name}: {measured['queries']} queries, baseline {baseline['queries']}")
+    if not CHECK_LATENCY:
+        return
+    limit = baseline['ms'] * LATENCY_RATIO + LATENCY_SLACK_MS
+    assert measured['ms'] <= limit, f"{name}: {measured['ms']} ms, baseline {baseline['ms']} ms (limit {limit:.1f})"
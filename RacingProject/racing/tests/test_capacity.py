@@ -0,0 +1,111 @@
+import random
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+from django.db import IntegrityError, OperationalError, connection, connections
+from django.urls import reverse
+from racing.models import Race
+from racing.registration import RACE_FULL, REGISTERED, register_drivers
+from racing.tests.factories import make_driver, make_race
+
+RETRIES = 200
+
+
+def test_registration_stops_at_capacity(client, db):
+    race = make_race(capacity=3)
+    drivers = [make_driver() for _ in range(5)]
+    response = client.post(reverse('race-register', args=[race.id]),
+                           {'drivers': [driver.id for driver in drivers]}, content_type='application/json')
+    assert response.json()['registered'] == 3
+    assert [result['status'] for result in response.json()['results']] == [REGISTERED] * 3 + [RACE_FULL] * 2
+
+    race.refresh_from_db()
+    assert race.registered_driver_count == 3
+
+
+def test_add_drivers_is_all_or_nothing(client, db):
+    race = make_race(capacity=2)
+    drivers = [make_driver() for _ in range(3)]
+    response = client.post(reverse('add-drivers-to-race', args=[race.id]),
+                           {'drivers': [driver.id for driver in drivers]}, content_type='application/json')
+    assert response.status_code == 409
+    assert race.registered_drivers.count() == 0
+
+
+def test_edit_forms_respect_capacity(client, db):
+    race = make_race(capacity=1)
+    drivers = [make_driver(), make_driver()]
+    response = client.post(reverse('edit_race_drivers', args=[race.id]), {'drivers': [driver.id for driver in drivers]})
+    assert response.status_code == 200
+    assert "The race has 1 places" in response.content.decode()
+
+    register_drivers(race, [drivers[0].id])
+    response = client.post(reverse('register_driver_to_race', args=[drivers[1].id]), {'races': [race.id]})
+    assert "Full: " in response.content.decode()
+    assert race.registered_drivers.count() == 1
+
+
+def test_api_capacity_below_entries_is_rejected(client, db):
+    race = make_race()
+    register_drivers(race, [make_driver().id, make_driver().id])
+    response = client.patch(reverse('race-update', args=[race.id]), {'capacity': 1}, content_type='application/json')
+    assert response.status_code == 400
+    assert 'capacity' in response.json()
+
+
+@pytest.mark.parametrize('capacity, entries', [(4, 4), (1, 1)])
+def test_capacity_and_entries_change_in_one_save(client, db, capacity, entries):
+    race = make_race(capacity=2)
+    register_drivers(race, [make_driver().id, make_driver().id])
+    drivers = [make_driver() for _ in range(4)][:entries]
+
+    response = client.patch(reverse('race-update', args=[race.id]),
+                            {'capacity': capacity, 'registered_drivers': [str(driver) for driver in drivers]},
+                            content_type='application/json')
+    assert response.status_code == 200, response.content
+    race.refresh_from_db()
+    assert (race.capacity, race.registered_driver_count) == (capacity, entries)
+
+    other = make_race(capacity=2)
+    register_drivers(other, [make_driver().id, make_driver().id])
+    data = {'race_track_name': other.race_track_name, 'track_location': other.track_location,
+            'race_date': other.race_date.isoformat(), 'capacity': capacity,
+            'registered_drivers': [driver.id for driver in drivers]}
+    assert client.post(reverse('race_edit', args=[other.id]), data).status_code == 302
+    other.refresh_from_db()
+    assert (other.capacity, other.registered_driver_count) == (capacity, entries)
+
+
+def test_check_constraint_backs_up_the_counter(db):
+    race = make_race(capacity=1)
+    with pytest.raises(IntegrityError):
+        Race.objects.filter(pk=race.pk).update(registered_driver_count=2)
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_registrations_never_oversubscribe():
+    capacity, workers = 10, 16
+    race = make_race(capacity=capacity)
+    drivers = [make_driver().id for _ in range(60)]
+
+    def register(driver_id):
+        try:
+            for _ in range(RETRIES):
+                try:
+                    return register_drivers(race, [driver_id])[0]['status']
+                except OperationalError:
+                    #SQLite reports a busy database instead of waiting on a row lock
+                    time.sleep(random.random() / 100)
+            raise AssertionError("registration kept failing")
+        finally:
+            connections.close_all()
+
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        statuses = list(pool.map(register, drivers))
+
+    race.refresh_from_db()
+    assert statuses.count(REGISTERED) == capacity
+    assert statuses.count(RACE_FULL) == len(drivers) - capacity
+    assert race.registered_drivers.count() == race.registered_driver_count == capacity
+    connection.close()
@@ -0,0 +1,179 @@
+import io
+import json
+import pytest
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from racing import counters
+from racing.bulk import save_drivers
+from racing.deletion import bulk_delete
+from racing.models import Team, Driver, Race
+from racing.registration import register_drivers
+from racing.tests.factories import make_driver, make_race, make_team
+
+
+@pytest.fixture
+def grid(db):
+    red, blue = make_team(), make_team()
+    drivers = [make_driver(team=red), make_driver(team=red), make_driver(team=blue), make_driver()]
+    return red, blue, drivers
+
+
+def assert_counts_match():
+    assert counters.recount() == {'race.registered_driver_count': 0, 'team.driver_count': 0,
+                                  'team.registered_driver_count': 0}
+
+
+def test_driver_create_move_and_delete(grid):
+    red, blue, drivers = grid
+    race = make_race()
+    race.registered_drivers.add(drivers[0])
+    red.refresh_from_db()
+    assert (red.driver_count, red.registered_driver_count) == (2, 1)
+
+    drivers[0].team = blue
+    drivers[0].save()
+    red.refresh_from_db()
+    blue.refresh_from_db()
+    assert (red.driver_count, red.registered_driver_count) == (1, 0)
+    assert (blue.driver_count, blue.registered_driver_count) == (2, 1)
+
+    drivers[1].delete()
+    red.refresh_from_db()
+    assert red.driver_count == 0
+    assert_counts_match()
+
+
+def test_driver_moves_without_reading_the_old_row(grid):
+    red, blue, drivers = grid
+    driver = Driver.objects.get(pk=drivers[0].pk)
+    for team in (blue, None, red):
+        driver.team = team
+        with CaptureQueriesContext(connection) as queries:
+            driver.save()
+        assert not [query for query in queries if query['sql'].startswith('SELECT')
+                    and 'FROM "racing_driver"' in query['sql']]
+        assert_counts_match()
+    hand_built = Driver(pk=driver.pk, first_name=driver.first_name, last_name=driver.last_name, dob=driver.dob,
+                        team=blue)
+    hand_built.save()
+    assert_counts_match()
+
+
+def test_related_manager_add_remove_set_and_clear(grid):
+    red, blue, drivers = grid
+    race = make_race()
+    race.registered_drivers.add(*drivers)
+    race.registered_drivers.add(drivers[0])              #already there: not counted twice
+    race.refresh_from_db()
+    assert race.registered_driver_count == 4
+
+    race.registered_drivers.remove(drivers[0], make_driver())   #one of them isn't registered
+    race.refresh_from_db()
+    assert race.registered_driver_count == 3
+
+    race.registered_drivers.set([drivers[0], drivers[1]])
+    drivers[2].registered_races.add(make_race())
+    assert_counts_match()
+
+    race.registered_drivers.clear()
+    drivers[2].registered_races.clear()
+    red.refresh_from_db()
+    assert red.registered_driver_count == 0
+    assert_counts_match()
+
+
+def test_bulk_paths_keep_counts(grid):
+    red, blue, drivers = grid
+    race = make_race()
+    register_drivers(race, [driver.id for driver in drivers])
+    save_drivers([
+        {'id': drivers[0].id, 'first_name': drivers[0].first_name, 'last_name': drivers[0].last_name,
+         'dob': drivers[0].dob, 'team': blue.name},
+        {'first_name': "New", 'last_name': "Driver", 'dob': drivers[0].dob, 'team': red.name},
+    ])
+    blue.refresh_from_db()
+    assert (blue.driver_count, blue.registered_driver_count) == (2, 2)
+    assert_counts_match()
+
+    spare = make_driver(team=red)
+    assert bulk_delete(Driver, [spare.id, drivers[0].id])['deleted'] == [spare.id]
+    assert_counts_match()
+
+
+def test_cascaded_team_delete_updates_once(db):
+    team = make_team()
+    for _ in range(5):
+        make_driver(team=team)
+    with CaptureQueriesContext(connection) as queries:
+        team.delete()
+    assert sum(query['sql'].startswith('UPDATE "racing_team"') for query in queries.captured_queries) == 1
+
+
+def test_stale_instance_save_keeps_counts(grid):
+    red, blue, drivers = grid
+    stale = Team.objects.get(pk=red.pk)
+    make_driver(team=red)
+    stale.location = "Elsewhere"
+    stale.save()
+    red.refresh_from_db()
+    assert (red.location, red.driver_count) == ("Elsewhere", 3)
+
+
+def test_recount_command_repairs_drift(grid, capsys):
+    red, blue, drivers = grid
+    Team.objects.filter(pk=red.pk).update(driver_count=40)
+    Race.objects.filter(pk=make_race().pk).update(registered_driver_count=7)
+    call_command('recount_racing_counters')
+    assert "2 row(s) corrected" in capsys.readouterr().out
+    red.refresh_from_db()
+    assert red.driver_count == 2
+
+
+def test_recount_refreshes_cached_rows(client, grid, django_capture_on_commit_callbacks):
+    race = make_race(capacity=30)
+    Race.objects.filter(pk=race.pk).update(registered_driver_count=7)
+    assert "7 / 30" in client.get(reverse('race_list')).content.decode()
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command('recount_racing_counters', stdout=io.StringIO())
+    assert "0 / 30" in client.get(reverse('race_list')).content.decode()
+
+
+def test_lists_order_and_filter_on_counters(client, grid):
+    red, blue, drivers = grid
+    full, empty = make_race(), make_race()
+    full.registered_drivers.add(*drivers)
+
+    response = client.get(reverse('race-list'), {'ordering': '-registered_driver_count'})
+    assert [race['id'] for race in response.json()['results']] == [full.id, empty.id]
+    assert response.json()['results'][0]['registered_driver_count'] == 4
+
+    response = client.get(reverse('race-list'), {'min_entries': 1})
+    assert [race['id'] for race in response.json()['results']] == [full.id]
+
+    response = client.get(reverse('team-list'), {'ordering': '-driver_count', 'min_drivers': 1, 'max_entries': 2})
+    assert [(team['id'], team['driver_count']) for team in response.json()['results']] == [(red.id, 2), (blue.id, 1)]
+
+    response = client.get(reverse('team-list-async'), {'ordering': 'driver_count'})
+    assert [team['id'] for team in json.loads(response.content)['results']] == [blue.id, red.id]
+
+
+def test_counter_list_cursor_pages(client, db):
+    teams = [make_team() for _ in range(5)]
+    for index, team in enumerate(teams):
+        for _ in range(index % 3):
+            make_driver(team=team)
+    url, seen = reverse('team-list'), []
+    params = {'ordering': '-driver_count', 'page_size': 2}
+    while url:
+        data = client.get(url, params).json()
+        seen += [(team['driver_count'], team['id']) for team in data['results']]
+        url, params = data['next'], None
+    assert seen == sorted(((index % 3, team.id) for index, team in enumerate(teams)), reverse=True)
+
+
+def test_invalid_ordering_and_range_are_rejected(client, db):
+    assert client.get(reverse('race-list'), {'ordering': 'name'}).status_code == 400
+    assert client.get(reverse('team-list'), {'min_drivers': 3, 'max_drivers': 1}).status_code == 400
+    assert client.get(reverse('race-list-async'), {'min_entries': -1}).status_code == 400
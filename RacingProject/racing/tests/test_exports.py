@@ -0,0 +1,65 @@
+import csv
+import io
+import json
+import pytest
+from datetime import date, timedelta
+from django.urls import reverse
+from django.utils import timezone
+from racing import exports
+from racing.models import Team, Driver, Race
+
+
+@pytest.fixture
+def calendar(db):
+    today = timezone.now().date()
+    team = Team.objects.create(name="Ferrari", location="Maranello", logo="logos/logo.png")
+    leclerc = Driver.objects.create(first_name="Charles", last_name="Leclerc", dob=date(1997, 10, 16), team=team)
+    sainz = Driver.objects.create(first_name="Carlos", last_name="Sainz", dob=date(1994, 9, 1), team=team)
+    free = Driver.objects.create(first_name="Free", last_name="Agent", dob=date(1990, 1, 1))
+    monza = Race.objects.create(race_track_name="Monza", track_location="Italy", race_date=today + timedelta(days=10))
+    Race.objects.create(race_track_name="Spa", track_location="Belgium", race_date=today + timedelta(days=20))
+    monza.registered_drivers.add(leclerc, sainz, free)
+    return monza
+
+
+def content(response):
+    assert response.streaming
+    return b''.join(response.streaming_content).decode()
+
+
+def test_race_entries_csv(client, calendar):
+    response = client.get(reverse('export_race_entries', args=['csv']))
+    assert response.status_code == 200
+    assert response['Content-Type'].startswith('text/csv')
+    rows = list(csv.DictReader(io.StringIO(content(response))))
+    assert [(row['race_track_name'], row['driver_name'], row['team']) for row in rows] == [
+        ("Monza", "Free Agent", ""),
+        ("Monza", "Charles Leclerc", "Ferrari"),
+        ("Monza", "Carlos Sainz", "Ferrari"),
+        ("Spa", "", ""),
+    ]
+
+
+def test_race_entries_ndjson(client, calendar):
+    response = client.get(reverse('export_race_entries', args=['ndjson']))
+    lines = [json.loads(line) for line in content(response).splitlines()]
+    assert [line['race_track_name'] for line in lines] == ["Monza", "Spa"]
+    assert len(lines[0]['drivers']) == 3
+    assert lines[1]['drivers'] == []
+
+
+def test_team_rosters_csv(client, calendar):
+    rows = list(csv.DictReader(io.StringIO(content(client.get(reverse('export_team_rosters', args=['csv']))))))
+    assert [row['driver_name'] for row in rows] == ["Charles Leclerc", "Carlos Sainz"]
+
+
+def test_unknown_format(client, calendar):
+    assert client.get(reverse('export_race_entries', args=['xml'])).status_code == 404
+
+
+def test_queries_grow_per_chunk_not_per_row(calendar, monkeypatch, django_assert_num_queries):
+    monkeypatch.setattr(exports, 'EXPORT_CHUNK_SIZE', 1)
+    # one cursor over the races, plus one entry-list prefetch per chunk of races
+    with django_assert_num_queries(3):
+        records = list(exports.race_entries())
+    assert len(records) == 2
@@ -0,0 +1,136 @@
+import json
+import pytest
+from datetime import date, timedelta
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from django.utils import timezone
+from racing.models import Driver, Race
+
+
+@pytest.fixture
+def drivers(db):
+    return [
+        Driver.objects.create(first_name="Max", last_name="Verstappen", dob=date(1997, 9, 30)),
+        Driver.objects.create(first_name="Lando", last_name="Norris", dob=date(1999, 11, 13)),
+    ]
+
+
+def future(days):
+    return (timezone.now().date() + timedelta(days=days)).isoformat()
+
+
+def write_csv(tmp_path, rows):
+    path = tmp_path / 'season.csv'
+    lines = ["race_track_name,track_location,race_date,registration_closure_date,drivers"]
+    lines += [','.join(row) for row in rows]
+    path.write_text('\n'.join(lines) + '\n')
+    return path
+
+
+def run(path, *args):
+    out = StringIO()
+    call_command('import_season', str(path), *args, stdout=out, stderr=StringIO())
+    return out.getvalue()
+
+
+def test_imports_races_and_entries_in_batches(tmp_path, drivers):
+    path = write_csv(tmp_path, [
+        ("Monza", "Italy", future(10), future(5), "Max Verstappen;Lando Norris"),
+        ("Spa", "Belgium", future(20), "", "Lando Norris"),
+        ("Silverstone", "UK", future(30), "", ""),
+    ])
+    output = run(path, '--batch-size', '2')
+    assert "2/3 races" in output and "3/3 races" in output
+    assert "rows/s" in output
+    monza = Race.objects.get(race_track_name="Monza")
+    assert set(monza.registered_drivers.all()) == set(drivers)
+    assert list(Race.objects.get(race_track_name="Spa").registered_drivers.all()) == [drivers[1]]
+    assert Race.objects.count() == 3
+
+
+def test_json_input(tmp_path, drivers):
+    path = tmp_path / 'season.json'
+    path.write_text(json.dumps([{'race_track_name': "Monza", 'track_location': "Italy",
+                                 'race_date': future(10), 'drivers': ["Max Verstappen"]}]))
+    run(path)
+    assert list(Race.objects.get().registered_drivers.all()) == [drivers[0]]
+
+
+def test_null_driver_list_means_no_entries(tmp_path, drivers):
+    path = tmp_path / 'season.json'
+    path.write_text(json.dumps([{'race_track_name': "Monza", 'track_location': "Italy",
+                                 'race_date': future(10), 'drivers': None}]))
+    run(path)
+    assert not Race.objects.get().registered_drivers.exists()
+
+
+def test_importing_again_skips_existing_races(tmp_path, drivers):
+    path = write_csv(tmp_path, [
+        ("Monza", "Italy", future(10), "", "Max Verstappen"),
+        ("Spa", "Belgium", future(20), "", ""),
+    ])
+    run(path)
+    Race.objects.get(race_track_name="Spa").delete()
+    output = run(path)
+    assert "Skipped 1 race(s)" in output
+    assert Race.objects.count() == 2
+    assert list(Race.objects.get(race_track_name="Monza").registered_drivers.all()) == [drivers[0]]
+    #same track on another date is a new race
+    write_csv(tmp_path, [("Monza", "Italy", future(11), "", "")])
+    assert "Skipped" not in run(path)
+    assert Race.objects.filter(race_track_name="Monza").count() == 2
+
+
+def test_dry_run_writes_nothing(tmp_path, drivers):
+    path = write_csv(tmp_path, [("Monza", "Italy", future(10), "", "Max Verstappen")])
+    assert "nothing written" in run(path, '--dry-run')
+    assert not Race.objects.exists()
+
+
+def test_any_invalid_row_aborts_the_import(tmp_path, drivers):
+    path = write_csv(tmp_path, [
+        ("Monza", "Italy", future(10), "", "Max Verstappen"),
+        ("Spa", "Belgium", future(20), future(25), ""),
+        ("Monza", "Italy", future(10), "", ""),
+        ("Imola", "Italy", future(40), "", "Nobody Known"),
+        ("Zandvoort", "Netherlands", "someday", "", ""),
+    ])
+    with pytest.raises(CommandError, match="nothing imported"):
+        run(path)
+    assert not Race.objects.exists()
+
+
+def test_json_values_of_the_wrong_type_are_row_errors(tmp_path, drivers):
+    path = tmp_path / 'season.json'
+    path.write_text(json.dumps([
+        {'race_track_name': 42, 'track_location': "Italy", 'race_date': future(10)},
+        {'race_track_name': "Spa", 'track_location': ["Belgium"], 'race_date': 20300101},
+        {'race_track_name': "Imola", 'track_location': "Italy", 'race_date': future(20), 'drivers': [None, 7]},
+        {'race_track_name': "Monza", 'track_location': "Italy", 'race_date': future(30), 'drivers': ["Max Verstappen"]},
+    ]))
+    stderr = StringIO()
+    with pytest.raises(CommandError, match="3 invalid row"):
+        call_command('import_season', str(path), stdout=StringIO(), stderr=stderr)
+    assert stderr.getvalue().splitlines() == [
+        "Row 1: race_track_name must be a string",
+        "Row 2: track_location must be a string; race_date must be a YYYY-MM-DD string",
+        "Row 3: drivers must be a list of names",
+    ]
+    assert not Race.objects.exists()
+
+
+def test_past_dates_need_a_flag(tmp_path, drivers):
+    path = write_csv(tmp_path, [("Monza", "Italy", "2020-09-06", "", "Max Verstappen")])
+    with pytest.raises(CommandError):
+        run(path)
+    run(path, '--allow-past-dates')
+    assert Race.objects.get().race_date == date(2020, 9, 6)
+
+
+def test_name_lookup_is_set_wise(tmp_path, drivers, django_assert_num_queries):
+    path = write_csv(tmp_path, [(f"Track {i}", "Somewhere", future(10 + i), "", "Max Verstappen;Lando Norris")
+                                for i in range(20)])
+    # one driver-name lookup however many rows mention them, one lookup of the races already there
+    with django_assert_num_queries(2):
+        run(path, '--dry-run')
@@ -0,0 +1,92 @@
+import pytest
+from datetime import date, timedelta
+from django.urls import reverse
+from django.utils import timezone
+from racing.models import Team, Driver, Race
+from racing.views import LIST_PAGE_SIZE
+
+
+@pytest.fixture
+def grid(db):
+    today = timezone.now().date()
+    teams = [Team.objects.create(name=f"Team {t}", location="Somewhere", logo="logos/logo.png") for t in range(3)]
+    drivers = [
+        Driver.objects.create(first_name=f"Driver{i}", last_name="Grid", dob=date(1990, 1, i + 1), team=teams[i % 3])
+        for i in range(6)
+    ]
+    races = []
+    for r in range(3):
+        race = Race.objects.create(race_track_name=f"Track {r}", track_location="Location",
+                                   race_date=today + timedelta(days=10 + r))
+        race.registered_drivers.add(*drivers)
+        races.append(race)
+    return teams, drivers, races
+
+
+@pytest.mark.parametrize('url_name, queries', [
+    # count + page + prefetch (drivers' team is joined into the page query)
+    ('team_list', 3),
+    ('driver_list', 3),
+    ('race_list', 3),
+])
+def test_list_pages_run_constant_queries(client, grid, django_assert_num_queries, url_name, queries):
+    with django_assert_num_queries(queries):
+        response = client.get(reverse(url_name))
+    assert response.status_code == 200
+
+
+def test_driver_list_is_paginated(client, db):
+    Driver.objects.bulk_create([
+        Driver(first_name=f"Driver{i}", last_name="Grid", dob=date(1990, 1, 1) + timedelta(days=i))
+        for i in range(LIST_PAGE_SIZE + 5)
+    ])
+    response = client.get(reverse('driver_list'))
+    assert len(response.context['drivers']) == LIST_PAGE_SIZE
+    response = client.get(reverse('driver_list'), {'page': 2})
+    assert len(response.context['drivers']) == 5
+
+
+def test_driver_row_refreshes_after_team_rename(client, grid, django_capture_on_commit_callbacks):
+    teams, drivers, races = grid
+    assert "Team 0" in client.get(reverse('driver_list')).content.decode()
+    teams[0].name = "Renamed Team"
+    with django_capture_on_commit_callbacks(execute=True):
+        teams[0].save()
+    assert "Renamed Team" in client.get(reverse('driver_list')).content.decode()
+
+
+def test_race_row_refreshes_after_registration_change(client, grid, django_capture_on_commit_callbacks):
+    teams, drivers, races = grid
+    newcomer = Driver.objects.create(first_name="Rookie", last_name="Newcomer", dob=date(1999, 9, 9))
+    assert "Rookie Newcomer" not in client.get(reverse('race_list')).content.decode()
+    with django_capture_on_commit_callbacks(execute=True):
+        races[0].registered_drivers.add(newcomer)
+    assert "Rookie Newcomer" in client.get(reverse('race_list')).content.decode()
+    with django_capture_on_commit_callbacks(execute=True):
+        races[0].registered_drivers.clear()
+        newcomer.registered_races.add(races[1])
+    content = client.get(reverse('race_list')).content.decode()
+    assert content.count("Rookie Newcomer") == 1
+
+
+def test_team_row_refreshes_after_driver_moves(client, grid, django_capture_on_commit_callbacks):
+    teams, drivers, races = grid
+    driver = drivers[0]
+    client.get(reverse('team_list'))
+    driver.first_name = "Moved"
+    driver.team = teams[1]
+    with django_capture_on_commit_callbacks(execute=True):
+        driver.save()
+    content = client.get(reverse('team_list')).content.decode()
+    assert content.count("Moved Grid") == 1
+
+
+def test_rows_are_dropped_when_the_write_commits(client, grid, django_capture_on_commit_callbacks):
+    teams, drivers, races = grid
+    client.get(reverse('team_list'))
+    with django_capture_on_commit_callbacks(execute=True):
+        teams[0].name = "Renamed Team"
+        teams[0].save()
+        #a page rendered before the commit would cache the old row again: it still gets the cached one
+        assert "Renamed Team" not in client.get(reverse('team_list')).content.decode()
+    assert "Renamed Team" in client.get(reverse('team_list')).content.decode()
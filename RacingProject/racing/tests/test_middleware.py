@@ -0,0 +1,61 @@
+import json
+import logging
+import pytest
+from datetime import date
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.urls import reverse
+from racing.middleware import QueryTimingMiddleware
+from racing.models import Team, Driver
+
+
+
+@pytest.fixture
+def drivers(db):
+    team = Team.objects.create(name="Alpine", location="Enstone", logo="logos/logo.png")
+    return [Driver.objects.create(first_name=f"Driver{i}", last_name="Alpine", dob=date(1995, 1, i + 1), team=team)
+            for i in range(3)]
+
+
+def n_plus_one(request):
+    #one query per driver: the pattern the middleware should surface
+    for driver in Driver.objects.order_by('id'):
+        list(driver.registered_races.all())
+    return HttpResponse("ok")
+
+
+def test_server_timing_header(client, drivers, settings):
+    settings.MIDDLEWARE = ['racing.middleware.QueryTimingMiddleware'] + settings.MIDDLEWARE
+    response = client.get(reverse('driver-list'))
+    timing = response['Server-Timing']
+    assert timing.startswith('db;dur=')
+    assert '"2 queries, 0 duplicates"' in timing
+    assert 'view;dur=' in timing
+
+
+def test_async_views_are_measured(client, drivers, settings):
+    settings.MIDDLEWARE = ['racing.middleware.QueryTimingMiddleware'] + settings.MIDDLEWARE
+    response = client.get(reverse('driver-list-async'))
+    assert '"2 queries, 0 duplicates"' in response['Server-Timing']
+
+
+def test_slow_request_log_names_the_duplicated_sql(drivers, settings, caplog):
+    settings.RACING_SLOW_REQUEST_MS = 0
+    with caplog.at_level(logging.WARNING, logger='racing.requests'):
+        response = QueryTimingMiddleware(n_plus_one)(RequestFactory().get('/drivers/'))
+    assert '"4 queries, 2 duplicates"' in response['Server-Timing']
+    record = json.loads(caplog.records[-1].getMessage())
+    assert record['path'] == '/drivers/'
+    assert record['queries'] == 4
+    assert record['duplicates'] == 2
+    assert record['top_duplicate_count'] == 3
+    assert 'racing_race_registered_drivers' in record['top_duplicate_sql']
+
+
+def test_fast_requests_are_not_logged(drivers, settings, caplog):
+    settings.RACING_SLOW_REQUEST_MS = 10_000
+    settings.RACING_SERVER_TIMING = False
+    with caplog.at_level(logging.WARNING, logger='racing.requests'):
+        response = QueryTimingMiddleware(n_plus_one)(RequestFactory().get('/drivers/'))
+    assert not caplog.records
+    assert not response.has_header('Server-Timing')
@@ -1,6 +1,8 @@
 import pytest
 from django.core.exceptions import ValidationError
 from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.migrations.executor import MigrationExecutor
 from racing.models import validate_image_size, validate_dob
 from django.utils import timezone
 from racing.models import Team, Driver, Race
@@ -191,3 +193,57 @@ def test_race_str():
     assert str(race) == "Monaco Grand Prix"
 
 
+
+
+@pytest.mark.django_db
+def test_duplicate_driver_rejected_by_database():
+    from django.db import IntegrityError
+    Driver.objects.create(first_name="Max", last_name="Verstappen", dob=date(1995, 5, 5))
+    with pytest.raises(IntegrityError):
+        Driver.objects.bulk_create([Driver(first_name="Max", last_name="Verstappen", dob=date(1995, 5, 5))])
+
+
+@pytest.mark.django_db
+def test_same_name_with_different_dob_allowed():
+    Driver.objects.create(first_name="Max", last_name="Verstappen", dob=date(1995, 5, 5))
+    driver = Driver(first_name="Max", last_name="Verstappen", dob=date(1996, 6, 6))
+    driver.full_clean()
+    driver.save()
+    assert Driver.objects.filter(first_name="Max", last_name="Verstappen").count() == 2
+
+
+@pytest.mark.django_db
+def test_has_race_entries_is_a_single_query(django_assert_num_queries):
+    team = Team.objects.create(name="Busy Team", location="Grid", logo="logos/logo.png")
+    drivers = [Driver.objects.create(first_name=f"Driver{i}", last_name="Busy", dob=date(1990, 1, i + 1), team=team)
+               for i in range(5)]
+    race = Race.objects.create(race_track_name="Monza", track_location="Italy",
+                               race_date=timezone.now().date() + timedelta(days=10))
+    race.registered_drivers.add(drivers[-1])
+    with django_assert_num_queries(1):
+        assert team.has_race_entries()
+    with django_assert_num_queries(1):
+        assert not drivers[0].has_race_entries()
+    with django_assert_num_queries(1):
+        assert race.has_race_entries()
+
+
+@pytest.mark.django_db(transaction=True)
+def test_identity_constraint_migration_lists_existing_duplicates():
+    before, constraint = ('racing', '0002_keyset_pagination_indexes'), ('racing', '0003_driver_identity_constraint')
+    executor = MigrationExecutor(connection)
+    latest = executor.loader.graph.leaf_nodes()
+    try:
+        executor.migrate([before])
+        OldDriver = executor.loader.project_state(before).apps.get_model('racing', 'Driver')
+        twins = [OldDriver.objects.create(first_name="Lewis", last_name="Hamilton", dob=date(1985, 1, 7))
+                 for _ in range(2)]
+        OldDriver.objects.create(first_name="Lewis", last_name="Hamilton", dob=date(1985, 1, 8))
+        executor.loader.build_graph()
+        with pytest.raises(RuntimeError, match=rf"Lewis Hamilton \(1985-01-07\): ids {twins[0].pk}, {twins[1].pk}$"):
+            executor.migrate([constraint])
+        twins[1].delete()
+    finally:
+        executor.loader.build_graph()
+        executor.migrate(latest)
+    assert Driver.objects.count() == 2
@@ -0,0 +1,82 @@
+import json
+from base64 import urlsafe_b64encode
+from datetime import date, timedelta
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.request import Request
+from rest_framework.test import APITestCase, APIRequestFactory
+from rest_framework import status
+from racing.models import Team, Driver, Race
+from racing.pagination import KeysetPagination
+
+
+class KeysetPaginationTests(APITestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        #several drivers share a last name so the cursor has to use the whole ordering
+        names = [("Max", "Smith"), ("Anna", "Smith"), ("Zoe", "Smith"), ("Lewis", "Brown"),
+                 ("Carl", "Young"), ("Anna", "Smith"), ("Ben", "Adams")]
+        for i, (first_name, last_name) in enumerate(names):
+            Driver.objects.create(first_name=first_name, last_name=last_name, dob=date(1990, 1, i + 1))
+        today = timezone.now().date()
+        for i in range(5):
+            Race.objects.create(race_track_name=f"Track {i}", track_location="Location",
+                                race_date=today + timedelta(days=10 + i // 2))
+        for i in range(3):
+            Team.objects.create(name=f"Team {i}", location="Somewhere", logo="logos/logo.png")
+
+    def walk(self, url):
+        pages, results = 0, []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            results.extend(response.data['results'])
+            pages += 1
+            url = response.data['next']
+        return results, response
+
+    def test_drivers_walk_in_name_order(self):
+        results, _ = self.walk(reverse('driver-list') + '?page_size=2')
+        expected = list(Driver.objects.order_by('last_name', 'first_name', 'id').values_list('id', flat=True))
+        self.assertEqual([row['id'] for row in results], expected)
+
+    def test_previous_links_walk_back(self):
+        _, last_page = self.walk(reverse('race-list') + '?page_size=2')
+        seen = [row['id'] for row in last_page.data['results']]
+        url = last_page.data['previous']
+        while url:
+            response = self.client.get(url)
+            seen = [row['id'] for row in response.data['results']] + seen
+            url = response.data['previous']
+        expected = list(Race.objects.order_by('race_date', 'id').values_list('id', flat=True))
+        self.assertEqual(seen, expected)
+
+    def test_first_page_has_no_previous(self):
+        response = self.client.get(reverse('team-list') + '?page_size=2')
+        self.assertIsNone(response.data['previous'])
+        self.assertEqual(len(response.data['results']), 2)
+        self.assertIsNotNone(response.data['next'])
+
+    def test_page_size_is_capped(self):
+        paginator = KeysetPagination()
+        request = Request(APIRequestFactory().get('/', {'page_size': paginator.max_page_size + 1}))
+        self.assertEqual(paginator.get_page_size(request), paginator.max_page_size)
+        request = Request(APIRequestFactory().get('/', {'page_size': 'abc'}))
+        self.assertEqual(paginator.get_page_size(request), paginator.page_size)
+
+    def test_invalid_cursor_returns_404(self):
+        response = self.client.get(reverse('race-list') + '?cursor=not-a-cursor')
+        self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_cursor_with_wrong_value_types_returns_404(self):
+        for position in (["abc", 1], ["2030-01-01", "x"], [None, 1], [[1], {}]):
+            cursor = urlsafe_b64encode(json.dumps({'p': position}).encode()).decode()
+            for name in ('race-list', 'race-list-async'):
+                response = self.client.get(reverse(name), {'cursor': cursor})
+                self.assertEqual(response.status_code, status.HTTP_404_NOT_FOUND, (name, position))
+
+    def test_deep_page_query_count_matches_first_page(self):
+        first = self.client.get(reverse('driver-list') + '?page_size=2')
+        with self.assertNumQueries(2):
+            self.client.get(first.data['next'])
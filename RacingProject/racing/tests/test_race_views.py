@@ -3,6 +3,8 @@ from django.urls import reverse
 from datetime import date, timedelta
 from racing.models import Race, Driver
 from django.test import TestCase
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
 from django.contrib.messages import get_messages
 
 
@@ -174,3 +176,14 @@ class RaceDeleteViewTests(TestCase):
         messages = list(get_messages(response.wsgi_request))
         self.assertTrue(any("Cannot delete Race" in str(m) for m in messages))
         self.assertTrue(Race.objects.filter(id=self.race.id).exists())
+
+    def test_delete_checks_entries_once_under_a_lock(self):
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get(self.url)
+        sql = [query['sql'] for query in queries.captured_queries]
+        checks = [i for i, statement in enumerate(sql) if 'racing_race_registered_drivers' in statement
+                  and statement.startswith('SELECT')]
+        locks = [i for i, statement in enumerate(sql) if statement.startswith('UPDATE "racing_race"')
+                 or 'FOR UPDATE' in statement]
+        self.assertEqual(len(checks), 1)
+        self.assertTrue(locks and locks[0] < checks[0])
@@ -0,0 +1,134 @@
+import pytest
+from datetime import timedelta
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from racing import counters
+from racing.registration import (ALREADY_REGISTERED, NOT_FOUND, NOT_REGISTERED, RACE_FULL, REGISTERED, REMOVED,
+                                 change_registrations, register_drivers)
+from racing.tests.factories import make_driver, make_race
+
+
+def patch(client, url, data):
+    return client.patch(url, data, content_type='application/json')
+
+
+def statuses(results):
+    return [(result['id'], result['status']) for result in results]
+
+
+def test_race_delta_reports_every_id(client, db):
+    race = make_race()
+    kept, dropped, new = make_driver(), make_driver(), make_driver()
+    register_drivers(race, [kept.id, dropped.id])
+
+    response = patch(client, reverse('race-registrations', args=[race.id]),
+                     {'add': [new.id, kept.id, 999999], 'remove': [dropped.id, new.id + 1000]})
+    assert response.status_code == 200
+    data = response.json()
+    assert data['race'] == race.id
+    assert statuses(data['add']) == [(new.id, REGISTERED), (kept.id, ALREADY_REGISTERED), (999999, NOT_FOUND)]
+    assert statuses(data['remove']) == [(dropped.id, REMOVED), (new.id + 1000, NOT_REGISTERED)]
+    assert set(race.registered_drivers.values_list('id', flat=True)) == {kept.id, new.id}
+    assert counters.recount() == {'race.registered_driver_count': 0, 'team.driver_count': 0,
+                                  'team.registered_driver_count': 0}
+
+
+@pytest.mark.parametrize('grid', [5, 60])
+def test_delta_writes_once_whatever_the_grid(db, grid):
+    race = make_race()
+    drivers = [make_driver().id for _ in range(grid)]
+    register_drivers(race, drivers[2:])
+    with CaptureQueriesContext(connection) as queries:
+        change_registrations(race, add=drivers[:2], remove=drivers[2:4])
+    sql = [query['sql'] for query in queries.captured_queries]
+    assert sum(statement.startswith('INSERT') for statement in sql) == 1
+    assert sum(statement.startswith('DELETE') for statement in sql) == 1
+    assert len(sql) == 12           #independent of the grid size
+    assert race.registered_drivers.count() == grid - 2
+
+
+def test_removals_free_places_first(client, db):
+    race = make_race(capacity=2)
+    old, new = [make_driver() for _ in range(2)], [make_driver() for _ in range(3)]
+    register_drivers(race, [driver.id for driver in old])
+
+    response = patch(client, reverse('race-registrations', args=[race.id]),
+                     {'add': [driver.id for driver in new], 'remove': [old[0].id]})
+    assert [result['status'] for result in response.json()['add']] == [REGISTERED, RACE_FULL, RACE_FULL]
+    race.refresh_from_db()
+    assert race.registered_driver_count == 2
+
+
+def test_driver_delta(client, db):
+    driver = make_driver()
+    current, joining = make_race(), make_race()
+    full = make_race(capacity=1)
+    register_drivers(current, [driver.id])
+    register_drivers(full, [make_driver().id])
+
+    response = patch(client, reverse('driver-registrations', args=[driver.id]),
+                     {'add': [joining.id, full.id], 'remove': [current.id]})
+    data = response.json()
+    assert data['driver'] == driver.id
+    assert statuses(data['add']) == [(joining.id, REGISTERED), (full.id, RACE_FULL)]
+    assert statuses(data['remove']) == [(current.id, REMOVED)]
+    assert list(driver.registered_races.values_list('id', flat=True)) == [joining.id]
+
+
+def test_empty_or_overlapping_deltas_are_rejected(client, db):
+    race, driver = make_race(), make_driver()
+    url = reverse('race-registrations', args=[race.id])
+    assert patch(client, url, {}).status_code == 400
+    assert patch(client, url, {'add': [driver.id], 'remove': [driver.id]}).status_code == 400
+    assert patch(client, reverse('race-registrations', args=[race.id + 1]), {'add': [driver.id]}).status_code == 404
+
+
+def test_forms_post_deltas_or_full_selections(client, db):
+    race = make_race(capacity=2)
+    drivers = [make_driver() for _ in range(3)]
+    register_drivers(race, [drivers[0].id])
+    url = reverse('edit_race_drivers', args=[race.id])
+
+    assert client.post(url, {'drivers_add': [drivers[1].id], 'drivers_remove': [drivers[0].id]}).status_code == 302
+    assert list(race.registered_drivers.values_list('id', flat=True)) == [drivers[1].id]
+
+    #no JavaScript: the whole selection is posted and diffed
+    assert client.post(url, {'drivers': [drivers[1].id, drivers[2].id]}).status_code == 302
+    assert set(race.registered_drivers.values_list('id', flat=True)) == {drivers[1].id, drivers[2].id}
+
+    #refused: the page comes back with the selection asked for, to be posted whole
+    response = client.post(url, {'drivers_add': [drivers[0].id]})
+    html = response.content.decode()
+    assert response.status_code == 200 and "The race has 2 places" in html
+    assert html.count('<option') == 3 and 'data-delta=' not in html
+
+
+def test_forms_without_javascript_can_clear_the_selection(client, db):
+    race = make_race()
+    drivers = [make_driver() for _ in range(2)]
+    register_drivers(race, [driver.id for driver in drivers])
+    url = reverse('edit_race_drivers', args=[race.id])
+    assert 'name="drivers_full"' in client.get(url).content.decode()
+
+    #no delta and no full selection: nothing to change
+    assert client.post(url, {}).status_code == 302
+    assert race.registered_drivers.count() == 2
+    #every option deselected: only the marker is posted
+    assert client.post(url, {'drivers_full': '1'}).status_code == 302
+    assert not race.registered_drivers.exists()
+
+
+def test_driver_form_only_removes_open_races(client, db):
+    today = timezone.now().date()
+    driver = make_driver()
+    closed = make_race(registration_closure_date=today - timedelta(days=1))
+    open_race = make_race()
+    register_drivers(closed, [driver.id])
+    register_drivers(open_race, [driver.id])
+    url = reverse('register_driver_to_race', args=[driver.id])
+
+    assert client.post(url, {'races_remove': [closed.id]}).status_code == 200      #not a valid choice
+    assert client.post(url, {'races_remove': [open_race.id]}).status_code == 302
+    assert list(driver.registered_races.values_list('id', flat=True)) == [closed.id]
@@ -0,0 +1,71 @@
+import io
+import json
+import pytest
+from datetime import datetime, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from django.core.management import call_command
+from django.urls import reverse
+from django.utils.translation import gettext_lazy
+from rest_framework.exceptions import ParseError
+from rest_framework.renderers import JSONRenderer
+from racing import parsers, renderers
+from racing.parsers import FastJSONParser
+from racing.renderers import FastJSONRenderer
+from racing.tests.factories import make_driver, make_race, make_team
+
+
+@pytest.fixture
+def grid(db):
+    team = make_team()
+    drivers = [make_driver(team=team) for _ in range(3)]
+    race = make_race()
+    race.registered_drivers.add(*drivers)
+    return race
+
+
+def test_output_matches_drf_renderer():
+    data = {'name': "Monza\u2028Autódromo", 'when': datetime(2025, 9, 7, 13, 0, 0, 123456, tzinfo=dt_timezone.utc),
+            'fee': Decimal('12.50'), 'label': gettext_lazy("Race"), 1: [None, True, 1.5]}
+    assert FastJSONRenderer().render(data) == JSONRenderer().render(data)
+
+
+def test_falls_back_without_orjson(monkeypatch):
+    monkeypatch.setattr(renderers, 'orjson', None)
+    monkeypatch.setattr(parsers, 'orjson', None)
+    assert FastJSONRenderer().render({'a': [1]}) == b'{"a":[1]}'
+    assert FastJSONParser().parse(io.BytesIO(b'{"a": [1]}')) == {'a': [1]}
+
+
+def test_indent_goes_through_the_stdlib_encoder():
+    assert FastJSONRenderer().render({'a': 1}, 'application/json; indent=2') == b'{\n  "a": 1\n}'
+
+
+def test_parser_rejects_bad_json():
+    with pytest.raises(ParseError):
+        FastJSONParser().parse(io.BytesIO(b'{"a": NaN}'))
+
+
+def test_api_responses_and_errors(client, grid):
+    response = client.get(reverse('driver-list'))
+    assert response['Content-Type'] == 'application/json'
+    assert len(json.loads(response.content)['results']) == 3
+    response = client.post(reverse('race-register', args=[grid.id]), b'{"drivers": [1,',
+                           content_type='application/json')
+    assert response.status_code == 400 and 'JSON parse error' in response.json()['detail']
+
+
+def test_msgpack_by_accept_header(client, grid):
+    msgpack = pytest.importorskip('msgpack')
+    for name in ('race-list', 'race-list-async'):
+        response = client.get(reverse(name), HTTP_ACCEPT='application/msgpack')
+        assert response['Content-Type'] == 'application/msgpack'
+        assert msgpack.unpackb(response.content)['results'][0]['registered_driver_count'] == 3
+
+
+def test_benchmark_command(grid):
+    out = StringIO()
+    call_command('benchmark_renderers', rows=10, repeat=1, endpoint=['teams', 'drivers'], stdout=out)
+    lines = out.getvalue().splitlines()
+    assert any(line.startswith('drivers') and ' orjson ' in line for line in lines)
+    assert any(line.startswith('teams') and 'json parse' in line for line in lines)
@@ -0,0 +1,90 @@
+import pytest
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured, MiddlewareNotUsed
+from django.db import connections
+from django.http import HttpResponse
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from racing.middleware import ReplicaMiddleware
+from racing.models import Race
+from racing.routers import ReplicaRouter, reads_on_replica
+from racing.tests.factories import make_driver, make_race
+
+#The end-to-end tests need a second database next to 'default'. RacingProject.test_settings
+#adds 'replica' as a test mirror of it: another connection to the same database, so a
+#read's database shows in the queries each connection runs, and committed writes are seen
+#from both (hence transaction=True).
+REPLICA = 'replica'
+needs_replica = pytest.mark.skipif(REPLICA not in settings.DATABASES, reason="no 'replica' database configured")
+
+
+@pytest.fixture
+def routed(settings):
+    settings.RACING_REPLICA_DATABASE = REPLICA
+    settings.DATABASE_ROUTERS = ['racing.routers.ReplicaRouter']
+    settings.MIDDLEWARE = settings.MIDDLEWARE + ['racing.middleware.ReplicaMiddleware']
+
+
+def test_router_reads_from_the_replica_only_when_allowed(settings):
+    settings.RACING_REPLICA_DATABASE = REPLICA
+    router = ReplicaRouter()
+    assert router.db_for_read(Race) == 'default'            #outside a request
+    token = reads_on_replica.set(True)
+    try:
+        assert (router.db_for_read(Race), router.db_for_write(Race)) == (REPLICA, 'default')
+    finally:
+        reads_on_replica.reset(token)
+
+
+def test_middleware_needs_a_known_replica(settings):
+    settings.RACING_REPLICA_DATABASE = None
+    with pytest.raises(MiddlewareNotUsed):
+        ReplicaMiddleware(lambda request: HttpResponse())
+    settings.RACING_REPLICA_DATABASE = 'nowhere'
+    with pytest.raises(ImproperlyConfigured):
+        ReplicaMiddleware(lambda request: HttpResponse())
+
+
+def read_from(client, url):
+    """(response, database the request read from)."""
+    with CaptureQueriesContext(connections['default']) as primary, CaptureQueriesContext(connections[REPLICA]) as replica:
+        response = client.get(url)
+    assert not (primary and replica), "a request read from both databases"
+    return response, 'default' if primary else REPLICA if replica else None
+
+
+@needs_replica
+@pytest.mark.django_db(databases=['default', REPLICA], transaction=True)
+def test_writers_are_pinned_to_the_primary(client, routed):
+    race, driver = make_race(), make_driver()
+    url = reverse('race-detail', args=[race.id])
+    response, database = read_from(client, url)
+    assert (response.status_code, database) == (200, REPLICA)
+
+    response = client.post(reverse('add-drivers-to-race', args=[race.id]), {'drivers': [driver.id]},
+                           content_type='application/json')
+    assert response.status_code == 200 and 'racing_primary' in response.cookies
+    response, database = read_from(client, url)
+    assert (response.json()['registered_driver_count'], database) == (1, 'default')
+    assert read_from(client, reverse('race-detail-async', args=[race.id]))[1] == 'default'
+    assert read_from(Client(), url)[1] == REPLICA
+
+    client.cookies['racing_primary'] = '1'                #pin expired
+    assert read_from(client, reverse('race-list'))[1] == REPLICA
+
+
+@needs_replica
+@pytest.mark.django_db(databases=['default', REPLICA], transaction=True)
+def test_replica_responses_are_cached_apart(client, routed):
+    race = make_race()
+    other = Client()
+    assert read_from(other, reverse('race-list'))[1] == REPLICA
+    client.patch(reverse('race-registrations', args=[race.id]), {'add': [make_driver().id]},
+                 content_type='application/json')
+    #the primary's response isn't served to replica readers, nor the other way round
+    response, database = read_from(client, reverse('race-list'))
+    assert (response.json()['results'][0]['registered_driver_count'], database) == (1, 'default')
+    assert read_from(other, reverse('race-list'))[1] == REPLICA
+    assert read_from(other, reverse('race-list'))[1] is None          #now cached
+    assert 'Places' in client.get(reverse('race_list')).content.decode()
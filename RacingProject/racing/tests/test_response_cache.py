@@ -0,0 +1,81 @@
+from datetime import date, timedelta
+from django.urls import reverse
+from django.utils import timezone
+from rest_framework.test import APITestCase
+from rest_framework import status
+from racing.caching import bump_generation, get_generations
+from racing.models import Team, Driver, Race
+
+
+class ResponseCacheTests(APITestCase):
+
+    def setUp(self):
+        self.team = Team.objects.create(name="Red Bull Racing", location="Milton Keynes", logo="logos/logo.png")
+        self.driver = Driver.objects.create(first_name="Max", last_name="Verstappen", dob=date(1997, 9, 30), team=self.team)
+        self.race = Race.objects.create(race_track_name="Monza", track_location="Italy",
+                                        race_date=timezone.now().date() + timedelta(days=10))
+
+    def test_repeated_reads_skip_the_database(self):
+        url = reverse('driver-list')
+        first = self.client.get(url)
+        with self.assertNumQueries(0):
+            second = self.client.get(url)
+        self.assertEqual(first.data, second.data)
+
+    def test_query_string_is_part_of_the_key(self):
+        self.client.get(reverse('driver-list'))
+        with self.assertNumQueries(2):
+            self.client.get(reverse('driver-list') + '?page_size=1')
+
+    def test_save_invalidates_dependent_responses(self):
+        detail = reverse('driver-detail', args=[self.driver.id])
+        self.assertEqual(self.client.get(detail).data['team'], "Red Bull Racing")
+        self.team.name = "Oracle Red Bull Racing"
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.save()
+        self.assertEqual(self.client.get(detail).data['team'], "Oracle Red Bull Racing")
+
+    def test_registration_invalidates_race_and_driver(self):
+        race_url = reverse('race-detail', args=[self.race.id])
+        driver_url = reverse('driver-detail', args=[self.driver.id])
+        self.assertEqual(self.client.get(race_url).data['registered_drivers'], [])
+        self.assertEqual(self.client.get(driver_url).data['registered_races'], [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.race.registered_drivers.add(self.driver)
+        self.assertEqual(self.client.get(race_url).data['registered_drivers'], ["Max Verstappen"])
+        self.assertEqual(len(self.client.get(driver_url).data['registered_races']), 1)
+
+    def test_unrelated_write_keeps_entries(self):
+        url = reverse('team-list')
+        self.client.get(url)
+        self.race.track_location = "Monza, Italy"
+        self.race.save()
+        with self.assertNumQueries(0):
+            self.client.get(url)
+
+    def test_delete_invalidates(self):
+        url = reverse('race-list')
+        self.assertEqual(len(self.client.get(url).data['results']), 1)
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.client.delete(reverse('race-delete', args=[self.race.id]))
+        self.assertEqual(response.status_code, status.HTTP_204_NO_CONTENT)
+        self.assertEqual(len(self.client.get(url).data['results']), 0)
+
+    def test_bump_generation_advances_counter(self):
+        before, = get_generations(Race)
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            bump_generation(Race)
+        after, = get_generations(Race)
+        self.assertEqual((len(callbacks), after), (1, before + 1))
+
+    def test_bump_waits_for_the_commit(self):
+        #a read before the commit must not cache the old rows under the new generation
+        url = reverse('driver-detail', args=[self.driver.id])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.team.name = "Oracle Red Bull Racing"
+            self.team.save()
+            generations = get_generations(Team)
+            self.client.get(url)
+            self.assertEqual(get_generations(Team), generations)
+        self.assertNotEqual(get_generations(Team), generations)
+        self.assertEqual(self.client.get(url).data['team'], "Oracle Red Bull Racing")
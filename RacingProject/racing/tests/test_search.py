@@ -0,0 +1,93 @@
+import pytest
+from datetime import date
+from django.db import connection
+from django.urls import reverse
+from racing import search
+from racing.models import Team, Driver, Race
+from racing.tests.factories import make_race, make_team
+
+
+@pytest.fixture
+def grid(db):
+    mercedes = make_team(name="Mercedes", location="Brackley")
+    ferrari = make_team(name="Ferrari", location="Maranello")
+    hamilton = Driver.objects.create(first_name="Lewis", last_name="Hamilton", dob=date(1985, 1, 7), team=ferrari)
+    Driver.objects.create(first_name="George", last_name="Russell", dob=date(1998, 2, 15), team=mercedes)
+    Driver.objects.create(first_name="Lando", last_name="Norris", dob=date(1999, 11, 13))
+    make_race(race_track_name="Hungaroring", track_location="Budapest")
+    return hamilton
+
+
+def names(results):
+    return [(result['type'], result['name']) for result in results]
+
+
+def test_prefix_matches_for_type_ahead(grid):
+    assert names(search.search("ham")) == [('driver', "Lewis Hamilton")]
+    assert names(search.search("lew ham")) == [('driver', "Lewis Hamilton")]
+    assert names(search.search("hung")) == [('race', "Hungaroring")]
+    assert search.search("hamx") == []
+
+
+def test_matches_team_locations_and_names(grid):
+    assert names(search.search("brack")) == [('team', "Mercedes")]
+    assert search.search("lewis")[0]['detail'] == "Ferrari"
+
+
+def test_name_matches_rank_above_location_matches(grid):
+    make_team(name="Budapest Racing", location="Hungary")
+    assert names(search.search("budapest")) == [('team', "Budapest Racing"), ('race', "Hungaroring")]
+
+
+def test_best_match_is_found_among_many(grid):
+    #the best match comes after thousands of weaker ones in id order
+    Driver.objects.bulk_create([Driver(first_name="Hamish", last_name=f"Grid{i}", dob=date(1990, 1, 1))
+                                for i in range(2000)])
+    best = Driver.objects.create(first_name="Hamish", last_name="Hamilton", dob=date(1990, 1, 1))
+    assert search.search("ham", kinds=['driver'], limit=1)[0]['id'] == best.pk
+
+
+def test_type_filter_and_limit(grid):
+    make_team(name="Lando Fan Club", location="Bristol")
+    assert names(search.search("lando", kinds=['team'])) == [('team', "Lando Fan Club")]
+    assert len(search.search("l", limit=2)) <= 2
+
+
+def test_index_follows_writes(grid):
+    grid.last_name = "Hamilton-Smith"
+    grid.save()
+    assert names(search.search("smith")) == [('driver', "Lewis Hamilton-Smith")]
+    Driver.objects.filter(pk=grid.pk).update(first_name="Sir")       #no signals, still indexed
+    assert names(search.search("sir")) == [('driver', "Sir Hamilton-Smith")]
+    Driver.objects.bulk_create([Driver(first_name="Oscar", last_name="Piastri", dob=date(2000, 4, 6))])
+    assert names(search.search("pias")) == [('driver', "Oscar Piastri")]
+    grid.delete()
+    assert search.search("smith") == []
+
+
+def test_triggers_come_back_after_table_rebuild(grid):
+    if connection.vendor != 'sqlite':
+        pytest.skip("SQLite triggers only")
+    with connection.cursor() as cursor:
+        cursor.execute("DROP TRIGGER racing_driver_search_ai")
+    search.ensure_triggers(connection)
+    Driver.objects.create(first_name="Yuki", last_name="Tsunoda", dob=date(2000, 5, 11))
+    assert names(search.search("tsu")) == [('driver', "Yuki Tsunoda")]
+
+
+def test_search_endpoint(client, grid):
+    response = client.get(reverse('search'), {'q': "ham", 'type': "driver,team", 'limit': 5})
+    assert response.status_code == 200
+    assert response.json()['results'] == [
+        {'type': 'driver', 'id': grid.pk, 'name': "Lewis Hamilton", 'detail': "Ferrari"}]
+
+
+@pytest.mark.parametrize('params', [{}, {'q': "ham", 'type': "pilot"}, {'q': "ham", 'limit': 500}])
+def test_search_endpoint_validation(client, db, params):
+    assert client.get(reverse('search'), params).status_code == 400
+
+
+def test_search_queries(client, grid, django_assert_num_queries):
+    #an index lookup per kind, then one fetch per kind found (a team and a race)
+    with django_assert_num_queries(5):
+        client.get(reverse('search'), {'q': "b"})
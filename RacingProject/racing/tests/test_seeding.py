@@ -0,0 +1,63 @@
+import pytest
+from io import StringIO
+from django.core.management import call_command
+from django.core.management.base import CommandError
+from racing.models import Team, Driver, Race
+from racing.seeding import SEED_LOGO, driver_identity, seed
+from racing.tests.factories import make_driver, make_race, make_team
+
+
+def test_seed_creates_valid_rows(db):
+    created = seed(teams=3, drivers=50, races=4, entries_per_race=10, batch_size=7)
+    assert created == {'teams': 3, 'drivers': 50, 'races': 4, 'entries': 40}
+    assert {team.logo.name for team in Team.objects.all()} == {SEED_LOGO}
+    assert all(team.logo_renditions for team in Team.objects.all())
+    for obj in list(Team.objects.all()) + list(Driver.objects.all()) + list(Race.objects.all()):
+        obj.full_clean()
+    for race in Race.objects.all():
+        assert race.registered_drivers.count() == 10
+
+
+def test_seed_adds_to_existing_data(db):
+    seed(teams=2, drivers=10)
+    seed(drivers=10, races=2, entries_per_race=5)
+    assert Driver.objects.count() == 20
+    assert Driver.objects.filter(team__isnull=False).exists()
+    #entries come from the drivers created by the second run
+    first_run = set(Driver.objects.order_by('id').values_list('id', flat=True)[:10])
+    for race in Race.objects.all():
+        assert not first_run & set(race.registered_drivers.values_list('id', flat=True))
+
+
+def test_seed_after_deletions(db):
+    seed(teams=3, drivers=10)
+    Team.objects.filter(id__in=Team.objects.order_by('id').values('id')[:1]).delete()
+    Driver.objects.filter(id__in=Driver.objects.order_by('id').values('id')[:4]).delete()
+    drivers = Driver.objects.count()
+    assert seed(teams=2, drivers=5) == {'teams': 2, 'drivers': 5, 'races': 0, 'entries': 0}
+    assert (Team.objects.count(), Driver.objects.count()) == (4, drivers + 5)
+
+
+def test_driver_identities_are_unique():
+    identities = [driver_identity(index) for index in range(20000)]
+    assert len(set(identities)) == len(identities)
+
+
+def test_seed_racing_command(db):
+    out = StringIO()
+    call_command('seed_racing', '--teams', '2', '--drivers', '30', '--races', '3', '--entries-per-race', '4',
+                 stdout=out)
+    assert "Created 2 teams, 30 drivers, 3 races and 12 entries" in out.getvalue()
+    with pytest.raises(CommandError):
+        call_command('seed_racing', stdout=StringIO())
+
+
+def test_factories(db):
+    team = make_team()
+    driver = make_driver(team=team)
+    race = make_race()
+    race.registered_drivers.add(driver)
+    for obj in (driver, race):
+        obj.full_clean()
+    assert make_team().name != team.name
+    assert list(team.drivers.all()) == [driver]
@@ -149,3 +149,45 @@ class DriverSerializerTest(APITestCase):
         self.assertFalse(serializer.is_valid())
         self.assertIn("team", serializer.errors)
 
+
+
+@pytest.mark.django_db
+def test_race_serializer_resolves_driver_names_in_one_query(django_assert_num_queries):
+    for i in range(5):
+        Driver.objects.create(first_name=f"Driver{i}", last_name="Grid", dob=date(1990, 1, i + 1))
+    names = [f"Driver{i} Grid" for i in range(5)]
+    serializer = RaceSerializer()
+    with django_assert_num_queries(1):
+        drivers = serializer.fields['registered_drivers'].to_internal_value(names)
+    assert [str(driver) for driver in drivers] == names
+
+
+@pytest.mark.django_db
+def test_race_serializer_reports_unknown_and_ambiguous_names_together():
+    Driver.objects.create(first_name="Max", last_name="Verstappen", dob=date(1997, 9, 30))
+    Driver.objects.create(first_name="Max", last_name="Verstappen", dob=date(1998, 1, 1))
+    data = {
+        'race_track_name': 'Monza',
+        'track_location': 'Italy',
+        'race_date': (timezone.now().date() + timedelta(days=10)).isoformat(),
+        'registered_drivers': ['Max Verstappen', 'Nobody Known', 'Invalid'],
+    }
+    serializer = RaceSerializer(data=data)
+    assert not serializer.is_valid()
+    errors = [str(error) for error in serializer.errors['registered_drivers']]
+    assert len(errors) == 3
+    assert any("ambiguous" in error for error in errors)
+    assert any("'Nobody Known' not found" in error for error in errors)
+    assert any("Invalid driver name format" in error for error in errors)
+
+
+@pytest.mark.django_db
+def test_add_drivers_to_race_serializer_unknown_driver():
+    race = Race.objects.create(
+        race_track_name="Monaco GP",
+        track_location="Monaco",
+        race_date=timezone.now().date() + timedelta(days=10)
+    )
+    serializer = AddDriversToRaceSerializer2(data={'drivers': ['Ghost Driver']}, context={'race': race})
+    assert not serializer.is_valid()
+    assert "not found" in str(serializer.errors['drivers'][0])
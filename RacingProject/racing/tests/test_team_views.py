@@ -1,11 +1,12 @@
 import pytest
+from django.core.management import call_command
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.core.exceptions import ValidationError
 from racing.models import Team, Driver, Race
 
 from django.test import TestCase
-from io import BytesIO
+from io import BytesIO, StringIO
 import os
 from PIL import Image
 from django.test import Client
@@ -168,3 +169,43 @@ class TeamDeleteViewTests(TestCase):
 
 
 
+
+
+@pytest.mark.django_db
+def test_logo_renditions_built_on_upload(client, settings, tmp_path):
+    settings.MEDIA_ROOT = str(tmp_path)
+    team = Team.objects.create(name="Rendered", location="Somewhere", logo=generate_test_logo())
+    assert set(team.logo_renditions) == {'64', '256'}
+    # the same logo bytes map to the same content-hashed files
+    other = Team.objects.create(name="Rendered Twice", location="Elsewhere", logo=generate_test_logo())
+    assert other.logo_renditions == team.logo_renditions
+
+    response = client.get(team.rendition_url(64))
+    assert response.status_code == 200
+    assert response['Cache-Control'] == 'public, max-age=31536000, immutable'
+    image = Image.open(BytesIO(b''.join(response.streaming_content)))
+    assert max(image.size) == 64
+
+
+@pytest.mark.django_db
+def test_rendition_command_refreshes_cached_rows(client, settings, tmp_path, django_capture_on_commit_callbacks):
+    settings.MEDIA_ROOT = str(tmp_path)
+    team = Team.objects.create(name="Rendered", location="Somewhere", logo=generate_test_logo())
+    Team.objects.filter(pk=team.pk).update(logo_renditions={})      #uploaded before renditions existed
+    assert team.logo.url in client.get(reverse('team_list')).content.decode()
+    with django_capture_on_commit_callbacks(execute=True):
+        call_command('build_logo_renditions', stdout=StringIO())
+    team.refresh_from_db()
+    assert team.rendition_url(64) in client.get(reverse('team_list')).content.decode()
+
+
+@pytest.mark.django_db
+def test_unreadable_logo_has_no_renditions(team):
+    assert team.logo_renditions == {}
+    assert team.logo_thumbnail_url == team.logo.url
+
+
+@pytest.mark.django_db
+def test_logo_rendition_rejects_unknown_names(client):
+    assert client.get(reverse('logo-rendition', args=['settings.py'])).status_code == 404
+    assert client.get(reverse('logo-rendition', args=['0' * 20 + '-64.webp'])).status_code == 404
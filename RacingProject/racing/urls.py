@@ -10,6 +10,7 @@ urlpatterns = [
     path('team/create/', views.team_create, name='team_create'),
     path('team/<int:pk>/update/', views.team_edit, name='team_edit'),
     path('team/<int:pk>/delete/', TeamDeleteView.as_view(), name='team_delete'),
+    path('logos/renditions/<str:name>', views.logo_rendition, name='logo-rendition'),
 
     path('driver/', views.driver_list, name='driver_list'),
     path('driver/create/', views.driver_create, name='driver_create'),
@@ -24,25 +25,53 @@ urlpatterns = [
     path('driver/<int:driver_id>/race-register/', views.register_driver_to_race, name='register_driver_to_race'),
     path('race/<int:race_id>/edit-driver/', views.edit_race_drivers, name='edit_race_drivers'),
 
+    path('async/team/', views.team_list_async, name='team_list_async'),
+    path('async/driver/', views.driver_list_async, name='driver_list_async'),
+    path('async/race/', views.race_list_async, name='race_list_async'),
+
+    path('export/race-entries.<str:fmt>', views.export_race_entries, name='export_race_entries'),
+    path('export/team-rosters.<str:fmt>', views.export_team_rosters, name='export_team_rosters'),
+
 #API views urls
     path('teams/', TeamListView.as_view(), name='team-list'),
     path('teams/create/', TeamCreateView.as_view(), name='team-create'),
     path('teams/<int:pk>/', TeamRetrieveView.as_view(), name='team-detail'),
     path('teams/<int:pk>/update/', TeamUpdateView.as_view(), name='team-update'),
     path('teams/<int:pk>/delete/', TeamDeleteViewAPI.as_view(), name='team-delete'),
+    path('teams/bulk-delete/', TeamBulkDeleteAPIView.as_view(), name='team-bulk-delete'),
 
     path('drivers/', DriverListView.as_view(), name='driver-list'),
     path('drivers/create/', DriverCreateView.as_view(), name='driver-create'),
     path('drivers/<int:pk>/', DriverRetrieveView.as_view(), name='driver-detail'),
     path('drivers/<int:pk>/update/', DriverUpdateView.as_view(), name='driver-update'),
     path('drivers/<int:pk>/delete/', DriverDeleteViewAPI.as_view(), name='driver-delete'),
+    path('drivers/bulk-delete/', DriverBulkDeleteAPIView.as_view(), name='driver-bulk-delete'),
+    path('drivers/bulk/', DriverBulkSaveAPIView.as_view(), name='driver-bulk-save'),
 
     path('races/', RaceListView.as_view(), name='race-list'),
+    path('races/upcoming/', UpcomingRaceListView.as_view(), name='race-upcoming'),
     path('races/create/', RaceCreateView.as_view(), name='race-create'),
     path('races/<int:pk>/', RaceRetrieveView.as_view(), name='race-detail'),
     path('races/<int:pk>/update/', RaceUpdateView.as_view(), name='race-update'),
     path('races/<int:pk>/delete/', RaceDeleteViewAPI.as_view(), name='race-delete'),
+    path('races/bulk-delete/', RaceBulkDeleteAPIView.as_view(), name='race-bulk-delete'),
    
     path('races/<int:race_id>/add-drivers/', AddDriversToRaceAPIView.as_view(), name='add-drivers-to-race'),
+    path('races/<int:race_id>/register/', RaceRegistrationAPIView.as_view(), name='race-register'),
+    path('races/<int:race_id>/registrations/', RaceRegistrationChangeAPIView.as_view(), name='race-registrations'),
+    path('drivers/<int:driver_id>/registrations/', DriverRegistrationChangeAPIView.as_view(),
+         name='driver-registrations'),
+    path('search/', SearchAPIView.as_view(), name='search'),
+    path('lookup/drivers/', DriverLookupView.as_view(), name='driver-lookup'),
+    path('lookup/races/', RaceLookupView.as_view(), name='race-lookup'),
+
+#async read API (same responses, for the ASGI deployment)
+    path('async/teams/', AsyncTeamListView.as_view(), name='team-list-async'),
+    path('async/teams/<int:pk>/', AsyncTeamRetrieveView.as_view(), name='team-detail-async'),
+    path('async/drivers/', AsyncDriverListView.as_view(), name='driver-list-async'),
+    path('async/drivers/<int:pk>/', AsyncDriverRetrieveView.as_view(), name='driver-detail-async'),
+    path('async/races/', AsyncRaceListView.as_view(), name='race-list-async'),
+    path('async/races/upcoming/', AsyncUpcomingRaceListView.as_view(), name='race-upcoming-async'),
+    path('async/races/<int:pk>/', AsyncRaceRetrieveView.as_view(), name='race-detail-async'),
    
 ]
\ No newline at end of file
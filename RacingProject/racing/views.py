@@ -1,29 +1,69 @@
 from django.shortcuts import render,redirect,get_object_or_404
-from django.http import HttpResponse, HttpResponseRedirect
+from django.http import FileResponse, Http404, HttpResponse, HttpResponseRedirect, StreamingHttpResponse
 from django.urls import reverse_lazy
+from django.views import View
 from django.views.generic import DeleteView
-from django.core.exceptions import ValidationError
+from django.core.exceptions import ObjectDoesNotExist, ValidationError
 from django.contrib import messages
+from django.core.paginator import Paginator
+from django.db import IntegrityError
+from django.db.models import Prefetch
 from django.utils import timezone
 
 from rest_framework import viewsets, status, generics
+from rest_framework.exceptions import APIException
+from rest_framework.negotiation import DefaultContentNegotiation
+from rest_framework.renderers import BrowsableAPIRenderer
+from rest_framework.request import Request
 from rest_framework.response import Response
 from rest_framework.views import APIView
 from rest_framework.decorators import api_view
 from .models import *
 from .forms import *
 from .serializers import *
+from .registration import (register_drivers, change_registrations, change_driver_registrations,
+                           save_race_entries, RACE_FULL, REGISTERED)
+from .pagination import (TeamPagination, DriverPagination, RacePagination, DriverLookupPagination,
+                         RaceLookupPagination)
+from .deletion import bulk_delete
+from .caching import (aresponse_cache_key, response_cache, response_cache_key, response_cache_timeout,
+                      row_cache_context)
+from .images import RENDITION_DIR, RENDITION_NAME_RE
+from .bulk import MAX_BULK_ROWS, save_drivers
+from .parsers import API_PARSER_CLASSES, CSVParser, FastJSONParser
+from .renderers import API_RENDERER_CLASSES
+from . import exports, search
 
 # Create your views here.
+LIST_PAGE_SIZE = 50   #rows per page on the HTML list pages
+
+def paginate(request, queryset, per_page=LIST_PAGE_SIZE):
+    return Paginator(queryset, per_page).get_page(request.GET.get('page'))
+
+async def apaginate(request, queryset, per_page=LIST_PAGE_SIZE):
+    #paginate() through the async ORM: count and page rows (with their prefetches) are awaited
+    paginator = Paginator(queryset, per_page)
+    paginator.count = await queryset.acount()
+    page = paginator.get_page(request.GET.get('page'))
+    page.object_list = [obj async for obj in page.object_list]
+    return page
 
 def home(request):
     return render(request,'home.html')
 
 #Team Views***
 #Team view (with drivers)
+def team_list_queryset():
+    return Team.objects.order_by('name', 'id').prefetch_related(
+        Prefetch('drivers', queryset=Driver.objects.only('id', 'first_name', 'last_name', 'team_id')))
+
 def team_list(request):
-    teams = Team.objects.all().prefetch_related('drivers')
-    return render(request, 'team/team_list.html', {'teams': teams})
+    page = paginate(request, team_list_queryset())
+    return render(request, 'team/team_list.html', {'teams': page, 'page_obj': page, **row_cache_context()})
+
+async def team_list_async(request):
+    page = await apaginate(request, team_list_queryset())
+    return render(request, 'team/team_list.html', {'teams': page, 'page_obj': page, **row_cache_context()})
 
 def team_create(request):
     if request.method == 'POST':
@@ -55,12 +95,12 @@ class TeamDeleteView(DeleteView):
         return self.delete(self, request, *args, **kwargs)
 
     def delete(self, request, *args, **kwargs):
-        self.object= self.get_object()
-        if self.object.drivers.filter(registered_races__isnull=False).exists():
+        #the model refuses to delete while there are race entries, checked under a lock
+        try:
+            return super().delete(request, *args, **kwargs)
+        except ValidationError:
             messages.error(self.request, "Cannot delete Team: One or more Drivers have registered for races. ")
             return HttpResponseRedirect(self.success_url)
-        
-        return super().delete(request, *args, **kwargs)
 
 ''' 
 def team_delete(request, pk):
@@ -86,10 +126,31 @@ def team_delete(request, pk):
     return redirect('team_list')
 '''
 
+#Logo renditions are named by content hash, so a URL never changes meaning
+def logo_rendition(request, name):
+    if not RENDITION_NAME_RE.match(name):
+        raise Http404("Unknown rendition")
+    storage = Team._meta.get_field('logo').storage
+    try:
+        rendition = storage.open(RENDITION_DIR + name, 'rb')
+    except FileNotFoundError:
+        raise Http404("Unknown rendition")
+    response = FileResponse(rendition, content_type='image/webp' if name.endswith('.webp') else 'image/png')
+    response['Cache-Control'] = 'public, max-age=31536000, immutable'
+    return response
+
 #Driver Views***
+def driver_list_queryset():
+    return Driver.objects.order_by('last_name', 'first_name', 'id').select_related('team').prefetch_related(
+        Prefetch('registered_races', queryset=Race.objects.only('id', 'race_track_name', 'race_date')))
+
 def driver_list(request):
-    drivers = Driver.objects.all()
-    return render(request, 'driver/driver_list.html', {'drivers': drivers})  
+    page = paginate(request, driver_list_queryset())
+    return render(request, 'driver/driver_list.html', {'drivers': page, 'page_obj': page, **row_cache_context()})
+
+async def driver_list_async(request):
+    page = await apaginate(request, driver_list_queryset())
+    return render(request, 'driver/driver_list.html', {'drivers': page, 'page_obj': page, **row_cache_context()})
 '''
 #Driver view (upcoming + Registered races)
 def driver_detail(request, driver_id):
@@ -125,12 +186,12 @@ class DriverDeleteView(DeleteView):
         return self.delete(self, request, *args, **kwargs)
 
     def delete(self, request, *args, **kwargs):
-        self.object= self.get_object()
-        if self.object.registered_races.exists():   # Prevent deletion if registered to at least one race
+        #the model refuses to delete while there are race entries, checked under a lock
+        try:
+            return super().delete(request, *args, **kwargs)
+        except ValidationError:
             messages.error(self.request, "Cannot delete Driver: Driver have registered for races. ")
             return HttpResponseRedirect(self.success_url)
-        
-        return super().delete(request, *args, **kwargs)
 '''
 def driver_delete(request, pk):
     driver = get_object_or_404(Driver, pk=pk)
@@ -144,9 +205,17 @@ def driver_delete(request, pk):
 '''    
 
 #Race Views***
+def race_list_queryset():
+    return Race.objects.order_by('race_date', 'id').prefetch_related(
+        Prefetch('registered_drivers', queryset=Driver.objects.only('id', 'first_name', 'last_name')))
+
 def race_list(request):
-    races = Race.objects.all()
-    return render(request, 'race/race_list.html', {'races': races})
+    page = paginate(request, race_list_queryset())
+    return render(request, 'race/race_list.html', {'races': page, 'page_obj': page, **row_cache_context()})
+
+async def race_list_async(request):
+    page = await apaginate(request, race_list_queryset())
+    return render(request, 'race/race_list.html', {'races': page, 'page_obj': page, **row_cache_context()})
 
 '''
 #Race view (with Registered Drivers)
@@ -155,10 +224,24 @@ def race_detail(request, race_id):
     return render(request, 'race/race_detail.html', {'race': race})
 '''
 
+def save_race_form(form):
+    #capacity and entry list are written in the order the capacity constraint allows, under
+    #the race lock (see save_race_entries())
+    race = form.save(commit=False)
+    try:
+        save_race_entries(race, list(form.cleaned_data['registered_drivers']), race.save)
+    except ValidationError as e:
+        form.add_error('registered_drivers', e)
+        return None
+    except IntegrityError:
+        #race_within_capacity: registrations came in after the form was validated
+        form.add_error('capacity', "The race has more drivers registered than that.")
+        return None
+    return race
+
 def race_create(request):
     form = RaceForm(request.POST or None)
-    if form.is_valid():
-        form.save()
+    if form.is_valid() and save_race_form(form):
         return redirect('race_list')
     return render(request, 'race/race_form.html', {'form': form, 'title': 'Create Race'})
 
@@ -166,8 +249,7 @@ def race_edit(request,pk):
     race = get_object_or_404(Race, pk=pk)
     if request.method == 'POST':
         form = RaceForm(request.POST, instance=race)
-        if form.is_valid():
-            form.save()
+        if form.is_valid() and save_race_form(form):
             return redirect('race_list')
     else:
         form = RaceForm(instance=race)
@@ -180,12 +262,12 @@ class RaceDeleteView(DeleteView):
         return self.delete(self, request, *args, **kwargs)
 
     def delete(self, request, *args, **kwargs):
-        self.object= self.get_object()
-        if self.object.registered_drivers.filter(registered_races__isnull=False).exists():
+        #the model refuses to delete while there are race entries, checked under a lock
+        try:
+            return super().delete(request, *args, **kwargs)
+        except ValidationError:
             messages.error(self.request, "Cannot delete Race: One or more Drivers have registered for races. ")
             return HttpResponseRedirect(self.success_url)
-        
-        return super().delete(request, *args, **kwargs)
 
 '''
 def race_delete(request, pk):
@@ -203,6 +285,20 @@ def race_delete(request, pk):
     return redirect('race_list')
 '''
 
+#Exports*** - streamed, for stewards and broadcasters
+def export_response(records, fields, fmt, filename):
+    if fmt not in exports.FORMATS:
+        raise Http404("Unknown export format")
+    response = StreamingHttpResponse(exports.stream(records, fields, fmt), content_type=exports.FORMATS[fmt])
+    response['Content-Disposition'] = f'attachment; filename="{filename}.{fmt}"'
+    return response
+
+def export_race_entries(request, fmt):
+    return export_response(exports.race_entries(), exports.ENTRY_FIELDS, fmt, 'race-entries')
+
+def export_team_rosters(request, fmt):
+    return export_response(exports.team_rosters(), exports.ROSTER_FIELDS, fmt, 'team-rosters')
+
 # Register driver to race
 def register_driver_to_race(request, driver_id):
     
@@ -211,14 +307,17 @@ def register_driver_to_race(request, driver_id):
         form = RegisterDriverToRaceForm(request.POST)
         if form.is_valid():
             #driver = form.cleaned_data['driver']
-            selected_races = form.cleaned_data['races']
-
-
-            #for race in selected_races:
-            driver.registered_races.set(selected_races)
-            return redirect('driver_list')
+            #only open races are offered, so the closed ones the driver entered stay
+            add, remove = form.changes(driver.registered_races.open_for_registration().values_list('id', flat=True))
+            try:
+                change_driver_registrations(driver, add, remove, partial=False)
+            except ValidationError as e:
+                form.add_error('races', e)
+            else:
+                return redirect('driver_list')
     else:
-        form= RegisterDriverToRaceForm(initial={'races':driver.registered_races.all()})
+        form= RegisterDriverToRaceForm(initial={'races': driver.registered_races.open_for_registration()
+                                                .values_list('id', flat=True)})
         
     return render(request, 'register_driver.html', {'form': form, 'driver': driver, 'title': f'Add/Edit Races for  \'Driver_{driver}\''})
 
@@ -229,124 +328,462 @@ def edit_race_drivers(request, race_id):
         form = EditRaceDriversForm(request.POST)
         if form.is_valid():
             #race = form.cleaned_data['race']
-            selected_drivers = form.cleaned_data['drivers']
-           
-            race.registered_drivers.set(selected_drivers)
-            return redirect('race_list')
+            add, remove = form.changes(race.registered_drivers.values_list('id', flat=True))
+            try:
+                change_registrations(race, add, remove, partial=False)
+            except ValidationError as e:
+                form.add_error('drivers', e)
+            else:
+                return redirect('race_list')
     else:
         #form=  EditRaceDriversForm
-        form=  EditRaceDriversForm(initial={'drivers':race.registered_drivers.all()})
+        form=  EditRaceDriversForm(initial={'drivers': race.registered_drivers.values_list('id', flat=True)})
         
     return render(request, 'register_driver.html', {'form': form, 'title': f"Add/Edit Drivers for 'Race_{race}\'"})
 
 #API Views***
 # 1. modelViewSets, 2. generics API views
+class EagerLoadingMixin:
+    """Let the serializer add the select/prefetch_related calls matching its fields,
+    so list and detail endpoints run in a fixed number of queries. Only the fields the
+    request asked for (?fields=, ?expand=) are loaded."""
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        serializer_class = self.get_serializer_class()
+        selection = serializer_class.field_selection(self.request.query_params)
+        return serializer_class.setup_eager_loading(queryset, *selection)
+
+
+class APIFormatsMixin:
+    """JSON in and out through orjson when it is installed, and application/msgpack on
+    request (Accept header) when msgpack is; see racing.renderers."""
+    renderer_classes = API_RENDERER_CLASSES
+    parser_classes = API_PARSER_CLASSES
+
+
+class CachedResponseMixin:
+    """Serve GET responses from the response cache.
+
+    ``cache_models`` lists every model the serialized output depends on; the key
+    embeds their generation counters, which the signal receivers bump on writes.
+    """
+    cache_models = ()
+
+    def get_cache_key_extra(self):
+        return ''
+
+    def get(self, request, *args, **kwargs):
+        key = response_cache_key(type(self).__name__, self.cache_models, request, self.get_cache_key_extra())
+        data = response_cache().get(key)
+        if data is not None:
+            return Response(data)
+        response = super().get(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            response_cache().set(key, response.data, response_cache_timeout())
+        return response
+
+
 #TEAM API views - list, CRUD 
-class TeamListView(generics.ListAPIView):
+class TeamListView(APIFormatsMixin, CachedResponseMixin, EagerLoadingMixin, generics.ListAPIView):
+    """Teams by name; ?ordering=[-]driver_count|[-]registered_driver_count and
+    ?min_drivers=/?max_drivers=/?min_entries=/?max_entries= use the counter indexes."""
+    cache_models = (Team, Driver)
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
+    pagination_class = TeamPagination
+
+    def get_queryset(self):
+        return filter_counters(super().get_queryset(), self.request.query_params, TeamListFilterSerializer)
  
  
-class TeamCreateView(generics.CreateAPIView):
+class TeamCreateView(APIFormatsMixin, generics.CreateAPIView):
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
  
  
-class TeamRetrieveView(generics.RetrieveAPIView):
+class TeamRetrieveView(APIFormatsMixin, CachedResponseMixin, EagerLoadingMixin, generics.RetrieveAPIView):
+    cache_models = (Team, Driver)
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
  
  
-class TeamUpdateView(generics.UpdateAPIView):
+class TeamUpdateView(APIFormatsMixin, EagerLoadingMixin, generics.UpdateAPIView):
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
  
  
-class TeamDeleteViewAPI(generics.DestroyAPIView):
+class TeamDeleteViewAPI(APIFormatsMixin, generics.DestroyAPIView):
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
 
     def delete(self, request, *args, **kwargs):
-        team = self.get_object()
+        try:
+            return super().destroy(request, *args, **kwargs)
+        except ValidationError:
+            return Response({"error": "Cannot delete team with registered drivers for races."},
+                status=status.HTTP_400_BAD_REQUEST)
+
+
+class BulkDeleteAPIView(APIFormatsMixin, APIView):
+    """POST {"ids": [...]}: delete every id without race entries in one go and
+    report which ones were deleted, blocked by entries or not found."""
+    model = None
+
+    def post(self, request):
+        serializer = BulkDeleteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(bulk_delete(self.model, serializer.validated_data['ids']))
+
 
-        drivers= team.drivers.all()
-        for driver in drivers:
-            if driver.registered_races.exists():
-                return Response({"error": "Cannot delete team with registered drivers for races."},
-                    status=status.HTTP_400_BAD_REQUEST)
-        return super().destroy(request, *args, **kwargs)
+class TeamBulkDeleteAPIView(BulkDeleteAPIView):
+    model = Team
 
 
 #Driver API views
-class DriverListView(generics.ListAPIView):
+class DriverListView(APIFormatsMixin, CachedResponseMixin, EagerLoadingMixin, generics.ListAPIView):
+    cache_models = (Driver, Team, Race)
     queryset = Driver.objects.all()
     serializer_class = DriverSerializer
+    pagination_class = DriverPagination
   
-class DriverCreateView(generics.CreateAPIView):
+class DriverCreateView(APIFormatsMixin, generics.CreateAPIView):
     queryset = Driver.objects.all()
     serializer_class = DriverSerializer
  
-class DriverRetrieveView(generics.RetrieveAPIView):
+class DriverRetrieveView(APIFormatsMixin, CachedResponseMixin, EagerLoadingMixin, generics.RetrieveAPIView):
+    cache_models = (Driver, Team, Race)
     queryset = Driver.objects.all()
     serializer_class = DriverSerializer
  
-class DriverUpdateView(generics.UpdateAPIView):
+class DriverUpdateView(APIFormatsMixin, EagerLoadingMixin, generics.UpdateAPIView):
     queryset = Driver.objects.all()
     serializer_class = DriverSerializer
  
-class DriverDeleteViewAPI(generics.DestroyAPIView):
+class DriverDeleteViewAPI(APIFormatsMixin, generics.DestroyAPIView):
     queryset = Driver.objects.all()
     serializer_class = DriverSerializer
  
     def delete(self, request, *args, **kwargs):
-        driver = self.get_object()
-        if driver.registered_races.exists():
+        try:
+            return super().delete(request, *args, **kwargs)
+        except ValidationError:
             return Response({"error": "Cannot delete driver who is registered for races."},
                             status=status.HTTP_400_BAD_REQUEST)
-        return super().delete(request, *args, **kwargs) 
+    
+class DriverBulkSaveAPIView(APIFormatsMixin, APIView):
+    """POST a JSON array (or text/csv) of drivers: rows with an id are updated, the rest
+    created, all in one transaction. Any invalid row rejects the batch with per-row errors."""
+    parser_classes = [FastJSONParser, CSVParser]
+
+    def post(self, request):
+        if not isinstance(request.data, list) or not request.data:
+            return Response({"error": "Expected a non-empty list of drivers."}, status=status.HTTP_400_BAD_REQUEST)
+        if len(request.data) > MAX_BULK_ROWS:
+            return Response({"error": f"At most {MAX_BULK_ROWS} drivers per request."},
+                            status=status.HTTP_400_BAD_REQUEST)
+
+        serializer = DriverBulkRowSerializer(data=request.data, many=True)
+        if not serializer.is_valid():
+            row_errors = serializer.errors
+            #depending on the DRF version a list serializer reports a list or an {index: errors} dict
+            items = row_errors.items() if isinstance(row_errors, dict) else enumerate(row_errors)
+            errors = [{'row': index, 'errors': errors} for index, errors in items if errors]
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        results, errors = save_drivers(serializer.validated_data)
+        if errors:
+            return Response({'errors': errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'results': results}, status=status.HTTP_200_OK)
+
+
+class DriverBulkDeleteAPIView(BulkDeleteAPIView):
+    model = Driver
     
 #Race API views
-class RaceListView(generics.ListAPIView):
+class RaceListView(APIFormatsMixin, CachedResponseMixin, EagerLoadingMixin, generics.ListAPIView):
+    """Races by date; ?ordering=[-]registered_driver_count and ?min_entries=/?max_entries=
+    use the entry count index."""
+    cache_models = (Race, Driver)
     queryset = Race.objects.all()
     serializer_class = RaceSerializer
-
-class RaceCreateView(generics.CreateAPIView):
+    pagination_class = RacePagination
+
+    def get_queryset(self):
+        return filter_counters(super().get_queryset(), self.request.query_params, RaceListFilterSerializer)
+
+def filter_counters(queryset, query_params, filter_class):
+    filters = filter_class(data=query_params)
+    filters.is_valid(raise_exception=True)
+    params = filters.validated_data
+    for name, field in filter_class.counters.items():
+        if params.get(f'min_{name}') is not None:
+            queryset = queryset.filter(**{f'{field}__gte': params[f'min_{name}']})
+        if params.get(f'max_{name}') is not None:
+            queryset = queryset.filter(**{f'{field}__lte': params[f'max_{name}']})
+    return queryset
+
+class UpcomingRaceListView(APIFormatsMixin, CachedResponseMixin, EagerLoadingMixin, generics.ListAPIView):
+    """Upcoming races, optionally filtered by ?status=open|closed and a race_date range
+    (?date_from=, ?date_to=). Filtering happens in SQL, on the race date/closure indexes."""
+    queryset = Race.objects.all()
+    serializer_class = UpcomingRaceSerializer
+    pagination_class = RacePagination
+    cache_models = (Race, Driver)
+
+    def get_cache_key_extra(self):
+        return str(timezone.now().date())     #"upcoming" and the open/closed status move daily
+
+    def get_queryset(self):
+        return filter_upcoming_races(super().get_queryset(), self.request.query_params)
+
+def filter_upcoming_races(queryset, query_params):
+    filters = UpcomingRaceFilterSerializer(data=query_params)
+    filters.is_valid(raise_exception=True)
+    params = filters.validated_data
+
+    today = timezone.now().date()
+    queryset = queryset.upcoming(today).with_registration_status(today)
+    if params.get('status') == 'open':
+        queryset = queryset.open_for_registration(today)
+    elif params.get('status') == 'closed':
+        queryset = queryset.closed_for_registration(today)
+    if params.get('date_from'):
+        queryset = queryset.filter(race_date__gte=params['date_from'])
+    if params.get('date_to'):
+        queryset = queryset.filter(race_date__lte=params['date_to'])
+    return queryset
+
+class RaceCreateView(APIFormatsMixin, generics.CreateAPIView):
     queryset = Race.objects.all()
     serializer_class = RaceSerializer
 
-class RaceRetrieveView(generics.RetrieveAPIView):
+class RaceRetrieveView(APIFormatsMixin, CachedResponseMixin, EagerLoadingMixin, generics.RetrieveAPIView):
+    cache_models = (Race, Driver)
     queryset = Race.objects.all()
     serializer_class = RaceSerializer
   
-class RaceUpdateView(generics.UpdateAPIView):
+class RaceUpdateView(APIFormatsMixin, EagerLoadingMixin, generics.UpdateAPIView):
     queryset = Race.objects.all()
     serializer_class = RaceSerializer
  
-class RaceDeleteViewAPI(generics.DestroyAPIView):
+class RaceDeleteViewAPI(APIFormatsMixin, generics.DestroyAPIView):
     queryset = Race.objects.all()
     serializer_class = RaceSerializer
  
     def delete(self, request, *args, **kwargs):
-        race = self.get_object()
-        if race.registered_drivers.exists():
+        try:
+            return super().delete(request, *args, **kwargs)
+        except ValidationError:
             return Response({"error": "Cannot delete race with registered drivers."},
                             status=status.HTTP_400_BAD_REQUEST)
-        return super().delete(request, *args, **kwargs)
 
 
-class AddDriversToRaceAPIView(APIView):
+class RaceBulkDeleteAPIView(BulkDeleteAPIView):
+    model = Race
+
+
+class AddDriversToRaceAPIView(APIFormatsMixin, APIView):
     def post(self, request, race_id):
         race = get_object_or_404(Race, id=race_id)
         serializer = AddDriversToRaceSerializer1(data=request.data, context= {'race':race})
         if serializer.is_valid():
-            drivers = serializer.validated_data['drivers']
-            race.registered_drivers.add(*drivers)
+            results = register_drivers(race, serializer.validated_data['drivers'], partial=False)
+            if any(result['status'] == RACE_FULL for result in results):
+                return Response({'error': "Not enough places left in the race."}, status=status.HTTP_409_CONFLICT)
             return Response({'message': 'Drivers added to race successfully.'})
         return Response(serializer.errors, status=status.HTTP_400_BAD_REQUEST)
 
-    
 
+class SearchAPIView(APIFormatsMixin, CachedResponseMixin, APIView):
+    """GET ?q=ham&type=driver,team&limit=10: ranked prefix search over driver names,
+    teams and race tracks, served from the full-text index (see racing.search)."""
+    cache_models = (Driver, Team, Race)
 
-        
+    def get(self, request):
+        params = SearchQuerySerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        kinds = params.validated_data.get('type') or search.KINDS
+        return Response({'results': search.search(params.validated_data['q'], kinds, params.validated_data['limit'])})
 
- 
+
+class RaceRegistrationChangeAPIView(APIFormatsMixin, APIView):
+    """PATCH {"add": [driver ids], "remove": [driver ids]}: change a race's entry list by
+    a delta, with one insert and one delete. Statuses as for bulk registration, plus
+    removed / not_registered."""
+    def patch(self, request, race_id):
+        race = get_object_or_404(Race, id=race_id)
+        serializer = RegistrationChangeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = change_registrations(race, serializer.validated_data['add'], serializer.validated_data['remove'])
+        return Response({'race': race.id, **results})
+
+
+class DriverRegistrationChangeAPIView(APIFormatsMixin, APIView):
+    """PATCH {"add": [race ids], "remove": [race ids]} for one driver."""
+    def patch(self, request, driver_id):
+        driver = get_object_or_404(Driver, id=driver_id)
+        serializer = RegistrationChangeSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = change_driver_registrations(driver, serializer.validated_data['add'],
+                                              serializer.validated_data['remove'])
+        return Response({'driver': driver.id, **results})
+
+
+#Autocomplete lookups*** - paged {id, text} lists the registration form widgets fetch as
+#the user types (see AutocompleteSelectMultiple)
+class LookupAPIView(APIFormatsMixin, CachedResponseMixin, generics.ListAPIView):
+    kind = None
+
+    def get_queryset(self):
+        params = LookupQuerySerializer(data=self.request.query_params)
+        params.is_valid(raise_exception=True)
+        return search.filter_queryset(super().get_queryset(), self.kind, params.validated_data.get('q', ''))
+
+
+class DriverLookupView(LookupAPIView):
+    kind = 'driver'
+    cache_models = (Driver,)
+    queryset = Driver.objects.only('id', 'first_name', 'last_name')
+    serializer_class = DriverLookupSerializer
+    pagination_class = DriverLookupPagination
+
+
+class RaceLookupView(LookupAPIView):
+    """Only races still open for registration."""
+    kind = 'race'
+    cache_models = (Race,)
+    queryset = Race.objects.only('id', 'race_track_name', 'race_date')
+    serializer_class = RaceLookupSerializer
+    pagination_class = RaceLookupPagination
+
+    def get_cache_key_extra(self):
+        return str(timezone.now().date())
+
+    def get_queryset(self):
+        return super().get_queryset().open_for_registration()
+
+
+class RaceRegistrationAPIView(APIFormatsMixin, APIView):
+    """Bulk registration: POST {"drivers": [ids]} and get one status per driver back.
+    Once the race is at capacity the remaining drivers are reported as race_full."""
+    def post(self, request, race_id):
+        race = get_object_or_404(Race, id=race_id)
+        serializer = RaceRegistrationSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        results = register_drivers(race, serializer.validated_data['drivers'])
+        registered = sum(1 for result in results if result['status'] == REGISTERED)
+        return Response({'race': race.id, 'registered': registered, 'results': results})
+
+
+#Async read API*** - served natively under ASGI (RacingProject/asgi.py): queries go through
+#the async ORM and the response cache through its async API, so a request waiting on the
+#database doesn't hold a worker thread. Output matches the sync views above.
+class AsyncReadAPIView(View):
+    """GET-only counterpart of a cached DRF list/retrieve view.
+
+    A list view sets ``pagination_class``; without one the view retrieves ``pk``.
+    """
+    queryset = None
+    serializer_class = None
+    pagination_class = None
+    cache_models = ()
+    #the formats of APIFormatsMixin, less the browsable API
+    renderer_classes = [renderer for renderer in API_RENDERER_CLASSES if renderer is not BrowsableAPIRenderer]
+
+    def get_queryset(self, request):
+        selection = self.serializer_class.field_selection(request.query_params)
+        return self.serializer_class.setup_eager_loading(self.queryset.all(), *selection)
+
+    def get_cache_key_extra(self):
+        return ''
+
+    async def get(self, request, pk=None):
+        request = Request(request)
+        self.renderer = self.select_renderer(request)
+        key = await aresponse_cache_key(type(self).__name__, self.cache_models, request, self.get_cache_key_extra())
+        data = await response_cache().aget(key)
+        if data is not None:
+            return self.render(data)
+        try:
+            data = await (self.list(request) if self.pagination_class else self.retrieve(request, pk))
+        except APIException as exc:
+            return self.render({'detail': exc.detail}, exc.status_code)
+        except ObjectDoesNotExist:
+            return self.render({'detail': f"No {self.queryset.model._meta.object_name} matches the given query."},
+                               status.HTTP_404_NOT_FOUND)
+        await response_cache().aset(key, data, response_cache_timeout())
+        return self.render(data)
+
+    async def list(self, request):
+        paginator = self.pagination_class()
+        page = await paginator.apaginate_queryset(self.get_queryset(request), request, view=self)
+        #everything the serializer reads was prefetched above, so this makes no queries
+        data = self.serializer_class(page, many=True, context={'request': request}).data
+        return paginator.get_paginated_response(data).data
+
+    async def retrieve(self, request, pk):
+        instance = await self.get_queryset(request).aget(pk=pk)
+        return self.serializer_class(instance, context={'request': request}).data
+
+    def select_renderer(self, request):
+        #the cache holds the data, not the bytes, so one entry serves every format
+        renderers = [renderer() for renderer in self.renderer_classes]
+        try:
+            return DefaultContentNegotiation().select_renderer(request, renderers)[0]
+        except APIException:
+            return renderers[0]         #nothing acceptable: JSON, as before
+
+    def render(self, data, status_code=status.HTTP_200_OK):
+        return HttpResponse(self.renderer.render(data), content_type=self.renderer.media_type, status=status_code)
+
+
+class AsyncTeamListView(AsyncReadAPIView):
+    cache_models = (Team, Driver)
+    queryset = Team.objects.all()
+    serializer_class = TeamSerializer
+    pagination_class = TeamPagination
+
+    def get_queryset(self, request):
+        return filter_counters(super().get_queryset(request), request.query_params, TeamListFilterSerializer)
+
+class AsyncTeamRetrieveView(AsyncReadAPIView):
+    cache_models = (Team, Driver)
+    queryset = Team.objects.all()
+    serializer_class = TeamSerializer
+
+class AsyncDriverListView(AsyncReadAPIView):
+    cache_models = (Driver, Team, Race)
+    queryset = Driver.objects.all()
+    serializer_class = DriverSerializer
+    pagination_class = DriverPagination
+
+class AsyncDriverRetrieveView(AsyncReadAPIView):
+    cache_models = (Driver, Team, Race)
+    queryset = Driver.objects.all()
+    serializer_class = DriverSerializer
+
+class AsyncRaceListView(AsyncReadAPIView):
+    cache_models = (Race, Driver)
+    queryset = Race.objects.all()
+    serializer_class = RaceSerializer
+    pagination_class = RacePagination
+
+    def get_queryset(self, request):
+        return filter_counters(super().get_queryset(request), request.query_params, RaceListFilterSerializer)
+
+class AsyncUpcomingRaceListView(AsyncReadAPIView):
+    cache_models = (Race, Driver)
+    queryset = Race.objects.all()
+    serializer_class = UpcomingRaceSerializer
+    pagination_class = RacePagination
+
+    def get_cache_key_extra(self):
+        return str(timezone.now().date())
+
+    def get_queryset(self, request):
+        return filter_upcoming_races(super().get_queryset(request), request.query_params)
+
+class AsyncRaceRetrieveView(AsyncReadAPIView):
+    cache_models = (Race, Driver)
+    queryset = Race.objects.all()
+    serializer_class = RaceSerializer